@@ -0,0 +1,134 @@
+"""
+Wire formats of the ping (part1) and heartbeat (part2) protocols.
+
+TEXT is the original format and stays the default:
+    ping             "Ping <seq> <ctime>"       (echoed back in uppercase)
+    heartbeat        "<seq> <unix time>"
+    heartbeat reply  "<seq> <one-way delay in seconds>"
+
+BINARY is a fixed layout in network byte order, parsed with precompiled structs:
+    magic(1) version(1) kind(1) pad(1) seq(4) timestamp_ns(8)            16 bytes
+    heartbeat reply adds delay_ns(8, signed)                              24 bytes
+Binary timestamps come from time.monotonic_ns(), which on Linux is shared by all
+processes of a host, so one-way delays are only meaningful between local peers.
+
+The first byte of a binary message is MAGIC, which is not printable ASCII, so a
+receiver can tell the two formats apart with codec_for() and serve both at once.
+"""
+import struct
+import time
+
+MAGIC = 0xC5
+MAGIC_BYTE = bytes([MAGIC])
+VERSION = 1
+
+# Message kinds
+PING = 1
+HEARTBEAT = 2
+HEARTBEAT_REPLY = 3
+
+HEADER = struct.Struct("!BBBxIQ")
+REPLY = struct.Struct("!BBBxIQq")
+SEQ_MASK = 0xFFFFFFFF
+
+
+class TextCodec:
+    name = "text"
+    clock = staticmethod(time.time_ns)  # Timestamps are wall-clock time
+
+    def encode_ping(self, seq, now_ns):
+        return ('Ping ' + str(seq) + " " + time.ctime(now_ns / 1e9)).encode("utf-8")
+
+    def decode_ping(self, data):
+        """Return (seq, timestamp_ns), the text format carries no usable timestamp"""
+        try:
+            return int(data.split(b" ", 2)[1]), None
+        except (IndexError, ValueError):
+            raise ValueError(f"malformed ping {data!r}") from None
+
+    def encode_heartbeat(self, seq, now_ns):
+        return f"{seq} {now_ns / 1e9}".encode("utf-8")
+
+    def decode_heartbeat(self, data):
+        """Return (seq, timestamp_ns)"""
+        try:
+            seq, timestamp = data.split()
+            return int(seq), int(float(timestamp) * 1e9)
+        except ValueError:
+            raise ValueError(f"malformed heartbeat {data!r}") from None
+
+    def encode_heartbeat_reply(self, seq, timestamp_ns, delay_ns):
+        return f"{seq} {delay_ns / 1e9}".encode("utf-8")
+
+    def decode_heartbeat_reply(self, data):
+        """Return (seq, timestamp_ns, delay_ns), the timestamp is not echoed in text"""
+        try:
+            seq, delay = data.split()
+            return int(seq), None, int(float(delay) * 1e9)
+        except ValueError:
+            raise ValueError(f"malformed heartbeat reply {data!r}") from None
+
+    def describe(self, data):
+        return data.decode("utf-8", "replace")
+
+
+class BinaryCodec:
+    name = "binary"
+    clock = staticmethod(time.monotonic_ns)
+
+    def _unpack(self, layout, data, kind):
+        try:
+            magic, version, got_kind, *fields = layout.unpack_from(data)
+        except struct.error:
+            raise ValueError(f"short binary message ({len(data)} bytes)") from None
+        if magic != MAGIC or version != VERSION or got_kind != kind:
+            raise ValueError(f"unexpected binary header {magic:#x}/{version}/{got_kind}")
+        return fields
+
+    def encode_ping(self, seq, now_ns):
+        return HEADER.pack(MAGIC, VERSION, PING, seq & SEQ_MASK, now_ns)
+
+    def decode_ping(self, data):
+        seq, timestamp = self._unpack(HEADER, data, PING)
+        return seq, timestamp
+
+    def encode_heartbeat(self, seq, now_ns):
+        return HEADER.pack(MAGIC, VERSION, HEARTBEAT, seq & SEQ_MASK, now_ns)
+
+    def decode_heartbeat(self, data):
+        seq, timestamp = self._unpack(HEADER, data, HEARTBEAT)
+        return seq, timestamp
+
+    def encode_heartbeat_reply(self, seq, timestamp_ns, delay_ns):
+        return REPLY.pack(MAGIC, VERSION, HEARTBEAT_REPLY, seq & SEQ_MASK, timestamp_ns, delay_ns)
+
+    def decode_heartbeat_reply(self, data):
+        seq, timestamp, delay = self._unpack(REPLY, data, HEARTBEAT_REPLY)
+        return seq, timestamp, delay
+
+    def describe(self, data):
+        try:
+            magic, version, kind, seq, timestamp = HEADER.unpack_from(data)
+        except struct.error:
+            return repr(data)
+        name = {PING: "Ping", HEARTBEAT: "Heartbeat", HEARTBEAT_REPLY: "Heartbeat reply"}.get(kind, "Unknown")
+        return f"{name} {seq} [binary v{version}, t={timestamp}ns]"
+
+
+TEXT = TextCodec()
+BINARY = BinaryCodec()
+CODECS = {TEXT.name: TEXT, BINARY.name: BINARY}
+
+
+def get_codec(name):
+    """Codec by name ("text" or "binary")"""
+    return CODECS[name]
+
+
+def is_binary(data):
+    return data[:1] == MAGIC_BYTE
+
+
+def codec_for(data):
+    """Codec that can decode `data`, so servers can accept both formats"""
+    return BINARY if data[:1] == MAGIC_BYTE else TEXT
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of the text and binary wire formats in codec.py.
+
+Measures how many messages per second one core can encode and decode, for pings
+and for a full heartbeat exchange (heartbeat + reply), with both codecs.
+
+Usage: python codec_bench.py [--count 200000]
+"""
+import argparse
+import time
+
+import codec
+
+
+def bench_ping(wire, count):
+    encode, decode = wire.encode_ping, wire.decode_ping
+    now = wire.clock()
+    start = time.perf_counter()
+    for seq in range(count):
+        decode(encode(seq, now))
+    return count / (time.perf_counter() - start)
+
+
+def bench_heartbeat(wire, count):
+    encode, decode = wire.encode_heartbeat, wire.decode_heartbeat
+    encode_reply, decode_reply = wire.encode_heartbeat_reply, wire.decode_heartbeat_reply
+    now = wire.clock()
+    start = time.perf_counter()
+    for seq in range(count):
+        seq_num, timestamp = decode(encode(seq, now))  # Client -> server
+        decode_reply(encode_reply(seq_num, timestamp, 1000))  # Server -> client
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare text and binary codec throughput")
+    parser.add_argument("--count", type=int, default=200000, help="Messages per measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs is reported")
+    args = parser.parse_args()
+
+    print(f"{'Codec':<8} {'Ping pkt/s':>14} {'Heartbeat pkt/s':>16}")
+    results = {}
+    for wire in (codec.TEXT, codec.BINARY):
+        ping = max(bench_ping(wire, args.count) for _ in range(args.repeat))
+        heartbeat = max(bench_heartbeat(wire, args.count) for _ in range(args.repeat))
+        results[wire.name] = (ping, heartbeat)
+        print(f"{wire.name:<8} {ping:>14,.0f} {heartbeat:>16,.0f}")
+    text, binary = results["text"], results["binary"]
+    print(f"Speed-up of binary: ping x{binary[0] / text[0]:.2f}, heartbeat x{binary[1] / text[1]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
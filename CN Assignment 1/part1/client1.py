@@ -1,5 +1,28 @@
+import argparse
+import os
 import socket
+import sys
 import time  # Import time library
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Shared modules live one level up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "CN Assignment 3"))  # capture.py and tracing.py are shared with the data link entities
+import codec
+import tracing
+from capture import Capture
+from rtt_stats import RttStats
+
+parser = argparse.ArgumentParser(description="UDP ping client")
+parser.add_argument("--binary", action="store_true", help="Use the binary wire format instead of text")
+parser.add_argument("--capture", default=None, help="Write all datagrams to this pcapng file")
+parser.add_argument("--trace", default=None, help="Write a binary trace of every reply and timeout to this file")
+parser.add_argument("--trace-level", choices=tracing.LEVELS, default="info")
+args = parser.parse_args()
+if args.trace is not None:
+    tracing.configure(args.trace_level, args.trace)
+wire = codec.get_codec("binary" if args.binary else "text")
+capture = Capture(args.capture) if args.capture else None
+
 while True:
     start_key_press = input("\nPress any key to start...\n")
 
@@ -8,36 +31,43 @@ while True:
     print("-------------------------\n")
     # Abhay ip : 192.168.40.238
     mysocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # Create a UDP socket for the client
+    if capture:
+        mysocket = capture.wrap(mysocket)
     server_address = ('127.0.0.1', 12000)  # Set IP Address and Port Number of Socket
     mysocket.settimeout(1)  # Sets a timeout value 1 seconds
-    rtt = []  # Create an empty list to store round trip time
+    mysocket.bind(('', 0))  # Take the ephemeral port now, traces are tagged with it
+    link = tracing.link_id(mysocket)
+    rtt = RttStats()  # Streaming round trip time statistics
     try:  # Infinite loop to continuously send messages to the server
         for i in range(10):
             start = time.time()  # Start time send message to server
-            message = 'Ping ' + str(i + 1) + " " + time.ctime(start)
+            message = wire.encode_ping(i + 1, wire.clock())
             try:
-                sent = mysocket.sendto(message.encode("utf-8"), server_address)
-                print("Sent " + message)
+                sent = mysocket.sendto(message, server_address)
                 data, server = mysocket.recvfrom(4096)  # Maximum data received 4096 bytes i.e buffer size
-                print("Received " + str(data))
                 end = time.time()
                 elapsed = end - start
-                print("Time: " + str(elapsed * 1000) + " Milliseconds\n")
-                rtt.append(elapsed)
+                print("Time: " + str(elapsed * 1000) + " Milliseconds\n")  # Printed after the clock stops
+                tracing.TRACER.emit(tracing.PING_REPLY, link, i, round(elapsed * 1e6))
+                rtt.add(elapsed)
             except socket.timeout:
                 print("#" + str(i) + " Requested Timed out\n")
+                tracing.TRACER.emit(tracing.PING_TIMEOUT, link, i)
     finally:
         print("Finish ping, closing socket")
         print("-------------------------")
-        try:
-            print("Statistics")
-            print("Average RTT: " + str(sum(rtt) / len(rtt) * 1000) + " Milliseconds")
-            print("Max RTT: " + str(max(rtt) * 1000) + " Milliseconds")
-            print("Min RTT: " + str(min(rtt) * 1000) + " Milliseconds")
-            print("Packet Loss: " + str((10 - len(rtt)) * 10) + "%")
+        print("Statistics")
+        stats = rtt.snapshot()
+        if stats.count:
+            print("Average RTT: " + str(stats.mean * 1000) + " Milliseconds")
+            print("Max RTT: " + str(stats.max * 1000) + " Milliseconds")
+            print("Min RTT: " + str(stats.min * 1000) + " Milliseconds")
+            print(f"RTT p50/p90/p99/p99.9: {stats.p50 * 1000:.3f}/{stats.p90 * 1000:.3f}/"
+                  f"{stats.p99 * 1000:.3f}/{stats.p999 * 1000:.3f} Milliseconds")
+            print("Packet Loss: " + str((10 - stats.count) * 10) + "%")
             print("-------------------------")
             mysocket.close()
-        except:
+        else:
             print("Server Is Down: No packets received")
             mysocket.close()
             continue
\ No newline at end of file
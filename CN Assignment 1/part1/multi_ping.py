@@ -0,0 +1,157 @@
+"""
+Pipelined pinger for many targets.
+
+client1.py sends one ping and waits up to a second for the reply before sending the
+next, so N pings take up to N seconds and only one server can be probed. Here all
+pings to all targets are sent from a single non-blocking socket without waiting, and
+replies are matched to their request by (target address, sequence number). A full
+sweep therefore finishes roughly one timeout after the last ping went out.
+
+Usage: python multi_ping.py 127.0.0.1:12000 10.0.0.2:12000 ... [--count 10]
+"""
+import argparse
+import os
+import selectors
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Shared modules live one level up
+import codec
+from rtt_stats import RttStats
+
+
+class MultiPinger:
+    def __init__(self, targets, count=10, timeout=1.0, interval=0.0, verbose=False, wire=codec.TEXT):
+        self.targets = [(socket.gethostbyname(host), port) for host, port in targets]  # Resolve once so replies match
+        self.count = count
+        self.timeout = timeout
+        self.interval = interval  # Gap between two rounds of pings (one ping to every target per round)
+        self.verbose = verbose
+        self.wire = wire  # codec.TEXT or codec.BINARY
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)  # Room for a burst of replies
+        self.socket.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ)
+
+        self.outstanding = {}  # (address, seq) -> send time
+        self.rtt = {target: RttStats() for target in self.targets}  # Round trip time statistics per target
+
+    def _send_round(self, seq):
+        """Send ping number `seq` to every target"""
+        message = self.wire.encode_ping(seq, self.wire.clock())  # Same message for every target
+        for target in self.targets:
+            try:
+                self.socket.sendto(message, target)
+            except BlockingIOError:  # Send buffer full, count it as lost
+                continue
+            self.outstanding[(target, seq)] = time.perf_counter()
+            if self.verbose:
+                print(f"Sent {self.wire.describe(message)} to {target[0]}:{target[1]}")
+
+    def _drain(self):
+        """Read every reply that is queued on the socket"""
+        while True:
+            try:
+                data, server = self.socket.recvfrom(4096)
+            except BlockingIOError:
+                return
+            except ConnectionRefusedError:  # ICMP port unreachable from a dead target
+                continue
+            end = time.perf_counter()
+            try:
+                seq, _ = self.wire.decode_ping(data)
+            except ValueError:
+                continue
+            start = self.outstanding.pop((server, seq), None)
+            if start is None:  # Duplicate, unknown sender or already timed out
+                continue
+            elapsed = end - start
+            if elapsed > self.timeout:  # Late reply, the ping already counts as lost
+                continue
+            self.rtt[server].add(elapsed)
+            if self.verbose:
+                print(f"Received {self.wire.describe(data)} from {server[0]}:{server[1]} Time: {elapsed * 1000} Milliseconds")
+
+    def run(self):
+        """Send all pings and collect replies, return {target: RttStats}"""
+        next_round, seq = time.perf_counter(), 1
+        deadline = None
+        while True:
+            now = time.perf_counter()
+            if seq <= self.count and now >= next_round:
+                self._send_round(seq)
+                seq += 1
+                next_round = now + self.interval
+                if seq > self.count:
+                    deadline = time.perf_counter() + self.timeout
+                continue
+            if deadline is not None and (now >= deadline or not self.outstanding):
+                break
+            wake = deadline if deadline is not None else next_round
+            for _ in self.selector.select(max(0.0, wake - now)):
+                self._drain()
+        self.outstanding.clear()
+        return self.rtt
+
+    def close(self):
+        self.selector.close()
+        self.socket.close()
+
+
+def print_statistics(target, rtt, count):
+    """Same statistics block as client1.py, for one target"""
+    print(f"Statistics for {target[0]}:{target[1]}")
+    stats = rtt.snapshot()
+    if stats.count:
+        print("Average RTT: " + str(stats.mean * 1000) + " Milliseconds")
+        print("Max RTT: " + str(stats.max * 1000) + " Milliseconds")
+        print("Min RTT: " + str(stats.min * 1000) + " Milliseconds")
+    else:
+        print("Server Is Down: No packets received")
+    print("Packet Loss: " + str((count - stats.count) * 100 / count) + "%")
+    print("-------------------------")
+
+
+def parse_target(text):
+    host, _, port = text.rpartition(":")
+    return host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipelined multi-target UDP pinger")
+    parser.add_argument("targets", nargs="*", type=parse_target, default=[("127.0.0.1", 12000)],
+                        help="host:port of each server to ping")
+    parser.add_argument("--targets-file", help="File with one host:port per line")
+    parser.add_argument("--count", type=int, default=10, help="Pings per target")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Seconds before a ping counts as lost")
+    parser.add_argument("--interval", type=float, default=0.0, help="Seconds between rounds of pings")
+    parser.add_argument("--verbose", action="store_true", help="Print every sent and received ping")
+    parser.add_argument("--binary", action="store_true", help="Use the binary wire format instead of text")
+    args = parser.parse_args()
+
+    targets = list(args.targets)
+    if args.targets_file:
+        with open(args.targets_file) as f:
+            targets = [parse_target(line.strip()) for line in f if line.strip()]
+
+    print("-------------------------")
+    print(f"Starting Ping of {len(targets)} targets")
+    print("-------------------------\n")
+    wire = codec.get_codec("binary" if args.binary else "text")
+    pinger = MultiPinger(targets, args.count, args.timeout, args.interval, args.verbose, wire)
+    start = time.perf_counter()
+    try:
+        results = pinger.run()
+    finally:
+        pinger.close()
+    print(f"Finish ping in {time.perf_counter() - start:.2f} seconds, closing socket")
+    print("-------------------------")
+    for target, rtt in results.items():
+        print_statistics(target, rtt, args.count)
+
+
+if __name__ == "__main__":
+    main()
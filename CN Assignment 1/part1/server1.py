@@ -1,13 +1,30 @@
-import random  # Import random library
+import argparse
+import os
+import sys
 from socket import *  # Import socket library
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Shared modules live one level up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "CN Assignment 3"))  # channel.py is shared with the data link entities
+import codec
+from capture import Capture
+from channel import BernoulliLoss, Channel
+
+parser = argparse.ArgumentParser(description="UDP ping server")
+parser.add_argument("--capture", default=None, help="Write all datagrams, including dropped replies, to this pcapng file")
+args = parser.parse_args()
+
+LOSS = 0.3  # 30% of the pings get no reply
+SEED = None  # Set to an int to reproduce the same losses
+channel = Channel(loss=BernoulliLoss(LOSS), seed=SEED)  # Emulated lossy link for the replies
+
 serverSocket = socket(AF_INET, SOCK_DGRAM)  # Create a UDP socket for the server
 serverSocket.bind(('127.0.0.1', 12000))  # Set IP Address and Port Number of Socket
+if args.capture:
+    serverSocket = Capture(args.capture).wrap(serverSocket)  # Records every datagram sent, received or dropped
 print("Started UDP Server IP Address: 127.0.0.1 and Port: 12000")  # Print string on screen
 while True:  # Run program forever
-    rand = random.randint(1, 10)  # Probability 100%
     message, address = serverSocket.recvfrom(1024)
-    message = message.upper()  # Convert client message to uppercase letter
-    if rand < 4:  # < 30% without reply message
-        continue
-    serverSocket.sendto(message, address)  # Send the uppercase message back to the client
+    if not codec.is_binary(message):  # Binary pings are echoed unchanged
+        message = message.upper()  # Convert client message to uppercase letter
+    channel.send(serverSocket, message, address)  # Send the uppercase message back, unless the channel drops it
@@ -0,0 +1,139 @@
+"""
+Multi-core version of server1.py.
+
+N worker processes each bind their own UDP socket to the same address with
+SO_REUSEPORT, so the kernel spreads incoming pings across the workers (and cores).
+Every worker keeps the behaviour of server1.py: the message is echoed back in
+uppercase (binary pings unchanged), and a configurable fraction of the pings is silently dropped.
+
+The parent process prints per-worker packets/s together with the simulated drops
+and the datagrams the kernel dropped because that worker's receive buffer was full.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Shared modules live one level up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "CN Assignment 3"))  # channel.py is shared with the data link entities
+import codec
+from channel import BernoulliLoss, Channel
+
+# Layout of one worker's slot in the shared statistics array
+RECEIVED, ECHOED, DROPPED, INODE = range(4)
+FIELDS = 4
+PUBLISH_EVERY = 64  # Publish local counters to the shared array every N packets
+
+
+def read_kernel_drops():
+    """Return {socket inode: datagrams dropped by the kernel} from /proc/net/udp"""
+    drops = {}
+    for path in ("/proc/net/udp", "/proc/net/udp6"):
+        try:
+            with open(path) as f:
+                next(f)  # Skip header line
+                for line in f:
+                    fields = line.split()
+                    drops[int(fields[9])] = int(fields[12])
+        except OSError:  # Not on Linux, or no IPv6
+            continue
+    return drops
+
+
+def worker(index, host, port, loss, seed, stats, stop):
+    """Echo loop of a single shard"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is handled by the parent through `stop`
+    serverSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    serverSocket.bind((host, port))
+    serverSocket.settimeout(0.5)  # Wake up regularly to check the stop flag
+    # Own seeded channel per worker, forked workers must not share a random sequence
+    channel = Channel(loss=BernoulliLoss(loss), seed=None if seed is None else seed + index)
+    base = index * FIELDS
+    stats[base + INODE] = os.fstat(serverSocket.fileno()).st_ino
+
+    received = echoed = dropped = 0
+    try:
+        while not stop.is_set():
+            try:
+                message, address = serverSocket.recvfrom(1024)
+            except socket.timeout:
+                stats[base + RECEIVED], stats[base + ECHOED], stats[base + DROPPED] = received, echoed, dropped
+                continue
+            received += 1
+            if not codec.is_binary(message):  # Binary pings are echoed unchanged
+                message = message.upper()
+            if channel.send(serverSocket, message, address):  # Send the uppercase message back
+                echoed += 1
+            else:  # Simulated loss, no reply message
+                dropped += 1
+            if received % PUBLISH_EVERY == 0:
+                stats[base + RECEIVED], stats[base + ECHOED], stats[base + DROPPED] = received, echoed, dropped
+    finally:
+        stats[base + RECEIVED], stats[base + ECHOED], stats[base + DROPPED] = received, echoed, dropped
+        channel.close()
+        serverSocket.close()
+
+
+def report(stats, workers, previous, elapsed):
+    """Print one line per worker plus a total, return the current counters"""
+    kernel_drops = read_kernel_drops()
+    current = list(stats)
+    print(f"{'Worker':<8} {'Rx pkt/s':>10} {'Echo pkt/s':>11} {'Sim drops':>10} {'Kernel drops':>13}")
+    total_rx = total_echo = total_sim = total_kernel = 0
+    for i in range(workers):
+        base = i * FIELDS
+        rx = (current[base + RECEIVED] - previous[base + RECEIVED]) / elapsed
+        echo = (current[base + ECHOED] - previous[base + ECHOED]) / elapsed
+        sim = current[base + DROPPED]
+        kernel = kernel_drops.get(current[base + INODE], 0)
+        total_rx, total_echo = total_rx + rx, total_echo + echo
+        total_sim, total_kernel = total_sim + sim, total_kernel + kernel
+        print(f"{i:<8} {rx:>10.0f} {echo:>11.0f} {sim:>10} {kernel:>13}")
+    print(f"{'Total':<8} {total_rx:>10.0f} {total_echo:>11.0f} {total_sim:>10} {total_kernel:>13}")
+    print("-------------------------")
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded UDP ping server (SO_REUSEPORT)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--loss", type=float, default=0.3, help="Fraction of pings left unanswered")
+    parser.add_argument("--seed", type=int, help="Seed of the simulated loss (worker i uses seed + i)")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between statistics reports")
+    args = parser.parse_args()
+
+    stats = multiprocessing.Array("Q", args.workers * FIELDS, lock=False)
+    stop = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=worker, args=(i, args.host, args.port, args.loss, args.seed, stats, stop), daemon=True)
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    print(f"Started {args.workers} UDP Server workers on IP Address: {args.host} and Port: {args.port}")
+
+    previous = [0] * len(stats)
+    last = time.monotonic()
+    try:
+        while True:
+            time.sleep(args.interval)
+            now = time.monotonic()
+            previous = report(stats, args.workers, previous, now - last)
+            last = now
+    except KeyboardInterrupt:
+        print("\nStopping workers")
+    finally:
+        stop.set()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
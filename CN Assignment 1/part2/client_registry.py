@@ -0,0 +1,84 @@
+"""
+Liveness registry for the heartbeat server.
+
+Every client address gets a slot number the first time it is heard from, and all
+per-client values are stored in flat arrays indexed by that slot, so one client
+costs a few machine words instead of a Python object. Updating a client is O(1),
+and silent clients are found by an incremental sweep that looks at a bounded
+number of slots per call, so neither cost grows with the number of clients.
+"""
+from array import array
+
+
+class ClientRegistry:
+    def __init__(self, silence=3.0, alpha=0.125):
+        self.silence = silence  # Seconds without a heartbeat before a client is flagged
+        self.alpha = alpha  # Weight of a new sample in the rolling one-way delay
+        self.slots = {}  # address -> slot
+        self.addresses = []  # slot -> address
+        self.last_seen = array("d")
+        self.last_seq = array("q")  # Highest sequence number seen
+        self.received = array("Q")
+        self.lost = array("Q")  # Heartbeats inferred lost from sequence number gaps
+        self.delay = array("d")  # Exponentially weighted one-way delay
+        self.silent = array("B")  # 1 while the client is flagged as silent
+        self.cursor = 0  # Next slot the sweep looks at
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def update(self, address, seq, delay, now):
+        """Record a heartbeat from `address`, return True if the client was silent before"""
+        slot = self.slots.get(address)
+        if slot is None:
+            self.slots[address] = len(self.addresses)
+            self.addresses.append(address)
+            self.last_seen.append(now)
+            self.last_seq.append(seq)
+            self.received.append(1)
+            self.lost.append(seq if seq > 0 else 0)  # Heartbeats before the first one we saw were lost too
+            self.delay.append(delay)
+            self.silent.append(0)
+            return False
+
+        last = self.last_seq[slot]
+        if seq == last:
+            return False  # Duplicate of the latest heartbeat, neither received nor a sign of life
+        if seq > last:
+            self.lost[slot] += seq - last - 1
+            self.last_seq[slot] = seq
+        elif seq == 0:  # Client restarted its sequence
+            self.last_seq[slot] = 0
+        elif self.lost[slot]:  # Reordered heartbeat (0 < seq < last) that was already counted as lost
+            self.lost[slot] -= 1
+        self.last_seen[slot] = now
+        self.received[slot] += 1
+        self.delay[slot] += self.alpha * (delay - self.delay[slot])
+        if self.silent[slot]:
+            self.silent[slot] = 0
+            return True
+        return False
+
+    def sweep(self, now, budget=1024):
+        """Check up to `budget` slots, return the addresses that just went silent"""
+        n = len(self.addresses)
+        if not n:
+            return []
+        newly_silent = []
+        deadline = now - self.silence
+        slot = self.cursor
+        for _ in range(min(budget, n)):
+            if not self.silent[slot] and self.last_seen[slot] < deadline:
+                self.silent[slot] = 1
+                newly_silent.append(self.addresses[slot])
+            slot += 1
+            if slot == n:
+                slot = 0
+        self.cursor = slot
+        return newly_silent
+
+    def info(self, address):
+        """Return (last_seen, last_seq, received, lost, delay) of a client"""
+        slot = self.slots[address]
+        return (self.last_seen[slot], self.last_seq[slot], self.received[slot],
+                self.lost[slot], self.delay[slot])
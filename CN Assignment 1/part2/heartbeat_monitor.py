@@ -0,0 +1,186 @@
+"""
+Heartbeat monitor for many servers from one process.
+
+client2.py watches a single server with a blocking recvfrom() and a one second
+socket timeout. This monitor sends the same "<seq> <timestamp>" heartbeats to every
+server from one non-blocking socket. The deadline of each outstanding heartbeat is a
+timer in a hierarchical timing wheel, so arming and expiring a deadline is O(1) per
+server. Per-server state lives in flat arrays indexed by server number.
+
+As in client2.py a server is assumed to be down after 3 consecutive misses. The
+monitor keeps probing it and reports when it comes back.
+
+Usage: python heartbeat_monitor.py 127.0.0.1:12000 127.0.0.1:12001 ... [--duration 60]
+"""
+import argparse
+import os
+import selectors
+import socket
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Shared modules live one level up
+import codec
+from rtt_stats import RttStats, format_snapshot
+from timing_wheel import TimingWheel
+
+
+class HeartbeatMonitor:
+    def __init__(self, servers, interval=1.0, max_misses=3, tick=0.01, verbose=False, wire=codec.TEXT):
+        self.servers = [(socket.gethostbyname(host), port) for host, port in servers]
+        self.index = {server: i for i, server in enumerate(self.servers)}  # Address -> server number
+        self.interval = interval  # Heartbeat period, also the deadline for its reply
+        self.max_misses = max_misses
+        self.verbose = verbose
+        self.wire = wire  # codec.TEXT or codec.BINARY
+
+        n = len(self.servers)
+        self.seq = array("q", [-1] * n)  # Sequence number of the outstanding heartbeat
+        self.acked = array("q", [-1] * n)  # Last sequence number that got a reply
+        self.sent_at = array("d", [0.0] * n)  # Send time of the outstanding heartbeat
+        self.misses = array("B", [0] * n)  # Consecutive misses
+        self.down = array("B", [0] * n)  # 1 once max_misses was reached
+        self.replies = array("Q", [0] * n)
+        self.down_count = 0
+        self.rtt = RttStats()  # Round trip times of all servers together
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.socket.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ)
+
+        start = time.monotonic()
+        self.wheel = TimingWheel(tick=tick, start=start)
+        for i in range(n):  # Spread the first heartbeats over one interval
+            self.wheel.schedule(start + interval * i / n, i)
+
+    def _send(self, i, now):
+        """Send the next heartbeat to server i and arm its deadline"""
+        seq = self.seq[i] + 1
+        self.seq[i] = seq
+        self.sent_at[i] = now
+        message = self.wire.encode_heartbeat(seq, self.wire.clock())
+        try:
+            self.socket.sendto(message, self.servers[i])
+        except (BlockingIOError, ConnectionRefusedError):  # Counts as a miss when the deadline expires
+            pass
+        self.wheel.schedule(now + self.interval, i)
+
+    def _expire(self, i, now):
+        """Deadline of server i reached: count a miss if needed, then send the next heartbeat"""
+        seq = self.seq[i]
+        if seq >= 0 and self.acked[i] != seq:
+            self.misses[i] = min(self.misses[i] + 1, 255)
+            if self.verbose:
+                print(f"#{seq} to {self.servers[i][0]}:{self.servers[i][1]} Requested Timed out")
+            if self.misses[i] >= self.max_misses and not self.down[i]:
+                self.down[i] = 1
+                self.down_count += 1
+                print(f"Server {self.servers[i][0]}:{self.servers[i][1]} is assumed to be down "
+                      f"after {self.max_misses} consecutive misses.")
+        self._send(i, now)
+
+    def _drain(self):
+        """Handle every queued reply"""
+        while True:
+            try:
+                data, server = self.socket.recvfrom(4096)
+            except BlockingIOError:
+                return
+            except ConnectionRefusedError:
+                continue
+            now = time.monotonic()
+            i = self.index.get(server)
+            if i is None:
+                continue
+            try:
+                seq, _, _ = self.wire.decode_heartbeat_reply(data)
+            except ValueError:
+                continue
+            if seq != self.seq[i] or self.acked[i] == seq:  # Late reply or duplicate
+                continue
+            self.acked[i] = seq
+            self.misses[i] = 0
+            self.replies[i] += 1
+            elapsed = now - self.sent_at[i]
+            self.rtt.add(elapsed)
+            if self.down[i]:
+                self.down[i] = 0
+                self.down_count -= 1
+                print(f"Server {server[0]}:{server[1]} is up again")
+
+    def run(self, duration=None, report_every=5.0):
+        """Monitor until `duration` seconds have passed (forever if None)"""
+        start = time.monotonic()
+        next_report = start + report_every
+        while duration is None or time.monotonic() - start < duration:
+            now = time.monotonic()
+            for i in self.wheel.advance(now):
+                self._expire(i, now)
+            if now >= next_report:
+                print(f"{len(self.servers) - self.down_count} servers up, {self.down_count} down, "
+                      f"RTT {format_snapshot(self.rtt.snapshot())}")
+                next_report += report_every
+            for _ in self.selector.select(max(0.0, self.wheel.next_deadline() - time.monotonic())):
+                self._drain()
+
+    def close(self):
+        self.selector.close()
+        self.socket.close()
+
+
+def parse_server(text):
+    host, _, port = text.rpartition(":")
+    return host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Timing-wheel heartbeat monitor for many servers")
+    parser.add_argument("servers", nargs="*", type=parse_server, default=[("127.0.0.1", 12000)],
+                        help="host:port of each server to monitor")
+    parser.add_argument("--servers-file", help="File with one host:port per line")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between heartbeats (and reply deadline)")
+    parser.add_argument("--max-misses", type=int, default=3, help="Consecutive misses before a server is down")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--verbose", action="store_true", help="Print every missed heartbeat")
+    parser.add_argument("--binary", action="store_true", help="Use the binary wire format instead of text")
+    args = parser.parse_args()
+
+    servers = list(args.servers)
+    if args.servers_file:
+        with open(args.servers_file) as f:
+            servers = [parse_server(line.strip()) for line in f if line.strip()]
+
+    print("-------------------------")
+    print(f"Starting Heartbeat for {len(servers)} servers")
+    print("-------------------------\n")
+    wire = codec.get_codec("binary" if args.binary else "text")
+    monitor = HeartbeatMonitor(servers, args.interval, args.max_misses, verbose=args.verbose, wire=wire)
+    try:
+        monitor.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
+    print("Finish heartbeat, closing socket")
+    print("-------------------------")
+    print("Statistics")
+    replies = sum(monitor.replies)
+    sent = sum(seq + 1 for seq in monitor.seq)
+    if replies:
+        stats = monitor.rtt.snapshot()
+        print("Average RTT: " + str(stats.mean * 1000) + " Milliseconds")
+        print("Max RTT: " + str(stats.max * 1000) + " Milliseconds")
+        print("Min RTT: " + str(stats.min * 1000) + " Milliseconds")
+        print(f"RTT p50/p90/p99/p99.9: {stats.p50 * 1000:.3f}/{stats.p90 * 1000:.3f}/"
+              f"{stats.p99 * 1000:.3f}/{stats.p999 * 1000:.3f} Milliseconds")
+    if sent:
+        print("Packet Loss: " + str((sent - replies) * 100 / sent) + "%")
+    print(f"Servers down: {monitor.down_count} of {len(monitor.servers)}")
+    print("-------------------------")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,62 @@
-import random  # Import random library
+import argparse
+import os
+import sys
 from socket import *  # Import socket library
 import time  # Import time library
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Shared modules live one level up
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "CN Assignment 3"))  # channel.py is shared with the data link entities
+import codec
+from capture import Capture
+from channel import BernoulliLoss, Channel
+from client_registry import ClientRegistry
+
+LOSS = 0.3  # 30% of the heartbeats are lost on the way in
+SEED = None  # Set to an int to reproduce the same losses
+
+SILENCE = 3.0  # Seconds without heartbeat before a client is flagged as silent
+SWEEP_BUDGET = 64  # Registry slots checked for silence after every heartbeat
+
+parser = argparse.ArgumentParser(description="UDP heartbeat server")
+parser.add_argument("--capture", default=None, help="Write all datagrams, including dropped heartbeats, to this pcapng file")
+args = parser.parse_args()
+
 serverSocket = socket(AF_INET, SOCK_DGRAM)  # Create a UDP socket for the server
 serverSocket.bind(('127.0.0.1', 12000))  # Set IP Address and Port Number of Socket
+serverSocket.settimeout(1)  # Wake up regularly to look for silent clients
+if args.capture:
+    serverSocket = Capture(args.capture).wrap(serverSocket)  # Records every datagram sent, received or dropped
 print("Started UDP Server IP Address: 127.0.0.1 and Port: 12000")  # Print string on screen
 
+channel = Channel(loss=BernoulliLoss(LOSS), seed=SEED)  # Emulated lossy link
+registry = ClientRegistry(silence=SILENCE)  # Last-seen time, lost heartbeats and delay per client
+
+
+def report_silent(budget):
+    for address in registry.sweep(time.monotonic(), budget):
+        last_seen, last_seq, received, lost, delay = registry.info(address)
+        print(f"Client {address[0]}:{address[1]} stopped reporting: last seq {last_seq}, "
+              f"{received} received, {lost} lost, one-way delay {delay * 1000:.3f} Milliseconds")
+
+
 while True:  # Run program forever
-    rand = random.randint(1, 10)  # random number between 0 and 10
-    message, address = serverSocket.recvfrom(1024)
-    recv_time = time.time()  # Record the time the message was received
-    if rand < 4:  # < 30% without reply message
+    try:
+        message, address = serverSocket.recvfrom(1024)
+    except timeout:
+        report_silent(len(registry))
+        continue
+    wire = codec.codec_for(message)  # Text and binary clients are served side by side
+    recv_time = wire.clock()  # Record the time the message was received (ns)
+    if channel.drop(serverSocket, message, address):  # Lost heartbeat, no reply message
+        continue
+    try:
+        seq_num, timestamp = wire.decode_heartbeat(message)
+    except ValueError:
         continue
-    seq_num, timestamp = message.decode().split()
-    timestamp = float(timestamp)
     time_diff = recv_time - timestamp
-    response_message = f"{seq_num} {time_diff}"
-    serverSocket.sendto(response_message.encode(), address)  # Send the time difference back to the client
\ No newline at end of file
+    if registry.update(address, seq_num, time_diff / 1e9, time.monotonic()):
+        print(f"Client {address[0]}:{address[1]} is reporting again")
+    report_silent(SWEEP_BUDGET)
+    response_message = wire.encode_heartbeat_reply(seq_num, timestamp, time_diff)
+    serverSocket.sendto(response_message, address)  # Send the time difference back to the client
@@ -0,0 +1,77 @@
+"""
+Hierarchical timing wheel (Varghese & Lauck), as used for kernel timers.
+
+Time is cut into ticks. Level 0 has one slot per tick for the next `slots` ticks,
+level 1 one slot per `slots` ticks, and so on. Inserting a timer is a shift and an
+append, and advancing the clock only touches the slot of the current tick, plus a
+cascade of one higher-level slot every `slots` ticks. Both are O(1) per timer no
+matter how many timers are pending.
+"""
+import time
+
+
+class TimingWheel:
+    def __init__(self, tick=0.01, slots=256, levels=4, start=None):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick = tick  # Seconds per tick
+        self.slots = slots
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.levels = levels
+        self.span = 1 << (self.bits * levels)  # Ticks covered by the whole wheel
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.origin = time.monotonic() if start is None else start
+        self.current = 0  # Ticks processed so far
+        self.pending = 0  # Number of timers in the wheel
+
+    def _place(self, expire, item):
+        """Put a timer in the slot that matches its distance from the current tick"""
+        delta = expire - self.current
+        if delta >= self.span:  # Too far away, park it in the last slot it can reach and re-place it later
+            delta = self.span - 1
+        for level in range(self.levels):
+            if delta < 1 << (self.bits * (level + 1)):
+                slot = ((self.current + delta) >> (self.bits * level)) & self.mask
+                self.wheels[level][slot].append((expire, item))
+                return
+
+    def schedule(self, when, item):
+        """Fire `item` once the clock reaches `when` (a time.monotonic() value)"""
+        expire = -(-(when - self.origin) // self.tick)  # Round up to whole ticks
+        expire = max(int(expire), self.current + 1)
+        self._place(expire, item)
+        self.pending += 1
+
+    def advance(self, now):
+        """Move the clock to `now` and return the items of every timer that expired"""
+        target = int((now - self.origin) // self.tick)
+        expired = []
+        wheel0 = self.wheels[0]
+        while self.current < target:
+            self.current += 1
+            current = self.current
+            # Every `slots` ticks, spread the next slot of the level above over the level below
+            level = 1
+            while level < self.levels and current & ((1 << (self.bits * level)) - 1) == 0:
+                slot = (current >> (self.bits * level)) & self.mask
+                bucket = self.wheels[level][slot]
+                self.wheels[level][slot] = []
+                for expire, item in bucket:
+                    self._place(expire, item)
+                level += 1
+            slot = current & self.mask
+            bucket = wheel0[slot]
+            if bucket:
+                wheel0[slot] = []
+                for expire, item in bucket:
+                    if expire <= current:
+                        expired.append(item)
+                    else:  # Parked timer that is still too far away
+                        self._place(expire, item)
+        self.pending -= len(expired)
+        return expired
+
+    def next_deadline(self):
+        """Time of the next tick, the latest moment advance() should be called"""
+        return self.origin + (self.current + 1) * self.tick
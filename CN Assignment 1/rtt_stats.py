@@ -0,0 +1,119 @@
+"""
+Streaming round trip time statistics in constant memory.
+
+Count, mean and variance are updated online (Welford's algorithm), and every
+sample is also counted in a fixed log-bucketed histogram: the binary exponent of
+the value picks a power-of-two range, which is split into SUB_BUCKETS linear
+sub-buckets, so percentiles are accurate to 1/SUB_BUCKETS (about 1.6 %) of the
+value. Memory does not depend on the number of samples, and snapshot() can be
+called at any time while samples keep coming in.
+"""
+import math
+from array import array
+from collections import namedtuple
+
+SUB_BUCKETS = 64
+MIN_EXPONENT = -24  # Values below 2**-25 s (~30 ns) share the first bucket
+MAX_EXPONENT = 8  # Values of 2**8 s (~4 min) and above share the last bucket
+BUCKETS = (MAX_EXPONENT - MIN_EXPONENT + 1) * SUB_BUCKETS
+
+Snapshot = namedtuple("Snapshot", "count mean stdev min max p50 p90 p99 p999")
+
+
+def bucket_index(value):
+    """Histogram bucket of a (positive) value in seconds"""
+    if value <= 0.0:
+        return 0
+    mantissa, exponent = math.frexp(value)  # value = mantissa * 2**exponent, 0.5 <= mantissa < 1
+    if exponent < MIN_EXPONENT:
+        return 0
+    if exponent > MAX_EXPONENT:
+        return BUCKETS - 1
+    return (exponent - MIN_EXPONENT) * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+
+def bucket_value(index):
+    """Midpoint of a histogram bucket"""
+    exponent, sub = divmod(index, SUB_BUCKETS)
+    return math.ldexp(0.5 + (sub + 0.5) / (2 * SUB_BUCKETS), exponent + MIN_EXPONENT)
+
+
+class RttStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0  # Sum of squared distances from the mean
+        self.min = math.inf
+        self.max = -math.inf
+        self.histogram = array("Q", bytes(8 * BUCKETS))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, value):
+        """Record one sample (seconds)"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.histogram[bucket_index(value)] += 1
+
+    def merge(self, other):
+        """Add the samples summarized by another RttStats"""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for i, n in enumerate(other.histogram):
+            if n:
+                self.histogram[i] += n
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def percentile(self, q):
+        """Value below which a fraction `q` (0..1) of the samples fall"""
+        if not self.count:
+            return math.nan
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if seen >= rank:
+                return min(max(bucket_value(i), self.min), self.max)
+        return self.max
+
+    def snapshot(self):
+        """Current statistics, the histogram keeps accumulating afterwards"""
+        if not self.count:
+            return Snapshot(0, math.nan, math.nan, math.nan, math.nan, math.nan, math.nan, math.nan, math.nan)
+        # One pass over the histogram for all percentiles
+        wanted = [(q, max(1, math.ceil(q * self.count))) for q in (0.5, 0.9, 0.99, 0.999)]
+        values = []
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            if not n:
+                continue
+            seen += n
+            while wanted and seen >= wanted[0][1]:
+                values.append(min(max(bucket_value(i), self.min), self.max))
+                wanted.pop(0)
+            if not wanted:
+                break
+        return Snapshot(self.count, self.mean, math.sqrt(self.variance), self.min, self.max, *values)
+
+
+def format_snapshot(snap):
+    """One line summary in milliseconds"""
+    return (f"n={snap.count} avg={snap.mean * 1000:.3f} p50={snap.p50 * 1000:.3f} p90={snap.p90 * 1000:.3f} "
+            f"p99={snap.p99 * 1000:.3f} p99.9={snap.p999 * 1000:.3f} max={snap.max * 1000:.3f} ms")
@@ -0,0 +1,188 @@
+"""
+pcapng capture of the datagrams sent, received and dropped by the emulated channel,
+shared by the UDP clients and servers of Assignment 1 and the data link entities of
+Assignment 3.
+
+wrap(sock) returns a socket whose sendto() and recvfrom() record every datagram
+with a nanosecond timestamp. Each datagram is written as a raw IPv4/UDP packet, so
+Wireshark and tshark decode ports and payload. Datagrams dropped by the channel go
+to a second interface, "emulated-drop", and carry a comment. The send path only
+appends a tuple to a queue; a background thread builds the blocks and flushes the
+file every FLUSH_INTERVAL seconds.
+
+read() yields the datagrams of such a file again, for the trace-driven animation of
+Assignment 4.
+
+Usage: capture = Capture("run.pcapng"); sock = capture.wrap(sock)
+"""
+import atexit
+import collections
+import functools
+import itertools
+import socket
+import struct
+import threading
+import time
+
+LINKTYPE_RAW = 101  # Packets start with the IP header
+INTERFACES = ("channel", "emulated-drop")
+DELIVERED, DROPPED = range(len(INTERFACES))
+INBOUND, OUTBOUND = 1, 2  # epb_flags direction bits
+FLUSH_INTERVAL = 0.2  # Seconds
+
+OPT_ENDOFOPT, OPT_COMMENT = 0, 1
+IF_NAME, IF_TSRESOL = 2, 9
+EPB_FLAGS = 2
+
+IPV4 = struct.Struct("!BBHHHBBH4s4s")
+UDP = struct.Struct("!HHHH")
+
+
+def _option(code, value):
+    return struct.pack("<HH", code, len(value)) + value + b"\0" * (-len(value) % 4)
+
+
+def _block(block_type, body):
+    length = 12 + len(body)
+    return struct.pack("<II", block_type, length) + body + struct.pack("<I", length)
+
+
+@functools.lru_cache(maxsize=None)
+def _ip(host):
+    return socket.inet_aton(socket.gethostbyname(host))
+
+
+def _checksum(header):
+    total = sum(struct.unpack(f"!{len(header) // 2}H", header))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+class Capture:
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.pending = collections.deque()  # append() and popleft() are thread-safe
+        self.ids = itertools.count()  # IPv4 identification field
+        self.written = 0
+        self.file.write(_block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1)
+                               + _option(OPT_ENDOFOPT, b"")))
+        for name in INTERFACES:
+            options = _option(IF_NAME, name.encode()) + _option(IF_TSRESOL, b"\x09") + _option(OPT_ENDOFOPT, b"")
+            self.file.write(_block(1, struct.pack("<HHI", LINKTYPE_RAW, 0, 0) + options))
+        self.running = True
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def record(self, data, src, dst, direction, dropped=False):
+        """Queue one datagram; src and dst are (host, port)"""
+        self.pending.append((time.time_ns(), bytes(data), src, dst, direction, dropped))
+
+    def wrap(self, sock):
+        return CapturedSocket(sock, self)
+
+    def _packet(self, data, src, dst):
+        length = IPV4.size + UDP.size + len(data)
+        header = IPV4.pack(0x45, 0, length, next(self.ids) & 0xFFFF, 0, 64, socket.IPPROTO_UDP, 0,
+                           _ip(src[0]), _ip(dst[0]))
+        header = header[:10] + struct.pack("!H", _checksum(header)) + header[12:]
+        return header + UDP.pack(src[1], dst[1], UDP.size + len(data), 0) + data
+
+    def _write_pending(self):
+        blocks = []
+        while self.pending:
+            timestamp, data, src, dst, direction, dropped = self.pending.popleft()
+            packet = self._packet(data, src, dst)
+            options = _option(EPB_FLAGS, struct.pack("<I", direction))
+            if dropped:
+                options += _option(OPT_COMMENT, b"dropped by the emulated channel")
+            body = (struct.pack("<IIIII", DROPPED if dropped else DELIVERED, timestamp >> 32,
+                                timestamp & 0xFFFFFFFF, len(packet), len(packet))
+                    + packet + b"\0" * (-len(packet) % 4) + options + _option(OPT_ENDOFOPT, b""))
+            blocks.append(_block(6, body))
+        if blocks:
+            self.file.write(b"".join(blocks))
+            self.file.flush()
+            self.written += len(blocks)
+
+    def _flush_loop(self):
+        while self.running:
+            self.wakeup.wait(FLUSH_INTERVAL)
+            self._write_pending()
+
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.wakeup.set()
+        self.thread.join()
+        self._write_pending()
+        self.file.close()
+
+
+class CapturedSocket:
+    """A socket that records its datagrams in a Capture; everything else is passed through"""
+    def __init__(self, sock, capture):
+        self.sock = sock
+        self.capture = capture
+        self.local = None  # Own address, known once the socket is bound
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def _local(self):
+        if self.local is None:
+            host, port = self.sock.getsockname()[:2]
+            if not port:
+                return host, port  # Not bound yet, sendto() binds it
+            self.local = ("127.0.0.1" if host == "0.0.0.0" else host), port
+        return self.local
+
+    def sendto(self, data, address):
+        sent = self.sock.sendto(data, address)
+        self.capture.record(data, self._local(), address, OUTBOUND)
+        return sent
+
+    def recvfrom(self, bufsize):
+        data, address = self.sock.recvfrom(bufsize)
+        self.capture.record(data, address, self._local(), INBOUND)
+        return data, address
+
+    def record_drop(self, data, address, outbound=True):
+        """A datagram to (outbound) or from `address` that the emulated channel dropped"""
+        if outbound:
+            self.capture.record(data, self._local(), address, OUTBOUND, dropped=True)
+        else:
+            self.capture.record(data, address, self._local(), INBOUND, dropped=True)
+
+
+def read(path):
+    """
+    (timestamp ns, interface, direction, (src host, port), (dst host, port), payload) of
+    every packet of a file written by Capture, in file order
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + 12 <= len(data):
+        block_type, length = struct.unpack_from("<II", data, offset)
+        if block_type == 6:
+            interface, high, low, captured, _ = struct.unpack_from("<IIIII", data, offset + 8)
+            packet = data[offset + 28:offset + 28 + captured]
+            options = offset + 28 + captured + (-captured % 4)
+            direction = 0
+            while options < offset + length - 4:
+                code, size = struct.unpack_from("<HH", data, options)
+                if code == OPT_ENDOFOPT:
+                    break
+                if code == EPB_FLAGS:
+                    direction = struct.unpack_from("<I", data, options + 4)[0] & 3
+                options += 4 + size + (-size % 4)
+            fields = IPV4.unpack_from(packet)
+            header = (fields[0] & 0x0F) * 4
+            src_port, dst_port, _, _ = UDP.unpack_from(packet, header)
+            yield ((high << 32) | low, interface, direction, (socket.inet_ntoa(fields[8]), src_port),
+                   (socket.inet_ntoa(fields[9]), dst_port), packet[header + UDP.size:])
+        offset += length
@@ -0,0 +1,259 @@
+"""
+Lossy channel emulator shared by the UDP servers of Assignment 1 and the data link
+entities of Assignment 3.
+
+A Channel decides for every datagram whether it is lost (Bernoulli or
+Gilbert-Elliott burst loss, or tail-dropped by a token-bucket bandwidth limit),
+whether a bit of it is flipped on the way (optional corruption) and when it should
+arrive (delay distribution, bandwidth queueing, optional reordering).
+Delivery is scheduled on a timer thread instead of sleeping in the caller, so the
+emulated latency no longer limits how fast a sender can push frames.
+
+All randomness comes from one random.Random(seed) per channel, so a run can be
+reproduced by passing the same seed. The clock and the scheduler are pluggable,
+which lets the same channel drive a virtual-time simulation.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+# ---------------------------------------------------------------- loss models
+
+class NoLoss:
+    def lost(self, rng):
+        return False
+
+
+class BernoulliLoss:
+    """Every datagram is lost independently with probability p"""
+    def __init__(self, p):
+        self.p = p
+
+    def lost(self, rng):
+        return rng.random() < self.p
+
+
+class GilbertElliottLoss:
+    """Two-state Markov chain: losses come in bursts while the channel is in the bad state"""
+    def __init__(self, p_good_to_bad, p_bad_to_good, loss_good=0.0, loss_bad=1.0):
+        self.p_good_to_bad = p_good_to_bad
+        self.p_bad_to_good = p_bad_to_good
+        self.loss_good = loss_good
+        self.loss_bad = loss_bad
+        self.bad = False
+
+    def lost(self, rng):
+        if self.bad:
+            if rng.random() < self.p_bad_to_good:
+                self.bad = False
+        elif rng.random() < self.p_good_to_bad:
+            self.bad = True
+        return rng.random() < (self.loss_bad if self.bad else self.loss_good)
+
+
+# ------------------------------------------------------- delay distributions
+
+class ConstantDelay:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def sample(self, rng):
+        return self.delay
+
+
+class UniformDelay:
+    """Uniform between low and high, like the T3/T4 delays of the assignment"""
+    def __init__(self, low, high):
+        self.low, self.high = low, high
+
+    def sample(self, rng):
+        return rng.uniform(self.low, self.high)
+
+
+class NormalDelay:
+    def __init__(self, mean, stdev):
+        self.mean, self.stdev = mean, stdev
+
+    def sample(self, rng):
+        return max(0.0, rng.gauss(self.mean, self.stdev))
+
+
+class ExponentialDelay:
+    def __init__(self, mean, minimum=0.0):
+        self.mean, self.minimum = mean, minimum
+
+    def sample(self, rng):
+        return self.minimum + rng.expovariate(1.0 / self.mean)
+
+
+# ---------------------------------------------------------------- bandwidth
+
+class TokenBucket:
+    """Rate limit in bytes/s with a burst allowance and an optional queue limit (tail drop)"""
+    def __init__(self, rate, burst, queue_limit=None):
+        self.rate = rate
+        self.burst = burst
+        self.queue_limit = queue_limit  # Bytes that may wait for tokens, None for unlimited
+        self.tokens = burst  # Negative while datagrams are queued waiting for tokens
+        self.last = None
+
+    def admit(self, now, size):
+        """Return the departure time of a datagram of `size` bytes, or None if it is tail-dropped"""
+        if self.last is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        backlog = -self.tokens if self.tokens < 0 else 0
+        if self.queue_limit is not None and self.tokens < size and backlog + size > self.queue_limit:
+            return None
+        self.tokens -= size
+        return now if self.tokens >= 0 else now - self.tokens / self.rate
+
+
+# ---------------------------------------------------------------- scheduler
+
+class TimerThread:
+    """Calls functions at given times of `clock` from a single background thread"""
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.heap = []
+        self.counter = itertools.count()  # Tie breaker keeps equal times in FIFO order
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = True
+
+    def call_at(self, when, fn, *args):
+        with self.condition:
+            heapq.heappush(self.heap, (when, next(self.counter), fn, args))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and (not self.heap or self.heap[0][0] > self.clock()):
+                    self.condition.wait(self.heap[0][0] - self.clock() if self.heap else None)
+                if not self.running:
+                    return
+                _, _, fn, args = heapq.heappop(self.heap)
+            try:
+                fn(*args)
+            except OSError:  # Socket closed while the datagram was in flight
+                pass
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.heap.clear()  # Calls that were still due are dropped with their arguments
+
+
+# ------------------------------------------------------------------ channel
+
+class Channel:
+    def __init__(self, loss=None, delay=None, bandwidth=None, reorder=0.0, reorder_delay=None,
+                 seed=None, clock=time.monotonic, scheduler=None, preserve_order=True, corrupt=0.0):
+        self.loss = loss or NoLoss()
+        self.delay = delay or ConstantDelay(0.0)
+        self.bandwidth = bandwidth  # TokenBucket or None
+        self.reorder = reorder  # Probability that a datagram is held back and overtaken
+        self.reorder_delay = reorder_delay or ConstantDelay(0.01)  # Extra delay of a reordered datagram
+        self.preserve_order = preserve_order  # Without reordering, never deliver out of send order
+        self.corrupt = corrupt  # Probability that one random bit of a delivered datagram is flipped
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.scheduler = scheduler  # Anything with call_at(when, fn, *args), created on first use
+        self.lock = threading.Lock()
+        self.last_delivery = float("-inf")
+        # Without delay, bandwidth limit or reordering datagrams are handed over in the caller
+        self.immediate = (isinstance(self.delay, ConstantDelay) and self.delay.delay == 0
+                          and bandwidth is None and not reorder)
+
+        # Statistics
+        self.sent = 0
+        self.lost = 0  # Dropped by the loss model
+        self.tail_dropped = 0  # Dropped by the bandwidth limit
+        self.reordered = 0
+        self.corrupted = 0
+
+    def _schedule(self, lossy, size):
+        """Return the delivery time of a datagram, or None if it is dropped"""
+        with self.lock:
+            now = self.clock()
+            self.sent += 1
+            if lossy and self.loss.lost(self.rng):
+                self.lost += 1
+                return None
+            when = now
+            if self.bandwidth is not None:
+                when = self.bandwidth.admit(now, size)
+                if when is None:
+                    self.tail_dropped += 1
+                    return None
+            when += self.delay.sample(self.rng)
+            if self.reorder and self.rng.random() < self.reorder:
+                self.reordered += 1
+                return when + self.reorder_delay.sample(self.rng)
+            if self.preserve_order:
+                when = max(when, self.last_delivery)
+                self.last_delivery = when
+            return when
+
+    def _corrupt(self, data):
+        with self.lock:
+            if self.rng.random() >= self.corrupt:
+                return data
+            self.corrupted += 1
+            bit = self.rng.randrange(len(data) * 8)
+        data = bytearray(data)
+        data[bit // 8] ^= 1 << (bit % 8)
+        return data
+
+    def transmit(self, deliver, *args, size=0, lossy=True):
+        """Call deliver(*args) after the emulated delay, return False if the datagram is lost"""
+        when = self._schedule(lossy, size)
+        if when is None:
+            return False
+        if self.corrupt and lossy and args and isinstance(args[0], (bytes, bytearray)) and args[0]:
+            args = (self._corrupt(args[0]),) + args[1:]  # By convention the datagram is the first argument
+        if self.immediate:
+            deliver(*args)
+            return True
+        if self.scheduler is None:
+            self.scheduler = TimerThread(self.clock)
+        self.scheduler.call_at(when, deliver, *args)
+        return True
+
+    def send(self, sock, data, address, lossy=True):
+        """Emulated sock.sendto(data, address), return False if the datagram is lost"""
+        if self.transmit(sock.sendto, data, address, size=len(data), lossy=lossy):
+            return True
+        if hasattr(sock, "record_drop"):  # capture.CapturedSocket
+            sock.record_drop(data, address)
+        return False
+
+    def drop(self, sock=None, data=None, address=None):
+        """Loss decision only, for a datagram `data` from `address` that `sock` already received"""
+        with self.lock:
+            self.sent += 1
+            if not self.loss.lost(self.rng):
+                return False
+            self.lost += 1
+        if hasattr(sock, "record_drop"):
+            sock.record_drop(data, address, outbound=False)
+        return True
+
+    def close(self):
+        if isinstance(self.scheduler, TimerThread):
+            self.scheduler.stop()
+
+
+def make_channel(drop_prob, min_delay=0.0, max_delay=0.0, seed=None, **kwargs):
+    """Channel with the Bernoulli loss and uniform delay used throughout the assignments"""
+    return Channel(loss=BernoulliLoss(drop_prob), delay=UniformDelay(min_delay, max_delay), seed=seed, **kwargs)
@@ -4,33 +4,80 @@ import time
 import random
 import queue
 
+from channel import make_channel
+import frame_codec
+from frame_codec import CorruptFrame
+from performance_monitor import PerformanceMonitor
+from rto import RtoEstimator
+import tracing
+
 class DataLinkEntity:
-    def __init__(self, my_port, peer_port):
+    """
+    Full-duplex Go-Back-N entity: sends its own packets to the peer and receives the
+    peer's packets over the same socket.
+
+    A single receive loop owns the socket and routes every datagram: data frames go to
+    the receiving side, their piggybacked ACK and pure ACK frames to the sending side.
+    Frames use the binary format of frame_codec.py: a DATA frame carries the current
+    ACK when there is one, an ACK frame is a pure ACK.
+    An in-order frame is not acknowledged at once: the ACK rides on the next data frame
+    to the peer, or goes out on its own when the delayed-ACK timer (ACK_DELAY) expires.
+    With piggyback=False every data frame is acknowledged by its own datagram.
+    Both directions are recorded in self.monitor, labelled entity=entity:<my_port>,
+    and frame events are traced with the port as link id.
+    """
+    def __init__(self, my_port, peer_port, channel=None, seed=None, window_size=7, seq_bits=3, piggyback=True,
+                 ack_delay=0.5, registry=None, tracer=None):
         # Configuration
         self.T1, self.T2 = 0.5, 1.5
         self.T3, self.T4 = 0.1, 0.3
         self.P = 0.1
-        self.WINDOW_SIZE = 7
-        self.SEQ_MODULO = 8
+        self.SEQ_MODULO = frame_codec.modulus(seq_bits)
+        frame_codec.check_gbn_window(window_size, self.SEQ_MODULO)
+        self.WINDOW_SIZE = window_size
         self.PACKET_COUNT = 10
-        
+        self.ACK_DELAY = ack_delay  # Longest time an ACK waits for a data frame to ride on
+        self.piggyback = piggyback
+
         # Socket setup
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.bind(('localhost', my_port))
         self.peer_address = ('localhost', peer_port)
-        
-        # Buffers and state
+        # Emulated link for outgoing datagrams: drop with P, deliver after T3..T4
+        self.channel = channel or make_channel(self.P, self.T3, self.T4, seed=seed)
+        self.rto = RtoEstimator(initial=1.0)  # Time to wait for an ACK before resending the window
+
+        # Buffers and state, shared by the threads under self.condition
+        self.condition = threading.Condition()
         self.outgoing_queue = queue.Queue()
-        self.expected_seq_num = 0
         self.base = 0
-        self.next_seq_num = 0   
-        
+        self.next_seq_num = 0
+        self.window_frames = {}  # seq -> packet of every unacknowledged frame, for retransmission
+        self.sent_at = {}  # seq -> time of the last transmission
+        self.retransmitted = set()  # seqs whose last transmission was a resend (no RTT sample, Karn's rule)
+        self.timer_start = None  # Retransmission timer of the oldest unacked frame
+        self.expected_seq_num = 0
+        self.ack_deadline = None  # When the pending ACK must go out on its own, None if no ACK is pending
+        self.received_packets = []
+
         # Performance metrics
         self.start_time = time.time()
         self.sent_times = []
         self.received_times = []
+        self.datagrams_sent = 0
+        self.pure_acks = 0
+        self.piggybacked_acks = 0
+        self.retransmissions = 0
+        self.corrupted = 0  # Datagrams that failed the CRC check
+        self.monitor = PerformanceMonitor(f"entity:{my_port}", registry)
+        self.tracer = tracer or tracing.TRACER
+        self.link = my_port
+        self.monitor.gauge("frames_in_flight", "Sent frames not yet acknowledged",
+                           lambda: self.next_seq_num - self.base)
+        self.monitor.gauge("rto_seconds", "Retransmission timeout", lambda: self.rto.rto)
 
         self.running = True
+        self.threads = []  # Started by start(), joined by close()
         self.successfully_transmitted = 0
 
     def packet_generator(self):
@@ -39,93 +86,181 @@ class DataLinkEntity:
             packet = f"Packet_{i}".encode()
             self.outgoing_queue.put(packet)
             self.sent_times.append(time.time() - self.start_time)
+            with self.condition:
+                self.condition.notify_all()
+
+    # ------------------------------------------------------------ sending side
+
+    def send_data(self, seq, now):
+        """Transmit frame `seq` from the window, with the current ACK on board"""
+        ack = None
+        if self.piggyback and self.expected_seq_num > 0:
+            ack = (self.expected_seq_num - 1) % self.SEQ_MODULO
+            if self.ack_deadline is not None:
+                self.piggybacked_acks += 1
+                self.ack_deadline = None
+        seq_num = seq % self.SEQ_MODULO
+        frame = frame_codec.encode_data(seq_num, self.window_frames[seq], ack)
+        self.sent_at[seq] = now
+        if self.timer_start is None:
+            self.timer_start = now
+        self.datagrams_sent += 1
+        sent = self.channel.send(self.socket, frame, self.peer_address)
+        self.monitor.record_send(dropped=not sent)
+        self.tracer.emit(tracing.SENT if sent else tracing.DROPPED, self.link, seq_num)
+
+    def on_ack(self, ack_num):
+        """Cumulative ACK from the peer, on its own or piggybacked"""
+        offset = (ack_num - self.base) % self.SEQ_MODULO
+        if offset >= self.next_seq_num - self.base:
+            return  # Duplicate or stale ACK
+        self.tracer.emit(tracing.ACK_RECEIVED, self.link, ack_num)
+        acked = self.base + offset
+        now = time.time()
+        self.rto.ack(now - self.sent_at[acked], acked in self.retransmitted)
+        for seq in range(self.base, acked + 1):
+            del self.window_frames[seq]
+            del self.sent_at[seq]
+            self.retransmitted.discard(seq)
+            self.received_times.append(now - self.start_time)
+            self.monitor.record_delay(now - self.start_time - self.sent_times[seq])
+        self.base = acked + 1
+        self.successfully_transmitted = self.base
+        self.timer_start = now if self.base < self.next_seq_num else None
 
     def transmitter(self):
-        sent_frames = {}
-        while self.running and self.successfully_transmitted < self.PACKET_COUNT:
-            while self.next_seq_num < self.base + self.WINDOW_SIZE and self.next_seq_num < self.PACKET_COUNT:
-                if not self.outgoing_queue.empty():
-                    packet = self.outgoing_queue.get()
-                    seq_num = self.next_seq_num % self.SEQ_MODULO
-                    frame = f"{seq_num}:{packet.decode()}".encode()
-                    
-                    time.sleep(random.uniform(self.T3, self.T4))
-                    
-                    if random.random() > self.P:
-                        self.socket.sendto(frame, self.peer_address)
-                        sent_frames[seq_num] = time.time()
-                        print(f"Sent frame {seq_num}")
-                    else:
-                        print(f"Frame {seq_num} dropped during transmission")
-                    
+        """Send new frames, retransmit on timeout and flush delayed ACKs"""
+        with self.condition:
+            while self.running:
+                now = time.time()
+                while (self.next_seq_num < self.base + self.WINDOW_SIZE and
+                       self.next_seq_num < self.PACKET_COUNT and not self.outgoing_queue.empty()):
+                    self.window_frames[self.next_seq_num] = self.outgoing_queue.get()
+                    self.send_data(self.next_seq_num, now)
                     self.next_seq_num += 1
 
-            try:
-                self.socket.settimeout(1.0)
-                ack, _ = self.socket.recvfrom(1024)
-                ack_num = int(ack.decode())
-                print(f"Received ACK {ack_num}")
-                
-                if ack_num >= self.base % self.SEQ_MODULO:
-                    self.base = ack_num + 1
-                    self.successfully_transmitted += 1
-                    self.received_times.append(time.time() - self.start_time)
-                    
-                    if self.successfully_transmitted >= self.PACKET_COUNT:
-                        self.running = False
-                        break
-                        
-            except socket.timeout:
-                print("Timeout occurred, resending window")
-                self.next_seq_num = self.base
+                if self.timer_start is not None and now - self.timer_start > self.rto.rto:
+                    self.tracer.emit(tracing.TIMEOUT, self.link, self.base % self.SEQ_MODULO)
+                    self.rto.backoff()
+                    self.monitor.record_timeout()
+                    self.timer_start = None
+                    for seq in range(self.base, self.next_seq_num):
+                        self.retransmitted.add(seq)
+                        self.send_data(seq, now)
+                        self.retransmissions += 1
+                        self.monitor.record_retransmission()
+
+                if self.ack_deadline is not None and now >= self.ack_deadline:
+                    self.send_ack()
+
+                deadlines = [d for d in (self.ack_deadline,
+                                         self.timer_start and self.timer_start + self.rto.rto) if d]
+                self.condition.wait(max(0.001, min(deadlines) - now) if deadlines else None)
+
+    # ---------------------------------------------------------- receiving side
+
+    def send_ack(self):
+        """Pure ACK of the last in-order frame"""
+        self.ack_deadline = None
+        ack_num = (self.expected_seq_num - 1) % self.SEQ_MODULO
+        ack = frame_codec.encode_ack(ack_num)
+        self.tracer.emit(tracing.ACK_SENT, self.link, ack_num)
+        self.datagrams_sent += 1
+        self.pure_acks += 1
+        self.monitor.record_ack()
+        self.channel.send(self.socket, ack, self.peer_address, lossy=False)  # ACKs are delayed, not lost
+
+    def on_data(self, seq_num, payload):
+        if seq_num == self.expected_seq_num % self.SEQ_MODULO:
+            self.tracer.emit(tracing.IN_ORDER, self.link, seq_num)
+            self.received_packets.append(payload)
+            self.monitor.record_receive()
+            self.expected_seq_num += 1
+            if not self.piggyback:
+                self.send_ack()
+            elif self.ack_deadline is None:
+                self.ack_deadline = time.time() + self.ACK_DELAY
+        else:
+            self.tracer.emit(tracing.OUT_OF_ORDER, self.link, seq_num, self.expected_seq_num % self.SEQ_MODULO)
+            if self.expected_seq_num > 0:
+                self.send_ack()  # Duplicate ACK right away, the peer is waiting for a retransmission
 
     def receiver(self):
+        """The only reader of the socket: route every datagram to the sending or receiving side"""
+        self.socket.settimeout(1.0)
         while self.running:
             try:
-                self.socket.settimeout(1.0)
-                frame, addr = self.socket.recvfrom(1024)
-                time.sleep(random.uniform(self.T3, self.T4))
-                
-                if random.random() < self.P:
-                    print("Frame dropped at receiver")
-                    continue
-                
-                seq_num = int(frame.decode().split(':')[0])
-                print(f"Received frame {seq_num}")
-                
-                if seq_num == self.expected_seq_num:
-                    print(f"Frame {seq_num} in sequence")
-                    ack = str(seq_num).encode()
-                    self.socket.sendto(ack, addr)
-                    self.expected_seq_num = (self.expected_seq_num + 1) % self.SEQ_MODULO
-                else:
-                    print(f"Out of sequence: expected {self.expected_seq_num}, got {seq_num}")
-                    last_ack = str((self.expected_seq_num - 1) % self.SEQ_MODULO).encode()
-                    self.socket.sendto(last_ack, addr)
-                    
-            except socket.timeout:
+                datagram, address = self.socket.recvfrom(1024)
                 if not self.running:
-                    break
+                    break  # Woken up by close()
+            except socket.timeout:
                 continue
-            except Exception as e:
-                print(f"Receiver error: {e}")
-                if not self.running:
-                    break
+            except OSError as e:
+                if self.running:
+                    print(f"Receiver error: {e}")
+                break
+
+            try:
+                kind, seq_num, ack_num, payload = frame_codec.decode(datagram)
+            except CorruptFrame:
+                self.tracer.emit(tracing.CORRUPTED, self.link)
+                self.corrupted += 1
+                self.monitor.record_corrupted()
+                continue
+            with self.condition:
+                if kind == frame_codec.ACK:
+                    self.on_ack(ack_num)
+                else:
+                    if self.channel.drop(self.socket, datagram, address):
+                        self.monitor.record_drop()
+                        self.tracer.emit(tracing.RECEIVER_DROP, self.link, seq_num)
+                        continue
+                    self.tracer.emit(tracing.RECEIVED, self.link, seq_num)
+                    if ack_num is not None:
+                        self.on_ack(ack_num)
+                    self.on_data(seq_num, bytes(payload))
+                self.condition.notify_all()
 
     def start(self):
-        threads = [
+        """Run until all own packets are acknowledged; keeps serving the peer until stop()"""
+        self.threads = threads = [
             threading.Thread(target=self.packet_generator),
             threading.Thread(target=self.transmitter),
             threading.Thread(target=self.receiver)
         ]
-        
+
         for thread in threads:
             thread.daemon = True
             thread.start()
-        
+
         # Wait for transmission completion
-        while self.successfully_transmitted < self.PACKET_COUNT:
-            time.sleep(0.1)
-        
-        self.running = False
+        with self.condition:
+            while self.successfully_transmitted < self.PACKET_COUNT:
+                self.condition.wait()
+
         print(f"Transmission complete. {self.successfully_transmitted} packets sent successfully.")
+        print(f"Retransmission timeout: {self.rto.describe()}")
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.monitor.close()  # Frees the entity label; describe_traffic() still works
+
+    def close(self):
+        """stop(), then join the threads and release the socket and the channel's timer thread"""
+        self.stop()
+        self.channel.close()
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)  # Wakes up receiver() blocked in recvfrom
+        except OSError:
+            pass  # ENOTCONN on an unconnected UDP socket, the blocked call returns anyway
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self.socket.close()
+
+    def describe_traffic(self):
+        return (f"{self.datagrams_sent} datagrams sent ({self.retransmissions} retransmissions, "
+                f"{self.pure_acks} pure ACKs, {self.piggybacked_acks} ACKs piggybacked), "
+                f"{len(self.received_packets)} packets received, {self.corrupted} corrupted")
@@ -4,21 +4,36 @@ import time
 import random
 import queue
 
+from channel import make_channel
+import frame_codec
+from frame_codec import CorruptFrame
+from performance_monitor import PerformanceMonitor
+from rto import RtoEstimator
+import tracing
+
 class DLEntity1:
-    def __init__(self):
+    def __init__(self, channel=None, seed=None, window_size=7, seq_bits=3, registry=None, tracer=None):
         self.T1, self.T2 = 0.5, 1.5
         self.T3, self.T4 = 0.1, 0.3
         self.P = 0.1
-        self.WINDOW_SIZE = 7
-        self.SEQ_MODULO = 8
+        self.SEQ_MODULO = frame_codec.modulus(seq_bits)
+        frame_codec.check_gbn_window(window_size, self.SEQ_MODULO)
+        self.WINDOW_SIZE = window_size
         self.PACKET_COUNT = 10
         
         self.sender_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.receiver_address = ('localhost', 8080)
+        self.channel = channel or make_channel(self.P, self.T3, self.T4, seed=seed)  # Emulated link to DL2
+        self.rto = RtoEstimator(initial=1.0)  # Time to wait for an ACK before resending the window
         self.packet_queue = queue.Queue()
         self.start_time = time.time()
         self.sent_times = []
         self.received_times = []
+        self.corrupted = 0  # ACKs that failed the CRC check
+        self.monitor = PerformanceMonitor("dl1", registry)
+        self.tracer = tracer or tracing.TRACER
+        self.link = 1  # Link id in the trace
+        self.monitor.gauge("rto_seconds", "Retransmission timeout", lambda: self.rto.rto)
         
     def packet_generator(self):
         for i in range(self.PACKET_COUNT):
@@ -30,7 +45,9 @@ class DLEntity1:
     def transmit(self):
         base = 0
         next_seq_num = 0
-        sent_frames = {}
+        sent_frames = {}  # seq_num -> time of the last transmission
+        retransmitted = set()  # seq_nums whose last transmission was a resend (no RTT sample, Karn's rule)
+        highest_sent = 0  # Frames below this have been sent before
         acked_frames = 0
         
         while acked_frames < self.PACKET_COUNT:
@@ -38,31 +55,46 @@ class DLEntity1:
                 if not self.packet_queue.empty():
                     packet = self.packet_queue.get()
                     seq_num = next_seq_num % self.SEQ_MODULO
-                    frame = (seq_num, packet)
-                    
-                    time.sleep(random.uniform(self.T3, self.T4))
+                    frame = frame_codec.encode_data(seq_num, packet)
+                    if next_seq_num < highest_sent:
+                        retransmitted.add(seq_num)
+                        self.monitor.record_retransmission()
+                    else:
+                        retransmitted.discard(seq_num)
+                        highest_sent = next_seq_num + 1
                     
-                    if random.random() > self.P:
-                        self.sender_socket.sendto(str(frame).encode(), self.receiver_address)
+                    sent = self.channel.send(self.sender_socket, frame, self.receiver_address)
+                    self.monitor.record_send(dropped=not sent)
+                    if sent:
                         sent_frames[seq_num] = time.time()
-                        print(f"DL1: Sent frame {seq_num}")
-                    else:
-                        print(f"DL1: Frame {seq_num} dropped")
+                    self.tracer.emit(tracing.SENT if sent else tracing.DROPPED, self.link, seq_num)
                     
                     next_seq_num += 1
             
             try:
-                self.sender_socket.settimeout(1.0)
+                self.sender_socket.settimeout(self.rto.rto)
                 ack, _ = self.sender_socket.recvfrom(1024)
-                ack_num = int(ack.decode())
-                print(f"DL1: Received ACK {ack_num}")
+                try:
+                    _, _, ack_num, _ = frame_codec.decode(ack)
+                except CorruptFrame:
+                    self.tracer.emit(tracing.CORRUPTED, self.link)
+                    self.corrupted += 1
+                    self.monitor.record_corrupted()
+                    continue
+                self.tracer.emit(tracing.ACK_RECEIVED, self.link, ack_num)
                 
-                if ack_num >= base % self.SEQ_MODULO:
-                    base = ack_num + 1
-                    acked_frames += 1
-                    self.received_times.append(time.time() - self.start_time)
+                offset = (ack_num - base) % self.SEQ_MODULO  # Position of the ACK in the window
+                if offset < next_seq_num - base:  # Cumulative ACK of base .. base + offset
+                    if ack_num in sent_frames:
+                        self.rto.ack(time.time() - sent_frames[ack_num], ack_num in retransmitted)
+                        self.monitor.record_delay(time.time() - sent_frames[ack_num])
+                    base += offset + 1
+                    acked_frames = base
+                    self.received_times.extend([time.time() - self.start_time] * (offset + 1))
             except socket.timeout:
-                print("DL1: Timeout, resending window")
+                self.tracer.emit(tracing.TIMEOUT, self.link, base % self.SEQ_MODULO)
+                self.rto.backoff()
+                self.monitor.record_timeout()
                 next_seq_num = base
                 
     def start(self):
@@ -74,3 +106,10 @@ class DLEntity1:
         
         generator_thread.join()
         transmit_thread.join()
+        print(f"DL1: Retransmission timeout: {self.rto.describe()}")
+
+    def close(self):
+        """Release the socket and the channel's timer thread and remove the dl1 metrics"""
+        self.channel.close()
+        self.monitor.close()
+        self.sender_socket.close()
@@ -1,50 +1,83 @@
 import socket
 import threading
-import time
-import random
-import queue
+
+from channel import make_channel
+import frame_codec
+from frame_codec import CorruptFrame
+from performance_monitor import PerformanceMonitor
+import tracing
 
 class DLEntity2:
-    def __init__(self):
+    def __init__(self, channel=None, seed=None, seq_bits=3, registry=None, tracer=None):
         self.T3, self.T4 = 0.1, 0.3
         self.P = 0.1
-        self.SEQ_MODULO = 8
+        self.SEQ_MODULO = frame_codec.modulus(seq_bits)  # Must match DLEntity1
         
         self.receiver_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.receiver_socket.bind(('localhost', 8080))
+        self.channel = channel or make_channel(self.P, self.T3, self.T4, seed=seed)  # Emulated link to DL1
         self.expected_seq_num = 0
         self.received_packets = []
+        self.corrupted = 0  # Frames that failed the CRC check
+        self.monitor = PerformanceMonitor("dl2", registry)
+        self.tracer = tracer or tracing.TRACER
+        self.link = 2  # Link id in the trace
+        self.running = True
         
     def receive(self):
-        while True:
+        while self.running:
             try:
                 frame, sender_address = self.receiver_socket.recvfrom(1024)
-                time.sleep(random.uniform(self.T3, self.T4))
+                if not self.running:
+                    break  # Woken up by close()
                 
-                frame_data = eval(frame.decode())
-                seq_num, packet = frame_data
-                print(f"DL2: Received frame {seq_num}")
+                try:
+                    _, seq_num, _, packet = frame_codec.decode(frame)
+                except CorruptFrame:
+                    self.tracer.emit(tracing.CORRUPTED, self.link)
+                    self.corrupted += 1
+                    self.monitor.record_corrupted()
+                    continue
+                self.tracer.emit(tracing.RECEIVED, self.link, seq_num)
                 
-                if random.random() < self.P:
-                    print(f"DL2: Frame {seq_num} dropped")
+                if self.channel.drop(self.receiver_socket, frame, sender_address):
+                    self.monitor.record_drop()
+                    self.tracer.emit(tracing.RECEIVER_DROP, self.link, seq_num)
                     continue
                 
                 if seq_num == self.expected_seq_num:
-                    print(f"DL2: Frame {seq_num} in order")
-                    self.received_packets.append(packet)
-                    ack = str(seq_num).encode()
-                    self.receiver_socket.sendto(ack, sender_address)
+                    self.tracer.emit(tracing.IN_ORDER, self.link, seq_num)
+                    self.received_packets.append(bytes(packet))
+                    self.monitor.record_receive()
+                    ack = frame_codec.encode_ack(seq_num)
+                    self.channel.send(self.receiver_socket, ack, sender_address, lossy=False)
+                    self.monitor.record_ack()
+                    self.tracer.emit(tracing.ACK_SENT, self.link, seq_num)
                     self.expected_seq_num = (self.expected_seq_num + 1) % self.SEQ_MODULO
                 else:
-                    print(f"DL2: Expected {self.expected_seq_num}, got {seq_num}")
-                    last_ack = str((self.expected_seq_num - 1) % self.SEQ_MODULO).encode()
-                    self.receiver_socket.sendto(last_ack, sender_address)
+                    self.tracer.emit(tracing.OUT_OF_ORDER, self.link, seq_num, self.expected_seq_num)
+                    last_ack = frame_codec.encode_ack((self.expected_seq_num - 1) % self.SEQ_MODULO)
+                    self.channel.send(self.receiver_socket, last_ack, sender_address, lossy=False)
+                    self.monitor.record_ack()
+                    self.tracer.emit(tracing.ACK_SENT, self.link, (self.expected_seq_num - 1) % self.SEQ_MODULO)
                     
             except Exception as e:
-                print(f"DL2: Error: {e}")
+                if self.running:
+                    print(f"DL2: Error: {e}")
                 break
     
     def start(self):
         receive_thread = threading.Thread(target=self.receive)
         receive_thread.start()
         receive_thread.join()
+
+    def close(self):
+        """Stop receive(), release the socket and the channel's timer thread and remove the dl2 metrics"""
+        self.running = False
+        self.channel.close()
+        self.monitor.close()
+        try:
+            self.receiver_socket.shutdown(socket.SHUT_RDWR)  # Wakes up receive() blocked in recvfrom
+        except OSError:
+            pass  # ENOTCONN on an unconnected UDP socket, the blocked call returns anyway
+        self.receiver_socket.close()
@@ -0,0 +1,87 @@
+"""
+Binary frame format shared by the data link entities of Assignment 3.
+
+Every frame is a fixed header in network byte order, the payload and a CRC32
+trailer over header and payload:
+    kind(1) flags(1) length(2) seq(4) ack(4) | payload(length) | crc32(4)
+kind is DATA or ACK. A DATA frame with FLAG_ACK set carries a piggybacked
+acknowledgement in `ack`; an ACK frame has no payload and only `ack` is used.
+Sequence and ACK numbers are unsigned 32-bit, enough for any seq_bits; modulus()
+and check_gbn_window() validate the sequence space and window of an entity.
+
+decode() checks length and CRC and returns the payload as a memoryview slice of
+the received datagram, so the payload is never copied. Anything that does not
+check out raises CorruptFrame, which the entities count separately from losses.
+"""
+import struct
+import zlib
+
+DATA = 1
+ACK = 2
+
+FLAG_ACK = 0x01  # The ack field of a DATA frame is valid
+
+HEADER = struct.Struct("!BBHII")
+CRC = struct.Struct("!I")
+OVERHEAD = HEADER.size + CRC.size
+MAX_PAYLOAD = 0xFFFF
+MAX_SEQ_BITS = 32  # Width of the seq and ack fields
+
+
+class CorruptFrame(ValueError):
+    pass
+
+
+def modulus(seq_bits):
+    """Size of the sequence number space of seq_bits-bit sequence numbers"""
+    if not 1 <= seq_bits <= MAX_SEQ_BITS:
+        raise ValueError(f"Sequence numbers need 1 to {MAX_SEQ_BITS} bits, got {seq_bits}")
+    return 1 << seq_bits
+
+
+def check_gbn_window(window_size, mod):
+    """Go-Back-N can only tell the windows apart if fewer than `mod` frames are outstanding"""
+    if not 0 < window_size < mod:
+        raise ValueError(f"Go-Back-N needs 0 < window size < MOD, got {window_size} with MOD {mod}")
+
+
+def encode_data(seq, payload, ack=None):
+    """DATA frame with sequence number `seq`, optionally carrying an ACK"""
+    length = len(payload)
+    if length > MAX_PAYLOAD:
+        raise ValueError(f"payload of {length} bytes does not fit in a frame")
+    frame = bytearray(OVERHEAD + length)
+    HEADER.pack_into(frame, 0, DATA, 0 if ack is None else FLAG_ACK, length, seq, ack or 0)
+    frame[HEADER.size:HEADER.size + length] = payload
+    CRC.pack_into(frame, HEADER.size + length, zlib.crc32(memoryview(frame)[:HEADER.size + length]))
+    return frame
+
+
+def encode_data_parts(seq, payload, ack=None):
+    """encode_data() as (header, payload, trailer) for socket.sendmsg, without copying the payload"""
+    length = len(payload)
+    if length > MAX_PAYLOAD:
+        raise ValueError(f"payload of {length} bytes does not fit in a frame")
+    header = HEADER.pack(DATA, 0 if ack is None else FLAG_ACK, length, seq, ack or 0)
+    return header, payload, CRC.pack(zlib.crc32(payload, zlib.crc32(header)))
+
+
+def encode_ack(ack):
+    frame = bytearray(OVERHEAD)
+    HEADER.pack_into(frame, 0, ACK, FLAG_ACK, 0, 0, ack)
+    CRC.pack_into(frame, HEADER.size, zlib.crc32(memoryview(frame)[:HEADER.size]))
+    return frame
+
+
+def decode(data):
+    """Return (kind, seq, ack, payload); ack is None if the frame carries none, payload is a memoryview"""
+    view = memoryview(data)
+    if len(view) < OVERHEAD:
+        raise CorruptFrame(f"frame of {len(view)} bytes is shorter than the header")
+    kind, flags, length, seq, ack = HEADER.unpack_from(view)
+    end = HEADER.size + length
+    if end + CRC.size != len(view) or kind not in (DATA, ACK):
+        raise CorruptFrame("bad frame length or kind")
+    if CRC.unpack_from(view, end)[0] != zlib.crc32(view[:end]):
+        raise CorruptFrame("CRC mismatch")
+    return kind, seq, ack if flags & FLAG_ACK else None, view[HEADER.size:end]
@@ -1,17 +1,44 @@
 from data_link_entity import DataLinkEntity
+from performance_monitor import start_http_server
+import tracing
+from capture import Capture
+import argparse
 import threading
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-piggyback", action="store_true", help="Acknowledge every frame with its own datagram")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--trace", default=None, help="Write a binary frame trace to this file, read it with tracing.py")
+    parser.add_argument("--trace-level", choices=tracing.LEVELS, default="info")
+    parser.add_argument("--capture", default=None, help="Write all datagrams to this pcapng file")
+    args = parser.parse_args()
+    if args.trace is not None:
+        tracing.configure(args.trace_level, args.trace)
+    if args.metrics_port is not None:
+        start_http_server(args.metrics_port)
+
     # Create two entities with different ports
-    entity1 = DataLinkEntity(my_port=8080, peer_port=8081)
-    entity2 = DataLinkEntity(my_port=8081, peer_port=8080)
-    
+    entity1 = DataLinkEntity(my_port=8080, peer_port=8081, piggyback=not args.no_piggyback)
+    entity2 = DataLinkEntity(my_port=8081, peer_port=8080, piggyback=not args.no_piggyback)
+    if args.capture is not None:
+        capture = Capture(args.capture)
+        entity1.socket = capture.wrap(entity1.socket)
+        entity2.socket = capture.wrap(entity2.socket)
+
     # Start both entities
     entity1_thread = threading.Thread(target=entity1.start)
     entity2_thread = threading.Thread(target=entity2.start)
-    
+
     entity1_thread.start()
     entity2_thread.start()
-    
+
     entity1_thread.join()
     entity2_thread.join()
+
+    # Both directions are done, so neither entity has to serve its peer any more
+    entity1.close()
+    entity2.close()
+    print(f"Entity 1: {entity1.describe_traffic()}")
+    print(f"Entity 2: {entity2.describe_traffic()}")
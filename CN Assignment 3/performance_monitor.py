@@ -1,29 +1,308 @@
+"""
+Metrics for the data link entities: counters, gauges and fixed-bucket histograms
+kept in a registry and exported in the Prometheus text format.
+
+Updates never take a lock. Every thread that touches a counter or histogram gets
+its own shard of it (a small list only that thread writes to), and a read adds up
+the shards of all threads. Gauges either hold the last value set or call a function
+when they are read, so state like the RTO costs nothing until it is scraped.
+
+Gauge functions keep their entity alive, so an entity removes its series from the
+registry when it is closed. Tools that create many short-lived entities give them
+a private MetricsRegistry instead of the global REGISTRY.
+
+Usage: start_http_server(9100), then curl http://127.0.0.1:9100/metrics
+"""
+import bisect
+import itertools
+import math
 import threading
-import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DELAY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Seconds
+
+
+class _Sharded:
+    """Base of the metrics that keep one shard per updating thread"""
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # Only taken the first time a thread updates the metric
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = [0] * self._size
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _merged(self):
+        with self._lock:
+            shards = list(self._shards)
+        return [sum(column) for column in zip(*shards)] if shards else [0] * self._size
+
+
+class Counter(_Sharded):
+    kind = "counter"
 
-class PerformanceMonitor:
     def __init__(self):
-        self.delays = []
-        self.retransmissions = 0
-        self.total_packets = 0
-        self.lock = threading.Lock()
-        
-    def record_delay(self, delay):
-        with self.lock:
-            self.delays.append(delay)
-    
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        self._shard()[0] += amount
+
+    def value(self):
+        return self._merged()[0]
+
+    def samples(self, name, labels):
+        yield name, labels, self.value()
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, function=None):
+        self.function = function  # Called on every read if given
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    def value(self):
+        return self.function() if self.function else self._value
+
+    def samples(self, name, labels):
+        yield name, labels, self.value()
+
+
+class Histogram(_Sharded):
+    """Counts of observations per bucket, plus their sum; the last bucket is +Inf"""
+    kind = "histogram"
+
+    def __init__(self, buckets=DELAY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(len(self.buckets) + 2)  # Bucket counts, +Inf, sum
+
+    def observe(self, value):
+        shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def counts(self):
+        """(bucket counts including +Inf, sum of the observations)"""
+        merged = self._merged()
+        return merged[:-1], merged[-1]
+
+    def count(self):
+        return sum(self.counts()[0])
+
+    def sum(self):
+        return self.counts()[1]
+
+    def samples(self, name, labels):
+        counts, total = self.counts()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            yield f"{name}_bucket", labels + (("le", bound),), cumulative
+        yield f"{name}_sum", labels, total
+        yield f"{name}_count", labels, cumulative
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return _format_value(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """Metric families by name; each family has one metric per set of label values"""
+    def __init__(self):
+        self._families = {}  # name -> (help, class, {labels: metric})
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, (help, cls, {}))
+            if family[1] is not cls:
+                raise ValueError(f"Metric {name} is already registered as a {family[1].kind}")
+            metrics = family[2]
+            if key not in metrics:
+                metrics[key] = cls(**kwargs)
+            return metrics[key]
+
+    def counter(self, name, help, **labels) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, function=None, **labels) -> Gauge:
+        gauge = self._get(Gauge, name, help, labels)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, help, buckets=DELAY_BUCKETS, **labels) -> Histogram:
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def has(self, **labels) -> bool:
+        """True if any metric carries all of the given label values"""
+        wanted = set(labels.items())
+        with self._lock:
+            return any(wanted <= set(key) for _, _, metrics in self._families.values() for key in metrics)
+
+    def remove(self, **labels):
+        """Drop every metric that carries all of the given label values, e.g. remove(entity="dl1")"""
+        wanted = set(labels.items())
+        with self._lock:
+            for name, (_, _, metrics) in list(self._families.items()):
+                for key in [key for key in metrics if wanted <= set(key)]:
+                    del metrics[key]
+                if not metrics:
+                    del self._families[name]
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            families = [(name, help, cls, list(metrics.items()))
+                        for name, (help, cls, metrics) in sorted(self._families.items())]
+        lines = []
+        for name, help, cls, metrics in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {cls.kind}")
+            for labels, metric in metrics:
+                for sample, sample_labels, value in metric.samples(name, labels):
+                    lines.append(f"{sample}{_format_labels(sample_labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()  # Used by every entity that is not given its own registry
+
+_entity_ids = itertools.count(1)
+
+
+def entity_name(role, sock=None):
+    """Label value for an entity: role and local port, or role and a running number without a socket"""
+    if sock is not None:
+        return f"{role}:{sock.getsockname()[1]}"
+    return f"{role}#{next(_entity_ids)}"
+
+
+class PerformanceMonitor:
+    """
+    The standard link metrics of one entity, labelled entity=<name>.
+
+    The sending side records every frame put on the link and every acknowledged
+    packet with its delivery delay, the receiving side every packet passed up and
+    every ACK. A full-duplex entity records both.
+
+    The name must be unique in the registry: a second monitor with the same name
+    raises ValueError instead of silently adding to the counters of the first.
+    close() removes the series again, which frees the name.
+    """
+    def __init__(self, entity, registry=None):
+        self.entity = entity
+        self.registry = registry or REGISTRY
+        if self.registry.has(entity=entity):
+            raise ValueError(f"Entity {entity!r} already has metrics in this registry, close() it first")
+        labels = {"entity": entity}
+        r = self.registry
+        self.frames_sent = r.counter("arq_frames_sent_total", "Data frames put on the link, including retransmissions", **labels)
+        self.retransmissions = r.counter("arq_retransmissions_total", "Data frames sent again", **labels)
+        self.timeouts = r.counter("arq_timeouts_total", "Retransmission timer expiries", **labels)
+        self.packets = r.counter("arq_packets_acked_total", "Packets acknowledged by the peer", **labels)
+        self.received = r.counter("arq_packets_received_total", "Packets passed up in order", **labels)
+        self.acks = r.counter("arq_acks_sent_total", "ACK frames sent", **labels)
+        self.dropped = r.counter("arq_frames_dropped_total", "Frames lost on the emulated link", **labels)
+        self.corrupted = r.counter("arq_frames_corrupted_total", "Frames that failed the CRC check", **labels)
+        self.delays = r.histogram("arq_delivery_delay_seconds",
+                                  "Time from the first transmission of a packet to its acknowledgement", **labels)
+
+    def gauge(self, name, help, function):
+        """Export the value of function() as the gauge arq_<name> of this entity"""
+        return self.registry.gauge(f"arq_{name}", help, function, entity=self.entity)
+
+    def close(self):
+        """Remove the series of this entity from the registry; the counters can still be read"""
+        self.registry.remove(entity=self.entity)
+
+    def record_send(self, dropped=False):
+        self.frames_sent.inc()
+        if dropped:
+            self.dropped.inc()
+
     def record_retransmission(self):
-        with self.lock:
-            self.retransmissions += 1
-    
+        self.retransmissions.inc()
+
+    def record_timeout(self):
+        self.timeouts.inc()
+
+    def record_delay(self, delay):
+        """One packet acknowledged `delay` seconds after it was first sent"""
+        self.packets.inc()
+        self.delays.observe(delay)
+
+    def record_receive(self):
+        self.received.inc()
+
+    def record_ack(self, dropped=False):
+        self.acks.inc()
+        if dropped:
+            self.dropped.inc()
+
+    def record_drop(self):
+        self.dropped.inc()
+
+    def record_corrupted(self):
+        self.corrupted.inc()
+
     def get_statistics(self):
-        with self.lock:
-            avg_delay = sum(self.delays) / len(self.delays) if self.delays else 0
-            retransmission_rate = self.retransmissions / self.total_packets if self.total_packets else 0
-            
-            return {
-                "average_delay": avg_delay,
-                "retransmission_rate": retransmission_rate,
-                "total_packets": self.total_packets,
-                "total_retransmissions": self.retransmissions
-            }
+        counts, total_delay = self.delays.counts()
+        total_packets = sum(counts)
+        retransmissions = self.retransmissions.value()
+        return {
+            "average_delay": total_delay / total_packets if total_packets else 0,
+            "retransmission_rate": retransmissions / total_packets if total_packets else 0,
+            "total_packets": total_packets,
+            "total_retransmissions": retransmissions,
+            "received_packets": self.received.value(),
+        }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.expose().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would flood the protocol output
+
+
+def start_http_server(port, host="127.0.0.1", registry=None):
+    """Serve the registry at http://host:port/metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry or REGISTRY
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
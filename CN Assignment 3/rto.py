@@ -0,0 +1,69 @@
+"""
+Adaptive retransmission timeout for the ARQ senders (RFC 6298).
+
+The smoothed round trip time and its variation are updated from every ACK of a
+frame that was sent exactly once; ACKs of retransmitted frames are ambiguous and
+skipped (Karn's rule). Every timeout doubles the RTO; as in Linux, the backoff is
+undone by the next ACK of new data, retransmitted or not, because it shows that the
+path works again (otherwise Go-Back-N, which retransmits every frame in the window,
+would rarely get a clean sample on a lossy link and keep backing off).
+
+An ACK of a retransmitted frame that arrives faster than the smallest RTT seen so
+far must answer an earlier copy, so that retransmission is counted as spurious.
+"""
+import math
+
+
+class RtoEstimator:
+    def __init__(self, initial=1.0, min_rto=0.05, max_rto=60.0, alpha=0.125, beta=0.25, k=4, granularity=0.001):
+        self.alpha = alpha  # Gain of the smoothed RTT
+        self.beta = beta  # Gain of the RTT variation
+        self.k = k
+        self.granularity = granularity  # Clock granularity G
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.base_rto = initial  # RTO before backoff
+        self.backoffs = 0
+        self.srtt = None
+        self.rttvar = None
+
+        # Statistics
+        self.min_rtt = math.inf
+        self.samples = 0
+        self.timeouts = 0
+        self.spurious = 0  # Retransmissions whose original was acknowledged after all
+
+    def sample(self, rtt):
+        """Update the estimate with the RTT of a frame that was not retransmitted"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.beta) * self.rttvar + self.beta * abs(self.srtt - rtt)
+            self.srtt = (1 - self.alpha) * self.srtt + self.alpha * rtt
+        self.base_rto = min(self.max_rto, max(self.min_rto, self.srtt + max(self.granularity, self.k * self.rttvar)))
+        self.min_rtt = min(self.min_rtt, rtt)
+        self.samples += 1
+
+    def ack(self, elapsed, retransmitted):
+        """A frame was acknowledged `elapsed` seconds after its last transmission"""
+        self.backoffs = 0
+        if not retransmitted:
+            self.sample(elapsed)
+        elif elapsed < self.min_rtt:
+            self.spurious += 1
+
+    def backoff(self):
+        """The retransmission timer expired: double the RTO"""
+        self.timeouts += 1
+        if self.base_rto * 2 ** self.backoffs < self.max_rto:
+            self.backoffs += 1
+
+    @property
+    def rto(self):
+        return min(self.max_rto, self.base_rto * 2 ** self.backoffs)
+
+    def describe(self):
+        srtt = "-" if self.srtt is None else f"{self.srtt * 1000:.1f} ms"
+        return (f"RTO {self.rto * 1000:.1f} ms, SRTT {srtt}, {self.samples} samples, "
+                f"{self.timeouts} timeouts, {self.spurious} spurious retransmissions")
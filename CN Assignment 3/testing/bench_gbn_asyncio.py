@@ -0,0 +1,95 @@
+# bench_gbn_asyncio.py
+"""
+Compare the threaded Go-Back-N links of goback_n.py with the asyncio links of
+gbn_asyncio.py: wall time, CPU time and peak thread count for the same number of
+links and packets.
+
+Usage: python bench_gbn_asyncio.py --links 50 --packets 30
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import threading
+import time
+
+from gbn_asyncio import run_links
+from goback_n import Receiver, Sender
+from performance_monitor import MetricsRegistry
+
+
+def run_threaded(links: int, num_packets: int, T1, T2, T3, T4, drop_prob, seed=None):
+    """One Sender and one Receiver per link, each with its own socket and threads"""
+    rng = random.Random(seed)
+    registry = MetricsRegistry()  # Not REGISTRY, which would keep every entity of every run
+    senders = []
+    receivers = []
+    threads = []
+    for _ in range(links):
+        sender = Sender("127.0.0.1", 0, None, 0, T1, T2, T3, T4, drop_prob, seed=rng.random(), registry=registry)
+        receiver = Receiver("127.0.0.1", 0, None, 0, T3, T4, drop_prob, seed=rng.random(), registry=registry)
+        sender.peer_addr = receiver.socket.getsockname()
+        receiver.peer_addr = sender.socket.getsockname()
+        receiver_thread = threading.Thread(target=receiver.start, daemon=True)
+        receiver_thread.start()
+        thread = threading.Thread(target=sender.start, args=(num_packets,), daemon=True)
+        thread.start()
+        senders.append(sender)
+        receivers.append((receiver, receiver_thread))
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    for sender in senders:
+        sender.close()  # Ends its receive loop and the timer thread of its channel
+    for receiver, receiver_thread in receivers:
+        receiver.close()
+        receiver_thread.join()
+    return senders
+
+
+def measure(run, *args):
+    """Run `run(*args)` with its output suppressed, return (senders, wall time, CPU time, peak extra threads)"""
+    baseline = peak = threading.active_count()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(0.05):
+            peak = max(peak, threading.active_count())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        senders = run(*args)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    done.set()
+    sampler.join()
+    return senders, wall, cpu, peak - baseline - 1  # Without the sampler itself
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Threaded vs asyncio Go-Back-N")
+    parser.add_argument("--links", type=int, default=50)
+    parser.add_argument("--packets", type=int, default=30, help="Packets per link")
+    parser.add_argument("--T1", type=float, default=0.01, help="Min packet generation interval")
+    parser.add_argument("--T2", type=float, default=0.03, help="Max packet generation interval")
+    parser.add_argument("--T3", type=float, default=0.005, help="Min transmission delay")
+    parser.add_argument("--T4", type=float, default=0.015, help="Max transmission delay")
+    parser.add_argument("--drop-prob", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    params = (args.links, args.packets, args.T1, args.T2, args.T3, args.T4, args.drop_prob, args.seed)
+
+    print(f"{args.links} links x {args.packets} packets, drop probability {args.drop_prob}")
+    print(f"{'engine':<10}{'wall s':>10}{'CPU s':>10}{'threads':>10}{'avg delay s':>14}{'retx/pkt':>10}")
+    for name, run in (("threaded", run_threaded), ("asyncio", lambda *a: asyncio.run(run_links(*a)))):
+        senders, wall, cpu, threads = measure(run, *params)
+        delays = [d for s in senders for d in s.delivery_times]
+        retransmissions = sum(s.retransmissions for s in senders) / (args.links * args.packets)
+        print(f"{name:<10}{wall:>10.2f}{cpu:>10.2f}{threads:>10}{sum(delays) / len(delays):>14.3f}{retransmissions:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# compare_arq.py
+"""
+Go-Back-N vs Selective Repeat under the same seeded loss, using the virtual-time
+simulation of gbn_sim.py. For every drop probability both protocols run on links
+built from the same seeds and the table shows retransmissions per delivered packet,
+average delivery delay and goodput.
+
+Usage: python compare_arq.py --packets 20000 --drop-probs 0.01 0.05 0.1 0.2 --seed 1
+"""
+import argparse
+
+from gbn_sim import SimulatedLink
+from selective_repeat import PROTOCOLS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Go-Back-N and Selective Repeat")
+    parser.add_argument("--packets", type=int, default=20000)
+    parser.add_argument("--T1", type=float, default=0.1, help="Min packet generation interval")
+    parser.add_argument("--T2", type=float, default=0.3, help="Max packet generation interval")
+    parser.add_argument("--T3", type=float, default=0.05, help="Min transmission delay")
+    parser.add_argument("--T4", type=float, default=0.15, help="Max transmission delay")
+    parser.add_argument("--drop-probs", type=float, nargs="+", default=[0.01, 0.05, 0.1, 0.2])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'drop':>6}{'protocol':>10}{'window':>8}{'retx/delivered':>16}{'avg delay s':>13}{'goodput pkt/s':>15}")
+    for drop_prob in args.drop_probs:
+        for protocol in sorted(PROTOCOLS):
+            link = SimulatedLink(args.T1, args.T2, args.T3, args.T4, drop_prob, args.seed, protocol)
+            sender = link.run(args.packets)
+            delivered = link.receiver.delivered
+            delay = sum(sender.delivery_times) / len(sender.delivery_times)
+            print(f"{drop_prob:>6}{protocol:>10}{sender.WINDOW_SIZE:>8}{sender.retransmissions / delivered:>16.3f}"
+                  f"{delay:>13.3f}{delivered / link.sim.now:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
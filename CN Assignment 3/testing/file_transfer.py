@@ -0,0 +1,268 @@
+# file_transfer.py
+"""
+Bulk file transfer over the Go-Back-N link of goback_n.py.
+
+The sender maps the file read-only and queues one frame per MTU-sized chunk. A
+frame only holds the file offset of its chunk: the payload is a memoryview slice of
+the mapping, taken again for every (re)transmission, so no chunk is ever buffered.
+Header, payload slice and CRC trailer go to socket.sendmsg() as separate buffers,
+with the CRC computed incrementally, so the chunk is not copied into a frame either.
+Where sendmsg() is missing (Windows) or the channel flips bits, which needs a
+mutable frame, every transmission still copies the chunk into a new frame.
+Frame 0 carries the file size, the MTU and the SHA-256 digest of the file. The
+receiver then preallocates the output file, maps it writable, copies every in-order
+payload straight from the datagram into the mapping, and finally checks the digest.
+If no datagram arrives for --idle seconds the receiver gives up and reports an
+incomplete transfer.
+
+Usage:
+    python file_transfer.py recv OUTPUT --port 5001 --peer-port 5000
+    python file_transfer.py send FILE --port 5000 --peer-port 5001
+    python file_transfer.py local FILE OUTPUT          (both ends in one process)
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+from goback_n import Frame, Receiver, Sender
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # frame_codec.py lives one level up
+import frame_codec
+import tracing
+
+META = struct.Struct("!QI32s")  # File size, MTU, SHA-256 digest
+META_OFFSET = -1  # Frame.data of the metadata frame
+SOCKET_BUFFER = 4 * 1024 * 1024  # Room for a whole window of full-size frames
+
+
+def enlarge_buffers(sock: socket.socket):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER)
+
+
+class FileSender(Sender):
+    def __init__(self, path: str, host: str, port: int, peer_host: str, peer_port: int,
+                 drop_prob: float = 0.0, T3: float = 0.0, T4: float = 0.0, mtu: int = 1400,
+                 channel=None, seed=None, **options):
+        super().__init__(host, port, peer_host, peer_port, 0.0, 0.0, T3, T4, drop_prob,
+                         channel=channel, seed=seed, **options)
+        enlarge_buffers(self.socket)
+        self.mtu = mtu
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.view = memoryview(self.map)
+        self.meta = META.pack(self.size, mtu, hashlib.sha256(self.map).digest())
+        self.frames = 1 + (self.size + mtu - 1) // mtu
+        self.elapsed = None
+        self.finished_at = None  # perf_counter() when the last frame was acknowledged
+        self.complete = threading.Event()
+        self.scatter = hasattr(self.socket, "sendmsg") and not self.channel.corrupt
+
+    def payload(self, frame: Frame):
+        if frame.data == META_OFFSET:
+            return self.meta
+        return self.view[frame.data:frame.data + self.mtu]
+
+    def send_frame(self, frame: Frame):
+        """Sender.send_frame, but the frame goes to sendmsg() in parts instead of being copied together"""
+        if not self.scatter:
+            return super().send_frame(frame)
+        parts = frame_codec.encode_data_parts(frame.seq_num, self.payload(frame))
+        sent = self.channel.transmit(self._sendmsg, parts, size=sum(len(part) for part in parts))
+        self.monitor.record_send(dropped=not sent)
+        self.tracer.emit(tracing.SENT if sent else tracing.DROPPED, self.link, frame.seq_num)
+
+    def _sendmsg(self, parts):
+        self.socket.sendmsg(parts, (), 0, self.peer_addr)
+
+    def transfer(self):
+        """Send the whole file and wait until every frame is acknowledged"""
+        self.enqueue(META_OFFSET)
+        for offset in range(0, self.size, self.mtu):
+            self.enqueue(offset)
+        self.threads = [threading.Thread(target=target, daemon=True)
+                        for target in (self.sender_thread, self.receiver_thread)]
+        for thread in self.threads:
+            thread.start()
+        start = time.perf_counter()
+        self.complete.wait()
+        self.elapsed = self.finished_at - start
+        self.running = False
+
+    def handle_ack(self, data: bytes):
+        super().handle_ack(data)
+        if self.send_base >= self.frames and not self.complete.is_set():
+            self.finished_at = time.perf_counter()
+            self.complete.set()
+
+    def print_statistics(self, num_packets: int = None):
+        mb_per_s = self.size / self.elapsed / 1e6 if self.elapsed else float("inf")
+        print(f"Sent {self.size} bytes in {self.frames} frames of up to {self.mtu} bytes "
+              f"in {self.elapsed:.3f} s: {mb_per_s:.2f} MB/s goodput")
+        print(f"Retransmissions: {self.retransmissions} ({self.retransmissions / self.frames:.2f} per frame), "
+              f"corrupted ACKs: {self.corrupted}")
+        print(f"Retransmission timeout: {self.rto.describe()}")
+
+    def close(self):
+        super().close()  # First, so no thread or pending transmission holds a slice of the mapping
+        self.view.release()
+        if self.size:
+            self.map.close()
+        self.file.close()
+
+
+class FileReceiver(Receiver):
+    def __init__(self, output: str, host: str, port: int, peer_host: str, peer_port: int,
+                 drop_prob: float = 0.0, T3: float = 0.0, T4: float = 0.0,
+                 channel=None, seed=None, **options):
+        super().__init__(host, port, peer_host, peer_port, T3, T4, drop_prob,
+                         channel=channel, seed=seed, **options)
+        enlarge_buffers(self.socket)
+        self.output = output
+        self.file = None
+        self.map = None
+        self.size = None  # Known once the metadata frame arrived
+        self.digest = None
+        self.position = 0
+        self.start_time = None
+        self.elapsed = None
+        self.ok = None  # Digest check result
+        self.done = threading.Event()
+
+    def on_deliver(self, payload: memoryview):
+        if self.size is None:
+            self.size, _, self.digest = META.unpack(payload)
+            self.start_time = time.perf_counter()
+            self.file = open(self.output, "w+b")
+            self.file.truncate(self.size)  # Preallocate, then write through the mapping
+            if self.size:
+                self.map = mmap.mmap(self.file.fileno(), self.size)
+            else:
+                self.finish()
+            return
+        end = self.position + len(payload)
+        self.map[self.position:end] = payload
+        self.position = end
+        if end >= self.size:
+            self.finish()
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.start_time
+        self.ok = hashlib.sha256(self.map if self.size else b"").digest() == self.digest
+        if self.map is not None:
+            self.map.flush()
+        self.done.set()
+
+    def receive(self, linger: float = 2.0, idle: float = 30.0) -> bool:
+        """
+        Receive until the file is complete, then keep answering retransmissions until the
+        link is quiet for `linger` seconds. Gives up after `idle` seconds without a
+        datagram before that, or when abort() is called; returns True if the file is complete.
+        """
+        self.socket.settimeout(idle)
+        while self.running:
+            try:
+                data, _ = self.socket.recvfrom(self.RECV_SIZE)
+            except (socket.timeout, OSError):
+                break  # Link quiet for `linger` (complete) or `idle` seconds (sender gone), or aborted
+            if not self.running:
+                break  # Woken up by abort()
+            self.handle_frame(data)
+            if self.done.is_set():
+                self.socket.settimeout(linger)
+        return self.done.is_set()
+
+    def abort(self):
+        """Make receive() return now, e.g. because the local sender failed"""
+        self.running = False
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)  # Wakes up recvfrom
+        except OSError:
+            pass  # ENOTCONN on an unconnected UDP socket, the blocked call returns anyway
+
+    def print_statistics(self):
+        if not self.done.is_set():
+            total = "?" if self.size is None else self.size
+            print(f"Transfer incomplete: received {self.position} of {total} bytes, {self.corrupted} corrupted frames")
+            return
+        mb_per_s = self.size / self.elapsed / 1e6 if self.elapsed else float("inf")
+        print(f"Received {self.size} bytes in {self.elapsed:.3f} s: {mb_per_s:.2f} MB/s, "
+              f"digest {'OK' if self.ok else 'MISMATCH'}, {self.corrupted} corrupted frames")
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        if self.file is not None:
+            self.file.close()
+        super().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="File transfer over Go-Back-N")
+    parser.add_argument("mode", choices=["send", "recv", "local"])
+    parser.add_argument("paths", nargs="+", help="FILE for send, OUTPUT for recv, FILE OUTPUT for local")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--peer-host", default="localhost")
+    parser.add_argument("--peer-port", type=int, default=5001)
+    parser.add_argument("--mtu", type=int, default=1400, help="Payload bytes per frame")
+    parser.add_argument("--window", type=int, default=64)
+    parser.add_argument("--seq-bits", type=int, default=16)
+    parser.add_argument("--congestion", action="store_true", help="Slow start and AIMD window")
+    parser.add_argument("--drop-prob", type=float, default=0.0)
+    parser.add_argument("--T3", type=float, default=0.0, help="Min transmission delay")
+    parser.add_argument("--T4", type=float, default=0.0, help="Max transmission delay")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--idle", type=float, default=30.0,
+                        help="Seconds without a datagram after which the receiver gives up")
+    args = parser.parse_args()
+    link = dict(drop_prob=args.drop_prob, T3=args.T3, T4=args.T4, seed=args.seed)
+    sender_options = dict(mtu=args.mtu, window_size=args.window, seq_bits=args.seq_bits,
+                          congestion=args.congestion, **link)
+
+    if args.mode == "send":
+        sender = FileSender(args.paths[0], args.host, args.port, args.peer_host, args.peer_port, **sender_options)
+        sender.transfer()
+        sender.print_statistics()
+        sender.close()
+    elif args.mode == "recv":
+        receiver = FileReceiver(args.paths[0], args.host, args.port, args.peer_host, args.peer_port,
+                                seq_bits=args.seq_bits, **link)
+        complete = receiver.receive(idle=args.idle)
+        receiver.print_statistics()
+        receiver.close()
+        if not complete:
+            sys.exit(1)
+    else:
+        path, output = args.paths
+        # Own seed for the ACK channel, so ACK losses are independent of frame losses
+        receiver_link = dict(link, seed=None if args.seed is None else args.seed + 1)
+        receiver = FileReceiver(output, "127.0.0.1", 0, None, 0, seq_bits=args.seq_bits, **receiver_link)
+        sender = FileSender(path, "127.0.0.1", 0, *receiver.socket.getsockname(), **sender_options)
+        receiver.peer_addr = sender.socket.getsockname()
+        thread = threading.Thread(target=receiver.receive, args=(0.5, args.idle))
+        thread.start()
+        try:
+            sender.transfer()
+        except BaseException:
+            receiver.abort()  # Otherwise the receiver thread would wait for frames that never come
+            raise
+        finally:
+            thread.join()
+        sender.print_statistics()
+        receiver.print_statistics()
+        sender.close()
+        receiver.close()
+        if not receiver.done.is_set():
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
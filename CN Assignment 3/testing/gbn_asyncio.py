@@ -0,0 +1,244 @@
+# gbn_asyncio.py
+"""
+asyncio transport for the Go-Back-N Sender/Receiver in goback_n.py.
+
+The threaded Sender needs three threads per link (generator, sender_thread polling
+every 0.1 s, receiver_thread). Here each endpoint is an asyncio DatagramProtocol
+around the same protocol objects: ACKs and frames are handled in
+datagram_received, the retransmission timer is a loop.call_later handle, channel
+delays are scheduled with loop.call_at, and generated packets wait in an
+asyncio.Queue until the window has room. Hundreds of links fit in one event loop.
+
+Usage: python gbn_asyncio.py --links 100 --packets 200
+"""
+import argparse
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import sys
+import time
+
+from goback_n import Receiver, Sender
+from selective_repeat import PROTOCOLS
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # channel.py lives one level up
+from channel import make_channel
+from performance_monitor import MetricsRegistry
+
+
+class LoopScheduler:
+    """
+    Channel scheduler that delivers datagrams from the event loop.
+
+    loop.call_at alone is not enough: the loop's timer heap does not keep callbacks
+    with equal deadlines in FIFO order, and an order-preserving channel hands out
+    equal deadlines whenever a datagram queues behind the previous one. Go-Back-N
+    with modulo-8 sequence numbers relies on that order, so the calls are kept in
+    our own (when, counter) heap and only the earliest one is armed on the loop.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.heap = []
+        self.counter = itertools.count()  # Tie breaker keeps equal times in FIFO order
+        self.timer = None
+        self.timer_at = None
+
+    def call_at(self, when: float, fn, *args):
+        heapq.heappush(self.heap, (when, next(self.counter), fn, args))
+        if self.timer_at is None or when < self.timer_at:
+            self._arm()
+
+    def _arm(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = self.timer_at = None
+        if self.heap:
+            self.timer_at = self.heap[0][0]
+            self.timer = self.loop.call_at(self.timer_at, self._run, self.timer_at)
+
+    def _run(self, due: float):
+        limit = max(due, self.loop.time())  # The loop may fire a timer up to its clock resolution early
+        heap = self.heap
+        while heap and heap[0][0] <= limit:
+            _, _, fn, args = heapq.heappop(heap)
+            fn(*args)
+        self.timer = None
+        self._arm()
+
+
+class SenderProtocol(asyncio.DatagramProtocol):
+    def __init__(self, sender: Sender, peer_addr):
+        self.sender = sender
+        self.peer_addr = peer_addr
+        self.transport = None
+        self.timer = None  # loop.call_later handle of the retransmission timer
+        self.timer_at = None
+        self.window_open = asyncio.Event()  # Set whenever an ACK may have made room in the window
+        self.idle = asyncio.Event()  # Set when every frame sent so far is acknowledged
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.sender.deliver = self.deliver
+
+    def deliver(self, data: bytes):
+        if not self.transport.is_closing():  # Frames still in the channel when the link shut down
+            self.transport.sendto(data, self.peer_addr)
+
+    def datagram_received(self, data, addr):
+        self.sender.handle_ack(data)
+        self.window_open.set()
+        self.pump()
+
+    def error_received(self, exc):
+        pass  # ICMP errors for lost peers: the retransmission timer takes care of it
+
+    def pump(self):
+        """Let the sender transmit and (re)arm its retransmission timer"""
+        sender = self.sender
+        sender.pump()
+        if sender.send_base == sender.next_seq_num:
+            self.idle.set()
+        else:
+            self.idle.clear()
+        deadline = sender.next_timeout()
+        if deadline is not None and (self.timer_at is None or deadline < self.timer_at):
+            if self.timer is not None:
+                self.timer.cancel()
+            loop = asyncio.get_running_loop()
+            self.timer_at = deadline
+            self.timer = loop.call_later(max(0.0, deadline - loop.time()) + 1e-6, self._on_timer)
+
+    def _on_timer(self):
+        self.timer = self.timer_at = None
+        self.pump()
+
+
+class ReceiverProtocol(asyncio.DatagramProtocol):
+    def __init__(self, receiver: Receiver, peer_addr):
+        self.receiver = receiver
+        self.peer_addr = peer_addr
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.receiver.deliver = self.deliver
+
+    def deliver(self, data: bytes):
+        if not self.transport.is_closing():
+            self.transport.sendto(data, self.peer_addr)
+
+    def datagram_received(self, data, addr):
+        self.receiver.handle_frame(data)
+
+    def error_received(self, exc):
+        pass
+
+
+class AsyncLink:
+    """One sender/receiver pair on localhost, both running in the current event loop"""
+    def __init__(self, T1: float, T2: float, T3: float, T4: float, drop_prob: float,
+                 seed=None, host="127.0.0.1", protocol="gbn", registry=None):
+        self.params = (T1, T2, T3, T4, drop_prob)
+        self.protocol = protocol  # "gbn" or "sr", see selective_repeat.PROTOCOLS
+        self.seed = seed
+        self.host = host
+        self.registry = registry or MetricsRegistry()  # Private, so finished links do not pile up in REGISTRY
+        self.sender = self.receiver = None
+
+    async def run(self, num_packets: int) -> Sender:
+        """Generate, send and acknowledge num_packets packets, return the Sender with its statistics"""
+        T1, T2, T3, T4, drop_prob = self.params
+        loop = asyncio.get_running_loop()
+        rng = random.Random(self.seed)
+        scheduler = LoopScheduler(loop)
+        forward = make_channel(drop_prob, T3, T4, seed=rng.random(), clock=loop.time, scheduler=scheduler)
+        reverse = make_channel(drop_prob, T3, T4, seed=rng.random(), clock=loop.time, scheduler=scheduler)
+        Sender, Receiver = PROTOCOLS[self.protocol]
+        sender = Sender(None, 0, None, 0, T1, T2, T3, T4, drop_prob,
+                        channel=forward, seed=rng.random(), clock=loop.time, registry=self.registry)
+        receiver = Receiver(None, 0, None, 0, T3, T4, drop_prob, channel=reverse, clock=loop.time,
+                            registry=self.registry)
+        self.sender, self.receiver = sender, receiver
+
+        # Bind both ends first, then tell each protocol where its peer lives
+        sender_protocol = SenderProtocol(sender, None)
+        receiver_protocol = ReceiverProtocol(receiver, None)
+        sender_transport, _ = await loop.create_datagram_endpoint(lambda: sender_protocol, local_addr=(self.host, 0))
+        receiver_transport, _ = await loop.create_datagram_endpoint(lambda: receiver_protocol, local_addr=(self.host, 0))
+        sender_protocol.peer_addr = receiver_transport.get_extra_info("sockname")
+        receiver_protocol.peer_addr = sender_transport.get_extra_info("sockname")
+        sender.link = receiver_protocol.peer_addr[1]  # Trace under the local ports, like the threaded entities
+        receiver.link = sender_protocol.peer_addr[1]
+
+        outgoing = asyncio.Queue()
+
+        async def generate():
+            for i in range(num_packets):
+                await asyncio.sleep(sender.rng.uniform(T1, T2))
+                await outgoing.put(f"Packet-{i}")
+
+        async def transmit():
+            for _ in range(num_packets):
+                data = await outgoing.get()
+                while sender.next_seq_num >= sender.send_base + sender.window():
+                    sender_protocol.window_open.clear()
+                    await sender_protocol.window_open.wait()
+                sender.enqueue(data)
+                sender_protocol.pump()
+            while sender.send_base < sender.next_seq_num:
+                sender_protocol.idle.clear()
+                await sender_protocol.idle.wait()
+
+        try:
+            await asyncio.gather(generate(), transmit())
+        finally:
+            if sender_protocol.timer is not None:
+                sender_protocol.timer.cancel()
+            sender_transport.close()
+            receiver_transport.close()
+        return sender
+
+
+async def run_links(links: int, num_packets: int, T1, T2, T3, T4, drop_prob, seed=None, protocol="gbn"):
+    """Run `links` independent links concurrently, return their senders"""
+    rng = random.Random(seed)
+    registry = MetricsRegistry()  # Shared by the links of this run only
+    tasks = [AsyncLink(T1, T2, T3, T4, drop_prob, seed=rng.random(), protocol=protocol,
+                       registry=registry).run(num_packets)
+             for _ in range(links)]
+    return await asyncio.gather(*tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Go-Back-N links on one asyncio event loop")
+    parser.add_argument("--links", type=int, default=1)
+    parser.add_argument("--packets", type=int, default=30, help="Packets per link")
+    parser.add_argument("--T1", type=float, default=0.1, help="Min packet generation interval")
+    parser.add_argument("--T2", type=float, default=0.3, help="Max packet generation interval")
+    parser.add_argument("--T3", type=float, default=0.05, help="Min transmission delay")
+    parser.add_argument("--T4", type=float, default=0.15, help="Max transmission delay")
+    parser.add_argument("--drop-prob", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--protocol", choices=sorted(PROTOCOLS), default="gbn",
+                        help="Go-Back-N or Selective Repeat")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    senders = asyncio.run(run_links(args.links, args.packets, args.T1, args.T2, args.T3, args.T4,
+                                    args.drop_prob, args.seed, args.protocol))
+    elapsed = time.perf_counter() - start
+    if args.links == 1:
+        senders[0].print_statistics(args.packets)
+    else:
+        delays = [d for s in senders for d in s.delivery_times]
+        retransmissions = sum(s.retransmissions for s in senders)
+        print(f"Links: {args.links}, packets per link: {args.packets}")
+        print(f"Average delivery delay: {sum(delays) / len(delays):.3f} seconds")
+        print(f"Average retransmissions per packet: {retransmissions / (args.links * args.packets):.2f}")
+    print(f"Finished in {elapsed:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
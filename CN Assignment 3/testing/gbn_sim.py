@@ -0,0 +1,165 @@
+# gbn_sim.py
+"""
+Virtual-time simulation of the Go-Back-N Sender/Receiver in goback_n.py.
+
+The unmodified protocol code runs on a simulated clock: packet generation, channel
+delays and retransmission timers are events in a heap, and the clock jumps from
+one event to the next. There are no sockets, threads or sleeps, so a run of 10^6
+frames takes seconds instead of days and is exactly reproducible from its seed.
+
+Usage: python gbn_sim.py --packets 1000000 --seed 1
+"""
+import argparse
+import heapq
+import itertools
+import os
+import random
+import sys
+import time
+
+from selective_repeat import PROTOCOLS
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # channel.py lives one level up
+from channel import TokenBucket, make_channel
+from performance_monitor import MetricsRegistry
+
+
+class Simulation:
+    """Event heap with a virtual clock, usable as a channel scheduler"""
+    def __init__(self):
+        self.now = 0.0
+        self.heap = []
+        self.counter = itertools.count()  # Tie breaker keeps equal times in FIFO order
+        self.events = 0
+
+    def clock(self) -> float:
+        return self.now
+
+    def call_at(self, when: float, fn, *args):
+        heapq.heappush(self.heap, (when, next(self.counter), fn, args))
+
+    def run(self):
+        """Process events in time order until none are left"""
+        heap = self.heap
+        pop = heapq.heappop
+        while heap:
+            when, _, fn, args = pop(heap)
+            self.now = when
+            fn(*args)
+            self.events += 1
+
+
+class SimulatedLink:
+    """
+    Wires a sender and a receiver of `protocol` ("gbn" or "sr") together through two
+    channels on a Simulation. window_size=None keeps the protocol's default window,
+    rate (bytes/s) puts a token-bucket bottleneck with queue_limit bytes of buffer on
+    the forward channel. Both ends export their metrics to `registry`, a private
+    MetricsRegistry of the link by default, so finished links do not pile up in REGISTRY.
+    """
+    def __init__(self, T1: float, T2: float, T3: float, T4: float, drop_prob: float, seed=None, protocol="gbn",
+                 window_size=None, seq_bits=3, congestion=False, rate=None, queue_limit=None, corrupt=0.0,
+                 registry=None):
+        self.sim = Simulation()
+        self.registry = registry or MetricsRegistry()
+        rng = random.Random(seed)  # Derive independent, reproducible seeds for every random stream
+        clock = self.sim.clock
+        bandwidth = None if rate is None else TokenBucket(rate, rate * 0.01, queue_limit)  # 10 ms burst
+        forward = make_channel(drop_prob, T3, T4, seed=rng.random(), clock=clock, scheduler=self.sim,
+                               bandwidth=bandwidth, corrupt=corrupt)
+        reverse = make_channel(drop_prob, T3, T4, seed=rng.random(), clock=clock, scheduler=self.sim,
+                               corrupt=corrupt)
+        Sender, Receiver = PROTOCOLS[protocol]
+        sender_options = {"seq_bits": seq_bits, "registry": self.registry}
+        receiver_options = {"seq_bits": seq_bits, "registry": self.registry}
+        if window_size is not None:
+            sender_options["window_size"] = window_size
+            if protocol == "sr":
+                receiver_options["window_size"] = window_size
+        if congestion:
+            sender_options["congestion"] = True
+        self.sender = Sender(None, 0, None, 0, T1, T2, T3, T4, drop_prob,
+                             channel=forward, seed=rng.random(), clock=clock, **sender_options)
+        self.receiver = Receiver(None, 0, None, 0, T3, T4, drop_prob, channel=reverse, clock=clock,
+                                 **receiver_options)
+        self.sender.deliver = self.receiver.handle_frame
+        self.receiver.deliver = self._on_ack
+        self.timer_at = None  # Time of the pending retransmission timer event
+        self.remaining = 0
+
+    def _arm_timer(self):
+        deadline = self.sender.next_timeout()
+        if deadline is not None and (self.timer_at is None or deadline < self.timer_at):
+            self.timer_at = deadline
+            self.sim.call_at(deadline + 1e-9, self._on_timer)  # Strictly after the deadline
+
+    def _on_timer(self):
+        self.timer_at = None
+        self.sender.pump()
+        self._arm_timer()
+
+    def _on_ack(self, data: bytes):
+        self.sender.handle_ack(data)
+        self.sender.pump()
+        self._arm_timer()
+
+    def _on_packet(self, i: int):
+        self.sender.enqueue(f"Packet-{i}")
+        self.sender.pump()
+        self._arm_timer()
+        if i + 1 < self.remaining:
+            self.sim.call_at(self.sim.now + self.sender.rng.uniform(self.sender.T1, self.sender.T2),
+                             self._on_packet, i + 1)
+
+    def run(self, num_packets: int):
+        """Simulate until all packets are generated and acknowledged"""
+        self.remaining = num_packets
+        if num_packets:
+            self.sim.call_at(self.sender.rng.uniform(self.sender.T1, self.sender.T2), self._on_packet, 0)
+        self.sim.run()
+        return self.sender
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual-time Go-Back-N simulation")
+    parser.add_argument("--packets", type=int, default=10000)
+    parser.add_argument("--T1", type=float, default=0.1, help="Min packet generation interval")
+    parser.add_argument("--T2", type=float, default=0.3, help="Max packet generation interval")
+    parser.add_argument("--T3", type=float, default=0.05, help="Min transmission delay")
+    parser.add_argument("--T4", type=float, default=0.15, help="Max transmission delay")
+    parser.add_argument("--drop-prob", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--protocol", choices=sorted(PROTOCOLS), default="gbn",
+                        help="Go-Back-N or Selective Repeat")
+    parser.add_argument("--window", type=int, default=None, help="Window size (default 7 for gbn, 4 for sr)")
+    parser.add_argument("--seq-bits", type=int, default=3, help="Sequence number width, 1 to 32 bits")
+    parser.add_argument("--congestion", action="store_true", help="Slow start and AIMD window (gbn only)")
+    parser.add_argument("--rate", type=float, default=None, help="Bottleneck rate of the forward channel in bytes/s")
+    parser.add_argument("--queue-limit", type=int, default=None, help="Bottleneck buffer in bytes")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="Probability of a bit error per frame")
+    parser.add_argument("--goodput", action="store_true", help="Print goodput and window per interval")
+    args = parser.parse_args()
+    if args.congestion and args.protocol != "gbn":
+        parser.error("--congestion is only available for gbn")
+
+    try:
+        link = SimulatedLink(args.T1, args.T2, args.T3, args.T4, args.drop_prob, args.seed, args.protocol,
+                             args.window, args.seq_bits, args.congestion, args.rate, args.queue_limit,
+                             args.corrupt)
+    except ValueError as e:
+        parser.error(str(e))
+    start = time.perf_counter()
+    sender = link.run(args.packets)
+    elapsed = time.perf_counter() - start
+    if args.goodput:
+        print(f"{'time s':>8}{'goodput pkt/s':>15}{'window':>8}")
+        for t, goodput, window in sender.goodput_series():
+            print(f"{t:>8.1f}{goodput:>15.1f}{window:>8}")
+    sender.print_statistics(args.packets)
+    print(f"Corrupted frames: {link.receiver.corrupted}")
+    print(f"Simulated {link.sim.now:.1f} s of link time ({link.sim.events} events) "
+          f"in {elapsed:.2f} s: {args.packets / elapsed * 60:,.0f} frames per minute")
+
+
+if __name__ == "__main__":
+    main()
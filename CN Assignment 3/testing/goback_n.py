@@ -1,16 +1,27 @@
 # goback_n.py
+import os
 import socket
+import sys
 import threading
 import queue
 import time
 import random
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Optional, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # channel.py lives one level up
+from channel import Channel, make_channel
+import frame_codec
+from frame_codec import CorruptFrame, check_gbn_window, modulus
+from performance_monitor import MetricsRegistry, PerformanceMonitor, entity_name
+from rto import RtoEstimator
+import tracing
+from tracing import Tracer
 
 @dataclass
 class Frame:
     seq_num: int
-    data: str
+    data: Union[str, int]  # Packet text, or the file offset of the payload in file_transfer.py
     is_ack: bool = False
     ack_num: Optional[int] = None
     
@@ -20,11 +31,33 @@ class Frame:
         return f"SEQ:{self.seq_num},DATA:{self.data}"
 
 class Sender:
-    def __init__(self, host: str, port: int, peer_host: str, peer_port: int,
-                 T1: float, T2: float, T3: float, T4: float, drop_prob: float):
+    """
+    Go-Back-N sender.
+
+    The protocol logic (enqueue, pump, handle_ack) only talks to the outside world
+    through self.clock and self.channel, so the same code runs with threads and a
+    socket in real time, or driven by gbn_sim.py on a virtual clock. Pass host=None
+    to create a sender without a socket.
+
+    With congestion=True the window is limited by a congestion window that grows by
+    slow start and then additively, and is cut on timeouts and triple duplicate ACKs
+    (AIMD); WINDOW_SIZE is then only the upper bound.
+
+    self.monitor exports the link metrics to `registry` (performance_monitor.REGISTRY
+    by default), labelled with the role and local port. Frame events go to `tracer`
+    (tracing.TRACER by default) with the local port as link id.
+    """
+    def __init__(self, host: Optional[str], port: int, peer_host: Optional[str], peer_port: int,
+                 T1: float, T2: float, T3: float, T4: float, drop_prob: float,
+                 channel: Optional[Channel] = None, seed: Optional[int] = None,
+                 clock: Callable[[], float] = time.time,
+                 window_size: int = 7, seq_bits: int = 3, congestion: bool = False,
+                 registry: Optional[MetricsRegistry] = None, tracer: Optional[Tracer] = None):
         # Configuration
-        self.WINDOW_SIZE = 7
-        self.MOD = 8  # Modulo-8 sequence numbering
+        self.MOD = modulus(seq_bits)  # Modulo-2^seq_bits sequence numbering, 8 by default
+        check_gbn_window(window_size, self.MOD)
+        self.WINDOW_SIZE = window_size
+        self.TIMEOUT = 2.0  # Initial retransmission timeout (seconds), adapted to the measured RTT
         
         # Network parameters
         self.T1 = T1  # Min packet generation interval
@@ -32,24 +65,55 @@ class Sender:
         self.T3 = T3  # Min transmission delay
         self.T4 = T4  # Max transmission delay
         self.drop_prob = drop_prob
+        self.clock = clock
+        # Emulated link: frames are dropped with drop_prob and delivered after T3..T4
+        streams = random.Random(seed)  # Separate seeds, so losses and generation intervals are independent
+        channel_seed, generation_seed = streams.random(), streams.random()
+        self.channel = channel or make_channel(drop_prob, T3, T4, seed=channel_seed, clock=clock)
+        self.rng = random.Random(generation_seed)  # Packet generation intervals
+        self.rto = RtoEstimator(initial=self.TIMEOUT)
         
         # Socket setup
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind((host, port))
+        self.socket = None
+        if host is not None:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.bind((host, port))
         self.peer_addr = (peer_host, peer_port)
+        self.deliver = self._sendto  # Called with each frame that survives the channel
         
         # Protocol state
         self.send_base = 0
         self.next_seq_num = 0
+        self.timer_start = None  # Start of the retransmission timer of the oldest unacked frame
         
+        # Congestion control
+        self.congestion = congestion
+        self.cwnd = 1.0  # Congestion window in frames
+        self.ssthresh = float(window_size)  # Slow start threshold
+        self.dup_acks = 0
+
         # Queues and buffers
         self.outgoing_queue = queue.Queue()
         self.window_frames = {}  # seq_num -> (frame, first_send_time)
+        self.sent_at = {}  # seq_num -> time of the last transmission
         
         # Statistics
         self.packets_sent = 0
         self.retransmissions = 0
+        self.corrupted = 0  # ACKs that failed the CRC check
         self.delivery_times = []
+        self.fast_retransmits = 0
+        self.goodput_interval = 1.0  # Seconds per goodput bucket
+        self.goodput = []  # Packets acknowledged in each interval since the first frame was sent
+        self.cwnd_trace = []  # Send window at the end of each interval
+        self.start_time = None
+        self.monitor = PerformanceMonitor(entity_name("sender", self.socket), registry)
+        self.monitor.gauge("frames_in_flight", "Sent frames not yet acknowledged",
+                           lambda: self.next_seq_num - self.send_base)
+        self.monitor.gauge("window_frames", "Current send window", self.window)
+        self.monitor.gauge("rto_seconds", "Retransmission timeout", lambda: self.rto.rto)
+        self.tracer = tracer or tracing.TRACER
+        self.link = tracing.link_id(self.socket)
         
         # adding more tracking parameters
         """
@@ -63,78 +127,180 @@ class Sender:
 
         # Control flag
         self.running = True
+        self.threads = []  # Started by start(), joined by close()
+        self.lock = threading.Lock()  # pump() and handle_ack() run in different threads in live mode
+
+    def _sendto(self, data: bytes):
+        self.socket.sendto(data, self.peer_addr)
+
+    def enqueue(self, data: str):
+        """Hand a packet from the network layer to the sender"""
+        self.outgoing_queue.put(data)
         
     def generate_packets(self, num_packets: int):
         """Generate packets at random intervals"""
         for i in range(num_packets):
-            delay = random.uniform(self.T1, self.T2)
+            delay = self.rng.uniform(self.T1, self.T2)
             time.sleep(delay)
-            self.outgoing_queue.put(f"Packet-{i}")
-            print(f"Generated packet {i}")
+            self.enqueue(f"Packet-{i}")
+            self.tracer.emit(tracing.GENERATED, self.link, i)
+
+    def payload(self, frame: Frame):
+        """Bytes that go on the wire for a frame"""
+        return frame.data.encode()
 
     def send_frame(self, frame: Frame):
         """Send a frame with simulated delay and drop probability"""
-        if random.random() >= self.drop_prob:  # Not dropped
-            delay = random.uniform(self.T3, self.T4)
-            time.sleep(delay)
-            self.socket.sendto(str(frame).encode(), self.peer_addr)
-            print(f"Sent {frame}")
-        else:
-            print(f"Dropped {frame}")
+        data = frame_codec.encode_data(frame.seq_num, self.payload(frame))
+        sent = self.channel.transmit(self.deliver, data, size=len(data))
+        self.monitor.record_send(dropped=not sent)
+        self.tracer.emit(tracing.SENT if sent else tracing.DROPPED, self.link, frame.seq_num)
+        if not sent and hasattr(self.socket, "record_drop"):  # Socket wrapped by capture.py
+            self.socket.record_drop(data, self.peer_addr)
+
+    def window(self) -> int:
+        """Number of frames that may be outstanding right now"""
+        if self.congestion:
+            return max(1, min(self.WINDOW_SIZE, int(self.cwnd)))
+        return self.WINDOW_SIZE
+
+    def fill_window(self):
+        """Send new frames while there is space in the window"""
+        window = self.window()
+        while (self.next_seq_num < self.send_base + window and
+               not self.outgoing_queue.empty()):
+            data = self.outgoing_queue.get()
+            frame = Frame(seq_num=self.next_seq_num % self.MOD, data=data)
+            now = self.clock()
+            if self.start_time is None:
+                self.start_time = now
+            self.window_frames[self.next_seq_num] = (frame, now)
+            self.sent_at[self.next_seq_num] = now
+            if self.timer_start is None:
+                self.timer_start = now
+            self.send_frame(frame)
+            self.next_seq_num += 1
+            self.packets_sent += 1
+
+    def check_timeouts(self):
+        """Retransmit the whole window if the oldest unacked frame timed out"""
+        if self.timer_start is None or self.clock() - self.timer_start <= self.rto.rto:
+            return
+        self.tracer.emit(tracing.TIMEOUT, self.link, self.send_base % self.MOD)
+        self.rto.backoff()
+        self.monitor.record_timeout()
+        if self.congestion:  # Multiplicative decrease, then slow start again
+            self.ssthresh = max(self.cwnd / 2, 2.0)
+            self.cwnd = 1.0
+        self.resend_window()
+
+    def resend_window(self):
+        """Retransmit all frames in the window and restart the timer"""
+        now = self.clock()
+        for resend_seq in range(self.send_base, self.next_seq_num):
+            if resend_seq in self.window_frames:
+                resend_frame, _ = self.window_frames[resend_seq]
+                self.send_frame(resend_frame)
+                self.sent_at[resend_seq] = now
+                self.retransmissions += 1
+                self.monitor.record_retransmission()
+        self.timer_start = now
+
+    def next_timeout(self) -> Optional[float]:
+        """Clock value at which check_timeouts() has work to do, None if no frame is outstanding"""
+        return None if self.timer_start is None else self.timer_start + self.rto.rto
+
+    def pump(self):
+        """One step of the sender: send what the window allows, then handle a timeout"""
+        with self.lock:
+            self.fill_window()
+            self.check_timeouts()
+
+    def parse_ack(self, data: bytes) -> Optional[int]:
+        """ACK number of a datagram from the receiver, None if it is corrupted or no ACK"""
+        try:
+            kind, _, ack_num, _ = frame_codec.decode(data)
+        except CorruptFrame:
+            self.corrupted += 1
+            self.monitor.record_corrupted()
+            self.tracer.emit(tracing.CORRUPTED, self.link)
+            return None
+        return ack_num if kind == frame_codec.ACK else None
+
+    def handle_ack(self, data: bytes):
+        """Process one datagram from the receiver"""
+        ack_num = self.parse_ack(data)
+        if ack_num is None:
+            return
+        self.tracer.emit(tracing.ACK_RECEIVED, self.link, ack_num)
+
+        with self.lock:
+            # The ACK carries the sequence number modulo MOD; map it back into the window
+            offset = (ack_num - self.send_base) % self.MOD
+            if offset >= self.next_seq_num - self.send_base:
+                if (self.congestion and offset == self.MOD - 1 and
+                        self.send_base < self.next_seq_num):  # Duplicate ACK of the frame before send_base
+                    self.dup_acks += 1
+                    if self.dup_acks == 3:  # Fast retransmit: the frame at send_base is most likely lost
+                        self.ssthresh = max(self.cwnd / 2, 2.0)
+                        self.cwnd = self.ssthresh
+                        self.fast_retransmits += 1
+                        self.resend_window()
+                return  # Duplicate or stale ACK
+            acked = self.send_base + offset
+            now = self.clock()
+            self.dup_acks = 0
+            if self.congestion:
+                for _ in range(offset + 1):  # Slow start below ssthresh, +1 frame per window above
+                    self.cwnd += 1.0 if self.cwnd < self.ssthresh else 1.0 / self.cwnd
+                self.cwnd = min(self.cwnd, float(self.WINDOW_SIZE))
+            self.record_goodput(now, offset + 1)
+            # Cumulative ACK: every frame up to `acked` was delivered in order
+            for seq in range(self.send_base, acked + 1):
+                first_sent = self.window_frames.pop(seq)[1]
+                last_sent = self.sent_at.pop(seq)
+                self.delivery_times.append(now - first_sent)
+                self.monitor.record_delay(now - first_sent)
+                if seq == acked or last_sent != first_sent:  # Earlier frames would give inflated RTT samples
+                    self.rto.ack(now - last_sent, retransmitted=last_sent != first_sent)
+            # Slide window
+            self.send_base = acked + 1
+            self.timer_start = now if self.send_base < self.next_seq_num else None
+
+    def record_goodput(self, now: float, count: int):
+        """Count `count` packets delivered at `now` in their goodput interval"""
+        index = int((now - self.start_time) / self.goodput_interval)
+        while len(self.goodput) <= index:  # Intervals without ACKs get the current window
+            self.goodput.append(0)
+            self.cwnd_trace.append(self.window())
+        self.goodput[index] += count
+        self.cwnd_trace[index] = self.window()
+
+    def goodput_series(self):
+        """(interval start, packets/s, window) for every interval, for watching the window converge"""
+        return [(i * self.goodput_interval, count / self.goodput_interval, window)
+                for i, (count, window) in enumerate(zip(self.goodput, self.cwnd_trace))]
 
     def sender_thread(self):
         """Handle sending frames using Go-Back-N protocol"""
         while self.running:
-            # Send new frames if window space available
-            while (self.next_seq_num < self.send_base + self.WINDOW_SIZE and
-                   not self.outgoing_queue.empty()):
-                data = self.outgoing_queue.get()
-                frame = Frame(seq_num=self.next_seq_num % self.MOD, data=data)
-                self.window_frames[self.next_seq_num] = (frame, time.time())
-                self.send_frame(frame)
-                self.next_seq_num += 1
-                self.packets_sent += 1
-
-            # Check for timeout and retransmit if necessary
-            current_time = time.time()
-            timeout = 2.0  # Adjust as needed
-            
-            for seq_num in range(self.send_base, self.next_seq_num):
-                if seq_num in self.window_frames:
-                    frame, send_time = self.window_frames[seq_num]
-                    if current_time - send_time > timeout:
-                        print(f"Timeout for frame {frame}")
-                        # Retransmit all frames in window
-                        for resend_seq in range(self.send_base, self.next_seq_num):
-                            if resend_seq in self.window_frames:
-                                resend_frame, _ = self.window_frames[resend_seq]
-                                self.send_frame(resend_frame)
-                                self.retransmissions += 1
-                        break
-
-            time.sleep(0.1)  # Prevent busy waiting
+            self.pump()
+            # Sleep until the retransmission timer expires, but poll the queue at least every 0.1 s
+            deadline = self.next_timeout()
+            time.sleep(0.1 if deadline is None else min(0.1, max(0.001, deadline - self.clock())))
 
     def receiver_thread(self):
         """Handle receiving acknowledgments"""
         while self.running:
             try:
                 data, _ = self.socket.recvfrom(1024)
-                ack_str = data.decode()
-                
-                if ack_str.startswith("ACK:"):
-                    ack_num = int(ack_str.split(":")[1])
-                    print(f"Received ACK for {ack_num}")
-                    
-                    if self.send_base <= ack_num < self.next_seq_num:
-                        delivery_time = time.time() - self.window_frames[ack_num][1]
-                        self.delivery_times.append(delivery_time)
-                        # Slide window
-                        self.send_base = ack_num + 1
-                        # Clean up window_frames
-                        for seq in list(self.window_frames.keys()):
-                            if seq < self.send_base:
-                                del self.window_frames[seq]
+                if not self.running:
+                    break  # Woken up by close()
+                self.handle_ack(data)
+                self.pump()  # The ACK may have opened the window, don't wait for sender_thread
             except Exception as e:
+                if not self.running:
+                    break
                 print(f"Error in receiver thread: {e}")
 
     def start(self, num_packets: int):
@@ -145,6 +311,7 @@ class Sender:
             threading.Thread(target=self.receiver_thread)
         ]
         
+        self.threads = threads
         for thread in threads:
             thread.daemon = True
             thread.start()
@@ -155,8 +322,25 @@ class Sender:
             time.sleep(0.1)
             
         self.running = False
+        self.print_statistics(num_packets)
         
-        # Print statistics
+    def close(self):
+        """Stop the threads of start(), release the socket and the channel's timer thread, drop the metrics"""
+        self.running = False
+        self.channel.close()
+        self.monitor.close()
+        if self.socket is not None:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)  # Wakes up a thread blocked in recvfrom
+            except OSError:
+                pass  # ENOTCONN on an unconnected UDP socket, the blocked call returns anyway
+            self.socket.close()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def print_statistics(self, num_packets: int):
+        """Print the parameters and the delay/retransmission statistics of a run"""
         if self.delivery_times:
             avg_delay = sum(self.delivery_times) / len(self.delivery_times)
             avg_retransmissions = self.retransmissions / num_packets
@@ -164,7 +348,8 @@ class Sender:
             print(f"\n---------------Statistics---------------")
             # printing the parameters used in this simulation
             print("Parameters used in this simulation:")
-            print(f"Window size: {self.WINDOW_SIZE}")
+            print(f"Window size: {self.WINDOW_SIZE}" + (" (congestion controlled)" if self.congestion else ""))
+            print(f"Sequence numbers: modulo {self.MOD}")
             print(f"Packet generation interval (T1): {self.T1} seconds")
             print(f"Packet generation interval (T2): {self.T2} seconds")
             print(f"Min transmission delay (T3): {self.T3} seconds")
@@ -174,69 +359,128 @@ class Sender:
 
             print(f"Total packets sent: {self.packets_sent}")
             print(f"Total retransmissions: {self.retransmissions}")
+            print(f"Corrupted ACKs: {self.corrupted}")
             print(f"Average delivery delay: {avg_delay:.3f} seconds")
             print(f"Average retransmissions per packet: {avg_retransmissions:.2f}")
+            print(f"Timeouts: {self.rto.timeouts}")
+            print(f"Spurious retransmissions: {self.rto.spurious}")
+            print(f"Retransmission timeout: {self.rto.describe()}")
+            if self.congestion:
+                print(f"Congestion window: {self.cwnd:.1f} frames, slow start threshold {self.ssthresh:.1f}, "
+                      f"{self.fast_retransmits} fast retransmits")
 
 class Receiver:
-    def __init__(self, host: str, port: int, peer_host: str, peer_port: int,
-                 T3: float, T4: float, drop_prob: float):
+    def __init__(self, host: Optional[str], port: int, peer_host: Optional[str], peer_port: int,
+                 T3: float, T4: float, drop_prob: float,
+                 channel: Optional[Channel] = None, seed: Optional[int] = None,
+                 clock: Callable[[], float] = time.time, seq_bits: int = 3,
+                 registry: Optional[MetricsRegistry] = None, tracer: Optional[Tracer] = None):
         # Configuration
-        self.MOD = 8  # Modulo-8 sequence numbering
+        self.MOD = modulus(seq_bits)  # Must match the sender
+        self.RECV_SIZE = 65535  # Large enough for any UDP datagram
         
         # Network parameters
         self.T3 = T3  # Min transmission delay
         self.T4 = T4  # Max transmission delay
         self.drop_prob = drop_prob
+        self.clock = clock
+        self.channel = channel or make_channel(drop_prob, T3, T4, seed=seed, clock=clock)  # Emulated link for ACKs
         
-        # Socket setup
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind((host, port))
+        # Socket setup (host=None for a receiver without socket, see Sender)
+        self.socket = None
+        if host is not None:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.bind((host, port))
         self.peer_addr = (peer_host, peer_port)
+        self.deliver = self._sendto  # Called with each ACK that survives the channel
         
         # Protocol state
         self.expected_seq_num = 0
         
+        # Statistics
+        self.delivered = 0  # Packets passed up in order
+        self.corrupted = 0  # Frames that failed the CRC check
+        self.monitor = PerformanceMonitor(entity_name("receiver", self.socket), registry)
+        self.tracer = tracer or tracing.TRACER
+        self.link = tracing.link_id(self.socket)
+
         # Control flag
         self.running = True
 
+    def _sendto(self, data: bytes):
+        self.socket.sendto(data, self.peer_addr)
+
     def send_ack(self, ack_num: int):
         """Send acknowledgment with simulated delay and drop probability"""
-        if random.random() >= self.drop_prob:  # Not dropped
-            delay = random.uniform(self.T3, self.T4)
-            time.sleep(delay)
-            ack_msg = f"ACK:{ack_num}"
-            self.socket.sendto(ack_msg.encode(), self.peer_addr)
-            print(f"Sent {ack_msg}")
+        data = frame_codec.encode_ack(ack_num)
+        sent = self.channel.transmit(self.deliver, data, size=len(data))
+        self.monitor.record_ack(dropped=not sent)
+        self.tracer.emit(tracing.ACK_SENT if sent else tracing.ACK_DROPPED, self.link, ack_num)
+        if not sent and hasattr(self.socket, "record_drop"):
+            self.socket.record_drop(data, self.peer_addr)
+
+    def parse_frame(self, data: bytes):
+        """(seq_num, payload) of a data frame from the sender, None if it is corrupted or no data frame"""
+        try:
+            kind, seq_num, _, payload = frame_codec.decode(data)
+        except CorruptFrame:
+            self.corrupted += 1
+            self.monitor.record_corrupted()
+            self.tracer.emit(tracing.CORRUPTED, self.link)
+            return None
+        if kind != frame_codec.DATA:
+            return None
+        self.tracer.emit(tracing.RECEIVED, self.link, seq_num)
+        return seq_num, payload
+
+    def handle_frame(self, data: bytes):
+        """Process one datagram from the sender"""
+        frame = self.parse_frame(data)
+        if frame is None:
+            return
+        seq_num, payload = frame
+
+        if seq_num == self.expected_seq_num % self.MOD:
+            self.tracer.emit(tracing.IN_ORDER, self.link, seq_num)
+            self.send_ack(seq_num)
+            self.expected_seq_num += 1
+            self.delivered += 1
+            self.monitor.record_receive()
+            self.on_deliver(payload)
         else:
-            print(f"Dropped ACK {ack_num}")
+            self.tracer.emit(tracing.OUT_OF_ORDER, self.link, seq_num, self.expected_seq_num % self.MOD)
+            if self.expected_seq_num > 0:
+                self.send_ack((self.expected_seq_num - 1) % self.MOD)
+
+    def on_deliver(self, payload: memoryview):
+        """Called with the payload of every frame passed up in order"""
 
     def receive_frames(self):
         """Main loop for receiving frames"""
         print("Receiver started, waiting for frames...")
         while self.running:
             try:
-                data, _ = self.socket.recvfrom(1024)
-                frame_str = data.decode()
-                
-                if frame_str.startswith("SEQ:"):
-                    # Parse frame datac:\Users\adity\Downloads\go back n.pdf
-                    seq_part, data_part = frame_str.split(",")
-                    seq_num = int(seq_part.split(":")[1])
-                    data = data_part.split(":")[1]
-                    
-                    print(f"Received frame {seq_num} with data: {data}")
-                    
-                    if seq_num == self.expected_seq_num % self.MOD:
-                        print(f"Frame {seq_num} received in order")
-                        self.send_ack(seq_num)
-                        self.expected_seq_num += 1
-                    else:
-                        print(f"Frame {seq_num} out of order, expected {self.expected_seq_num % self.MOD}")
-                        if self.expected_seq_num > 0:
-                            self.send_ack(self.expected_seq_num - 1)
+                data, _ = self.socket.recvfrom(self.RECV_SIZE)
+                if not self.running:
+                    break  # Woken up by close()
+                self.handle_frame(data)
             except Exception as e:
+                if not self.running:
+                    break
                 print(f"Error in receiver: {e}")
 
     def start(self):
         """Start the receiver"""
-        self.receive_frames()
\ No newline at end of file
+        self.receive_frames()
+
+    def close(self):
+        """Stop the threads of start(), release the socket and the channel's timer thread, drop the metrics"""
+        self.running = False
+        self.channel.close()
+        self.monitor.close()
+        if self.socket is not None:
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)  # Wakes up a thread blocked in recvfrom
+            except OSError:
+                pass  # ENOTCONN on an unconnected UDP socket, the blocked call returns anyway
+            self.socket.close()
@@ -0,0 +1,161 @@
+# selective_repeat.py
+"""
+Selective Repeat sender and receiver, drop-in replacements for the Go-Back-N
+Sender/Receiver in goback_n.py.
+
+Every frame has its own retransmission timer and is acknowledged individually, so a
+loss only costs the lost frame instead of the whole window. The receiver buffers
+frames that arrive out of order and passes them up once the gap is filled. With a
+window of W frames the receiver must never confuse a new frame with a retransmitted
+old one, which requires W <= MOD / 2.
+"""
+import os
+import sys
+import time
+from typing import Callable, Optional
+
+from goback_n import Frame, Receiver, Sender, modulus
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # channel.py lives one level up
+from channel import Channel
+from performance_monitor import MetricsRegistry
+import tracing
+from tracing import Tracer
+
+
+def check_window(window_size: int, mod: int):
+    if not 0 < window_size <= mod // 2:
+        raise ValueError(f"Selective Repeat needs 0 < window size <= MOD/2, got {window_size} with MOD {mod}")
+
+
+class SRSender(Sender):
+    def __init__(self, host: Optional[str], port: int, peer_host: Optional[str], peer_port: int,
+                 T1: float, T2: float, T3: float, T4: float, drop_prob: float,
+                 channel: Optional[Channel] = None, seed: Optional[int] = None,
+                 clock: Callable[[], float] = time.time, window_size: int = 4, seq_bits: int = 3,
+                 registry: Optional[MetricsRegistry] = None, tracer: Optional[Tracer] = None):
+        mod = modulus(seq_bits)
+        check_window(window_size, mod)
+        super().__init__(host, port, peer_host, peer_port, T1, T2, T3, T4, drop_prob,
+                         channel=channel, seed=seed, clock=clock, window_size=window_size, seq_bits=seq_bits,
+                         registry=registry, tracer=tracer)
+        self.acked = set()  # Frames in the window that are acknowledged but not yet below send_base
+        # seq_num -> time of the last transmission of an unacked frame, kept in order of that time
+        # (a retransmitted frame moves to the end) so the oldest timer is always the first entry
+        self.timers = {}
+
+    def fill_window(self):
+        """Send new frames while there is space in the window, each with its own timer"""
+        while (self.next_seq_num < self.send_base + self.WINDOW_SIZE and
+               not self.outgoing_queue.empty()):
+            data = self.outgoing_queue.get()
+            frame = Frame(seq_num=self.next_seq_num % self.MOD, data=data)
+            now = self.clock()
+            if self.start_time is None:
+                self.start_time = now
+            self.window_frames[self.next_seq_num] = (frame, now)
+            self.timers[self.next_seq_num] = now
+            self.send_frame(frame)
+            self.next_seq_num += 1
+            self.packets_sent += 1
+
+    def check_timeouts(self):
+        """Retransmit only the frames whose own timer expired"""
+        now = self.clock()
+        expired = []
+        for seq, sent_at in self.timers.items():
+            if now - sent_at <= self.rto.rto:
+                break  # Every later timer was started even later
+            expired.append(seq)
+        if expired:
+            self.rto.backoff()  # Once per round, not once per frame
+            self.monitor.record_timeout()
+        for seq in expired:
+            frame, _ = self.window_frames[seq]
+            self.tracer.emit(tracing.TIMEOUT, self.link, frame.seq_num)
+            self.send_frame(frame)
+            self.retransmissions += 1
+            self.monitor.record_retransmission()
+            del self.timers[seq]
+            self.timers[seq] = now
+
+    def next_timeout(self) -> Optional[float]:
+        return self.timers[next(iter(self.timers))] + self.rto.rto if self.timers else None
+
+    def handle_ack(self, data: bytes):
+        """Process one datagram from the receiver: an ACK acknowledges exactly one frame"""
+        ack_num = self.parse_ack(data)
+        if ack_num is None:
+            return
+        self.tracer.emit(tracing.ACK_RECEIVED, self.link, ack_num)
+
+        with self.lock:
+            offset = (ack_num - self.send_base) % self.MOD
+            if offset >= self.next_seq_num - self.send_base:
+                return  # ACK of a frame from the previous window
+            seq = self.send_base + offset
+            if seq not in self.timers:
+                return  # Duplicate ACK
+            now = self.clock()
+            last_sent = self.timers.pop(seq)
+            first_sent = self.window_frames[seq][1]
+            self.rto.ack(now - last_sent, retransmitted=last_sent != first_sent)
+            self.acked.add(seq)
+            # Slide the window over the acknowledged prefix: those frames are now passed up in order
+            base = self.send_base
+            while self.send_base in self.acked:
+                self.acked.remove(self.send_base)
+                delay = now - self.window_frames.pop(self.send_base)[1]
+                self.delivery_times.append(delay)
+                self.monitor.record_delay(delay)
+                self.send_base += 1
+            if self.send_base > base:
+                self.record_goodput(now, self.send_base - base)
+
+
+class SRReceiver(Receiver):
+    def __init__(self, host: Optional[str], port: int, peer_host: Optional[str], peer_port: int,
+                 T3: float, T4: float, drop_prob: float,
+                 channel: Optional[Channel] = None, seed: Optional[int] = None,
+                 clock: Callable[[], float] = time.time, window_size: int = 4, seq_bits: int = 3,
+                 registry: Optional[MetricsRegistry] = None, tracer: Optional[Tracer] = None):
+        super().__init__(host, port, peer_host, peer_port, T3, T4, drop_prob,
+                         channel=channel, seed=seed, clock=clock, seq_bits=seq_bits, registry=registry,
+                         tracer=tracer)
+        check_window(window_size, self.MOD)
+        self.WINDOW_SIZE = window_size
+        self.buffer = {}  # Absolute sequence number -> data of frames received ahead of a gap
+        self.buffered = 0  # Frames that arrived out of order and were kept
+
+    def handle_frame(self, data: bytes):
+        """Process one datagram from the sender"""
+        frame = self.parse_frame(data)
+        if frame is None:
+            return
+        seq_num, data = frame
+
+        offset = (seq_num - self.expected_seq_num) % self.MOD
+        if offset >= self.WINDOW_SIZE:
+            # Retransmission of a frame we already passed up: its ACK was lost, send it again
+            self.send_ack(seq_num)
+            return
+        seq = self.expected_seq_num + offset
+        if seq not in self.buffer:
+            self.buffer[seq] = data
+            if offset:
+                self.buffered += 1
+                self.tracer.emit(tracing.BUFFERED, self.link, seq_num, self.expected_seq_num % self.MOD)
+        self.send_ack(seq_num)
+        # Pass up everything that is now in order
+        while self.expected_seq_num in self.buffer:
+            payload = self.buffer.pop(self.expected_seq_num)
+            self.expected_seq_num += 1
+            self.delivered += 1
+            self.monitor.record_receive()
+            self.on_deliver(payload)
+
+
+PROTOCOLS = {  # Name -> (sender class, receiver class), for picking the ARQ scheme per link
+    "gbn": (Sender, Receiver),
+    "sr": (SRSender, SRReceiver),
+}
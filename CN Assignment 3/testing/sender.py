@@ -1,7 +1,27 @@
 # sender.py
-from goback_n import Sender
+import argparse
+
+from selective_repeat import PROTOCOLS
+from performance_monitor import start_http_server
+import tracing
+from capture import Capture
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--protocol", choices=sorted(PROTOCOLS), default="gbn",
+                        help="Go-Back-N or Selective Repeat, must match the receiver")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--trace", default=None, help="Write a binary frame trace to this file, read it with tracing.py")
+    parser.add_argument("--trace-level", choices=tracing.LEVELS, default="info")
+    parser.add_argument("--capture", default=None, help="Write all datagrams to this pcapng file")
+    args = parser.parse_args()
+    if args.trace is not None:
+        tracing.configure(args.trace_level, args.trace)
+    if args.metrics_port is not None:
+        start_http_server(args.metrics_port)
+    Sender = PROTOCOLS[args.protocol][0]
+
     # Create sender entity
     sender = Sender(
         host="localhost", 
@@ -15,6 +35,9 @@ def main():
         drop_prob=0.01  # 1% packet drop probability
     )
     
+    if args.capture is not None:
+        sender.socket = Capture(args.capture).wrap(sender.socket)
+
     print("Sender starting...")
     try:
         sender.start(num_packets=30)  # can test with 100 packets for testing
@@ -0,0 +1,176 @@
+# sweep.py
+"""
+Parameter sweep over the ARQ protocols.
+
+Every combination of the given T1..T4, drop probabilities, window sizes, sequence
+number bits, protocols and seeds is one point. Combinations whose window does not fit
+the sequence space of the protocol are skipped up front. Points run in parallel in a process pool; each one is an
+isolated sender/receiver pair on its own free localhost ports (or, with
+--engine sim, a virtual-time gbn_sim link). Each finished point is appended to the
+results file right away (.csv, or .jsonl for JSON lines), and points already in the
+file are skipped, so an interrupted sweep continues where it stopped.
+
+Usage: python sweep.py results.csv --drop-prob 0.05 0.1 0.2 --window 4 7 --protocol gbn sr --seeds 3
+"""
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import threading
+import time
+
+from gbn_sim import SimulatedLink
+from goback_n import check_gbn_window, modulus
+from performance_monitor import MetricsRegistry
+from selective_repeat import PROTOCOLS, check_window
+
+PARAMETERS = ["protocol", "window", "seq_bits", "T1", "T2", "T3", "T4", "drop_prob", "seed", "packets", "engine"]
+METRICS = ["avg_delay", "retransmissions_per_packet", "goodput", "timeouts", "elapsed"]
+
+
+def point_key(point: dict):
+    """Identity of a point, with values normalized the same way as when read back from CSV"""
+    return tuple(str(point[name]) for name in PARAMETERS)
+
+
+def check_point(protocol: str, window: int, seq_bits: int):
+    """Raise ValueError if `window` does not fit the seq_bits-bit sequence space of `protocol`"""
+    mod = modulus(seq_bits)
+    (check_window if protocol == "sr" else check_gbn_window)(window, mod)
+
+
+def run_live(point: dict):
+    """Sender and receiver threads on two free localhost ports, return (sender, link time)"""
+    Sender, Receiver = PROTOCOLS[point["protocol"]]
+    common = {"seq_bits": point["seq_bits"], "registry": MetricsRegistry()}  # Not the global REGISTRY
+    options = dict(common, window_size=point["window"])
+    receiver = Receiver("127.0.0.1", 0, None, 0, point["T3"], point["T4"], point["drop_prob"],
+                        seed=point["seed"] + 1, **(options if point["protocol"] == "sr" else common))
+    sender = Sender("127.0.0.1", 0, *receiver.socket.getsockname(), point["T1"], point["T2"],
+                    point["T3"], point["T4"], point["drop_prob"], seed=point["seed"], **options)
+    receiver.peer_addr = sender.socket.getsockname()
+    with contextlib.redirect_stdout(io.StringIO()):  # start() prints the statistics
+        receiver_thread = threading.Thread(target=receiver.start, daemon=True)
+        receiver_thread.start()
+        start = time.perf_counter()
+        sender.start(point["packets"])
+        elapsed = time.perf_counter() - start
+        sender.close()
+        receiver.close()
+        receiver_thread.join()
+    return sender, elapsed
+
+
+def run_sim(point: dict):
+    link = SimulatedLink(point["T1"], point["T2"], point["T3"], point["T4"], point["drop_prob"],
+                         point["seed"], point["protocol"], window_size=point["window"], seq_bits=point["seq_bits"])
+    sender = link.run(point["packets"])
+    return sender, link.sim.now
+
+
+def run_point(point: dict) -> dict:
+    sender, elapsed = (run_sim if point["engine"] == "sim" else run_live)(point)
+    packets = point["packets"]
+    row = dict(point)
+    delays = sender.delivery_times
+    row.update(avg_delay=sum(delays) / len(delays) if delays else math.nan,  # NaN if nothing was delivered
+               retransmissions_per_packet=sender.retransmissions / packets if packets else math.nan,
+               goodput=packets / elapsed if elapsed else math.nan,
+               timeouts=sender.rto.timeouts,
+               elapsed=elapsed)
+    return row
+
+
+def read_done(path: str) -> set:
+    """Keys of the points already in the results file"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    return {point_key(row) for row in rows}
+
+
+class ResultWriter:
+    """Appends one row per finished point and flushes it, so a crash loses nothing"""
+    def __init__(self, path: str):
+        self.json = path.endswith(".jsonl")
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        self.csv = None
+        if not self.json:
+            self.csv = csv.DictWriter(self.file, fieldnames=PARAMETERS + METRICS)
+            if new:
+                self.csv.writeheader()
+
+    def write(self, row: dict):
+        if self.json:
+            self.file.write(json.dumps(row) + "\n")
+        else:
+            self.csv.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep for Go-Back-N and Selective Repeat")
+    parser.add_argument("output", help="Results file, .csv or .jsonl")
+    parser.add_argument("--protocol", nargs="+", choices=sorted(PROTOCOLS), default=["gbn"])
+    parser.add_argument("--window", type=int, nargs="+", default=[7])
+    parser.add_argument("--seq-bits", type=int, nargs="+", default=[3], help="Sequence number bits (MOD = 2^bits)")
+    parser.add_argument("--T1", type=float, nargs="+", default=[0.1], help="Min packet generation interval")
+    parser.add_argument("--T2", type=float, nargs="+", default=[0.3], help="Max packet generation interval")
+    parser.add_argument("--T3", type=float, nargs="+", default=[0.05], help="Min transmission delay")
+    parser.add_argument("--T4", type=float, nargs="+", default=[0.15], help="Max transmission delay")
+    parser.add_argument("--drop-prob", type=float, nargs="+", default=[0.1])
+    parser.add_argument("--seeds", type=int, default=1, help="Seeds 0..N-1 per combination")
+    parser.add_argument("--packets", type=int, default=30)
+    parser.add_argument("--engine", choices=["live", "sim"], default="live",
+                        help="UDP sockets in real time, or the virtual-time simulation")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.packets < 0:
+        parser.error("--packets must not be negative")
+    valid = []
+    for protocol, window, seq_bits in itertools.product(args.protocol, args.window, args.seq_bits):
+        try:
+            check_point(protocol, window, seq_bits)
+        except ValueError as e:
+            print(f"Skipping {protocol} window={window} seq_bits={seq_bits}: {e}")
+            continue
+        valid.append((protocol, window, seq_bits))
+    if not valid:
+        parser.error("no combination of --protocol, --window and --seq-bits is valid")
+
+    points = [dict(protocol=protocol, window=window, seq_bits=seq_bits, T1=T1, T2=T2, T3=T3, T4=T4,
+                   drop_prob=drop_prob, seed=seed, packets=args.packets, engine=args.engine)
+              for (protocol, window, seq_bits), T1, T2, T3, T4, drop_prob, seed in itertools.product(
+                  valid, args.T1, args.T2, args.T3, args.T4, args.drop_prob, range(args.seeds))]
+    done = read_done(args.output)
+    todo = [point for point in points if point_key(point) not in done]
+    print(f"{len(points)} points, {len(points) - len(todo)} already in {args.output}, running {len(todo)}")
+
+    writer = ResultWriter(args.output)
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        for i, row in enumerate(pool.imap_unordered(run_point, todo), 1):
+            writer.write(row)
+            print(f"[{i}/{len(todo)}] {row['protocol']} window={row['window']} drop={row['drop_prob']} "
+                  f"seed={row['seed']}: delay {row['avg_delay']:.3f} s, "
+                  f"{row['retransmissions_per_packet']:.2f} retx/pkt, {row['goodput']:.2f} pkt/s")
+    writer.close()
+    print(f"Finished in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Binary event tracing for the data link entities and the Assignment 1 clients.
+
+Instead of printing a line per frame, the entities emit fixed-size records into a
+preallocated ring buffer: timestamp, event type, link id, sequence number and one
+extra argument. Emitting is a level check and a struct.pack_into, and does nothing
+but the level check while tracing is off. Once the buffer is full the oldest records
+are overwritten. dump() writes the buffer to a file, and the decoder turns the file
+back into the lines the entities used to print.
+
+Levels: OFF, WARN (timeouts, drops, corruption), INFO (every frame and ACK), DEBUG.
+
+Usage: python tracing.py trace.bin [--level info] [--link 8080]
+"""
+import argparse
+import atexit
+import itertools
+import struct
+import time
+
+OFF, WARN, INFO, DEBUG = range(4)
+LEVELS = {"off": OFF, "warn": WARN, "info": INFO, "debug": DEBUG}
+
+# Event types: (level, line printed by the decoder)
+EVENTS = [
+    (INFO, "Sent frame {seq}"),
+    (WARN, "Frame {seq} dropped during transmission"),
+    (INFO, "Received ACK {seq}"),
+    (WARN, "Timeout for frame {seq}, resending"),
+    (INFO, "Received frame {seq}"),
+    (INFO, "Frame {seq} in sequence"),
+    (INFO, "Out of sequence: expected {arg}, got {seq}"),
+    (INFO, "Frame {seq} buffered, expected {arg}"),
+    (WARN, "Frame {seq} dropped at receiver"),
+    (WARN, "Corrupted frame dropped"),
+    (INFO, "Sent ACK {seq}"),
+    (WARN, "ACK {seq} dropped during transmission"),
+    (DEBUG, "Generated packet {seq}"),
+    (INFO, "Ping {seq} answered after {arg} us"),  # Ping and heartbeat clients of Assignment 1
+    (WARN, "Ping {seq} timed out"),
+]
+(SENT, DROPPED, ACK_RECEIVED, TIMEOUT, RECEIVED, IN_ORDER, OUT_OF_ORDER, BUFFERED,
+ RECEIVER_DROP, CORRUPTED, ACK_SENT, ACK_DROPPED, GENERATED, PING_REPLY, PING_TIMEOUT) = range(len(EVENTS))
+EVENT_LEVELS = bytes(level for level, _ in EVENTS)
+
+RECORD = struct.Struct("<dIIHBx")  # timestamp, seq, arg, link, event
+HEADER = struct.Struct("<4sHIQ")  # magic, record size, capacity, records emitted
+MAGIC = b"ARQT"
+
+_link_ids = itertools.count(1)
+
+
+def link_id(sock=None):
+    """Link id of an entity: its local port, or a running number without a socket"""
+    return sock.getsockname()[1] if sock is not None else next(_link_ids)
+
+
+class Tracer:
+    def __init__(self, capacity=1 << 16, level=OFF, clock=time.time):
+        self.capacity = capacity
+        self.level = level
+        self.clock = clock
+        self.buffer = bytearray(capacity * RECORD.size)
+        self._slots = itertools.count()  # next() is atomic, so threads never get the same slot
+        self.emitted = 0
+
+    def emit(self, event, link, seq=0, arg=0):
+        if EVENT_LEVELS[event] > self.level:
+            return
+        slot = next(self._slots)
+        RECORD.pack_into(self.buffer, slot % self.capacity * RECORD.size, self.clock(), seq, arg, link, event)
+        if slot >= self.emitted:
+            self.emitted = slot + 1
+
+    def records(self):
+        """(timestamp, event, link, seq, arg) of the buffered records, oldest first"""
+        return list(decode(self.buffer, self.capacity, self.emitted))
+
+    def dump(self, path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, RECORD.size, self.capacity, self.emitted))
+            f.write(self.buffer)
+
+
+TRACER = Tracer()  # Shared by every entity that is not given its own tracer
+
+
+def configure(level, path=None):
+    """Set the level of TRACER and write it to `path` when the process exits"""
+    TRACER.level = LEVELS[level] if isinstance(level, str) else level
+    if path is not None:
+        atexit.register(TRACER.dump, path)
+
+
+def decode(buffer, capacity, emitted):
+    count = min(emitted, capacity)
+    first = emitted - count
+    for slot in range(first, emitted):
+        timestamp, seq, arg, link, event = RECORD.unpack_from(buffer, slot % capacity * RECORD.size)
+        yield timestamp, event, link, seq, arg
+
+
+def read(path):
+    """Records of a trace file written by Tracer.dump(), oldest first"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, record_size, capacity, emitted = HEADER.unpack_from(data)
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a trace file of this version")
+    return decode(memoryview(data)[HEADER.size:], capacity, emitted)
+
+
+def format_record(timestamp, event, link, seq, arg):
+    return f"{timestamp:.6f} [{link}] " + EVENTS[event][1].format(seq=seq, arg=arg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a binary trace as text")
+    parser.add_argument("path")
+    parser.add_argument("--level", choices=LEVELS, default="debug", help="Only print events up to this level")
+    parser.add_argument("--link", type=int, default=None, help="Only print events of this link")
+    args = parser.parse_args()
+    level = LEVELS[args.level]
+    for record in read(args.path):
+        _, event, link, _, _ = record
+        if EVENT_LEVELS[event] <= level and args.link in (None, link):
+            print(format_record(*record))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Combined statistics of many FlowMonitor runs of the same scenario.
+
+Every XML file is loaded through its columnar cache (flow_cache.py) in a process
+pool; caches that are missing or stale are built in parallel. The delay and jitter
+histograms of all runs are then merged per flow, and once more over all flows, with
+numpy: bins are keyed by (flow, bin index) and summed with bincount, and the
+percentiles are read off the cumulative counts with one searchsorted call,
+interpolating linearly inside a bin. The mean delay and the drop rate get a 95%
+confidence interval over the runs (Student t).
+
+Usage: python flow_batch.py 'runs/*.xml' --output summary.csv
+"""
+import argparse
+import csv
+import glob
+import math
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+from flow_cache import FlowCache
+
+PERCENTILES = (50, 95, 99)
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,  # Two-sided 95%, df = 1..30
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def t_critical(df):
+    """Two-sided 95% Student t quantile for each entry of df (1.96 beyond 30 degrees of freedom)"""
+    table = np.array([math.nan] + T_95)
+    return np.where(df > 30, 1.96, table[np.clip(df, 0, 30)])
+
+
+def find_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.xml")
+        paths.extend(sorted(glob.glob(pattern)))
+    return paths
+
+
+def load_run(path):
+    """Per-flow columns of one run, with every histogram bin tagged by its flow id"""
+    cache = FlowCache(path)
+    run = {name: np.array(cache.columns[name]) for name in
+           ("flow_id", "tx_packets", "rx_packets", "lost_packets", "delay_sum")}
+    for name in ("delay", "jitter"):
+        offsets = cache.columns[f"{name}_offsets"]
+        run[f"{name}_flow"] = np.repeat(run["flow_id"], np.diff(offsets))
+        for column in ("start", "width", "count"):
+            run[f"{name}_{column}"] = np.array(cache.columns[f"{name}_{column}"])
+    return run
+
+
+def merged_percentiles(groups, ngroups, start, width, count, percentiles=PERCENTILES):
+    """
+    Percentiles of the histograms of `ngroups` groups after merging all bins with the
+    same group and bin index; start/width in seconds. Returns an array of shape
+    (ngroups, len(percentiles)), NaN for groups without samples.
+    """
+    result = np.full((ngroups, len(percentiles)), np.nan)
+    if not len(count):
+        return result
+    bin_width = width.min()  # Every bin of a FlowMonitor histogram has the same width
+    index = np.rint(start / bin_width).astype(np.int64)
+    nbins = int(index.max()) + 1
+    keys, inverse = np.unique(groups * nbins + index, return_inverse=True)
+    counts = np.bincount(inverse, weights=count)
+    key_group = keys // nbins
+    totals = np.bincount(key_group, weights=counts, minlength=ngroups)
+    cumulative = np.cumsum(counts)
+    before = np.concatenate(([0.0], np.cumsum(totals)[:-1]))  # Samples of all earlier groups
+    has_samples = totals > 0
+    for column, p in enumerate(percentiles):
+        target = before + totals * (p / 100.0)
+        position = np.searchsorted(cumulative, target[has_samples], side="left")
+        position = np.minimum(position, len(counts) - 1)
+        below = cumulative[position] - counts[position]  # Samples before this bin
+        fraction = np.clip((target[has_samples] - below) / counts[position], 0.0, 1.0)
+        result[has_samples, column] = (keys[position] % nbins + fraction) * bin_width
+    return result
+
+
+def mean_ci(groups, ngroups, values):
+    """(mean, half width of the 95% confidence interval, samples) of `values` per group"""
+    n = np.bincount(groups, minlength=ngroups)
+    total = np.bincount(groups, weights=values, minlength=ngroups)
+    squares = np.bincount(groups, weights=values * values, minlength=ngroups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / n
+        variance = np.maximum(squares - n * mean * mean, 0.0) / (n - 1)
+        half = t_critical(n - 1) * np.sqrt(variance / n)
+    return mean, half, n
+
+
+def analyse(runs):
+    """One row per flow id, plus an "all" row over every flow, as a list of dicts"""
+    flow_ids = np.unique(np.concatenate([run["flow_id"] for run in runs]))
+    nflows = len(flow_ids)
+    column = lambda name: np.concatenate([run[name] for run in runs])
+    group = np.searchsorted(flow_ids, column("flow_id"))
+    tx, rx, lost = column("tx_packets"), column("rx_packets"), column("lost_packets")
+    delay_sum = column("delay_sum")
+
+    received = rx > 0
+    delay_mean, delay_ci, _ = mean_ci(group[received], nflows, delay_sum[received] / rx[received] / 1e6)
+    sent = tx > 0
+    drop_mean, drop_ci, runs_per_flow = mean_ci(group[sent], nflows, lost[sent] * 100.0 / tx[sent])
+    percentiles = {}
+    for name in ("delay", "jitter"):
+        bin_group = np.searchsorted(flow_ids, column(f"{name}_flow"))
+        start, width, count = column(f"{name}_start"), column(f"{name}_width"), column(f"{name}_count")
+        per_flow = merged_percentiles(bin_group, nflows, start, width, count)
+        overall = merged_percentiles(np.zeros(len(count), dtype=np.int64), 1, start, width, count)
+        percentiles[name] = np.vstack([per_flow, overall]) * 1e3  # ms
+
+    totals = [np.bincount(group, weights=values, minlength=nflows) for values in (tx, rx, lost)]
+    rows = []
+    for i in range(nflows + 1):
+        if i < nflows:
+            row = {"flow": int(flow_ids[i]), "runs": int(runs_per_flow[i]),
+                   "tx_packets": int(totals[0][i]), "rx_packets": int(totals[1][i]), "lost_packets": int(totals[2][i]),
+                   "drop_rate": drop_mean[i], "drop_rate_ci": drop_ci[i],
+                   "delay_ms": delay_mean[i], "delay_ci_ms": delay_ci[i]}
+        else:
+            tx_all, rx_all = tx.sum(), rx.sum()
+            row = {"flow": "all", "runs": len(runs), "tx_packets": int(tx_all), "rx_packets": int(rx_all),
+                   "lost_packets": int(lost.sum()),
+                   "drop_rate": lost.sum() * 100.0 / tx_all if tx_all else math.nan, "drop_rate_ci": math.nan,
+                   "delay_ms": delay_sum.sum() / rx_all / 1e6 if rx_all else math.nan, "delay_ci_ms": math.nan}
+        for name in ("delay", "jitter"):
+            for p, value in zip(PERCENTILES, percentiles[name][i]):
+                row[f"{name}_p{p}_ms"] = value
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the FlowMonitor output of many runs")
+    parser.add_argument("inputs", nargs="+", help="XML files, directories or glob patterns")
+    parser.add_argument("--output", default=None, help="CSV file for the table (default: print it)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    paths = find_inputs(args.inputs)
+    if not paths:
+        parser.error("no XML files found")
+    with multiprocessing.Pool(min(args.workers, len(paths))) as pool:
+        runs = pool.map(load_run, paths)
+    rows = analyse(runs)
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({key: f"{value:.4f}" if isinstance(value, float) else value for key, value in row.items()})
+    if args.output:
+        out.close()
+        print(f"{len(paths)} runs, {len(rows) - 1} flows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Columnar cache of a FlowMonitor XML file, and a query CLI on top of it.
+
+The XML is parsed once (incrementally, see plot_xml.iter_elements) into a
+directory of .npy files next to it: one array per per-flow scalar, and for the
+delay, jitter and packet-size histograms and the drop reasons a flat array of bins
+plus an offsets array (the bins of flow i are offsets[i]:offsets[i + 1]). The
+Ipv4FlowClassifier 5-tuples (class_*) and the per-probe flow stats (probe_*) are
+kept as columns of their own, one row per entry in file order. The
+arrays are memory-mapped when loaded, and the cache is rebuilt automatically when
+the size or modification time of the XML changes.
+
+Usage: python flow_cache.py flow-monitor-output.xml --sort delay --desc --limit 10 --min-drop-rate 1
+"""
+import argparse
+import json
+import ipaddress
+import os
+from array import array
+
+import numpy as np
+
+from plot_xml import CLASSIFIER, FLOW_STATS, PROBE_STATS, iter_elements, parse_time
+
+VERSION = 2
+
+# Per-flow scalars: column name -> (XML attribute, array typecode)
+SCALARS = {
+    "flow_id": ("flowId", "q"),
+    "tx_packets": ("txPackets", "q"),
+    "rx_packets": ("rxPackets", "q"),
+    "lost_packets": ("lostPackets", "q"),
+    "tx_bytes": ("txBytes", "q"),
+    "rx_bytes": ("rxBytes", "q"),
+    "times_forwarded": ("timesForwarded", "q"),
+    "delay_sum": ("delaySum", "d"),  # ns
+    "jitter_sum": ("jitterSum", "d"),  # ns
+    "time_first_tx": ("timeFirstTxPacket", "d"),  # ns
+    "time_last_rx": ("timeLastRxPacket", "d"),  # ns
+}
+TIMES = {"delay_sum", "jitter_sum", "time_first_tx", "time_last_rx"}
+HISTOGRAMS = {"delay": "delayHistogram", "jitter": "jitterHistogram", "packet_size": "packetSizeHistogram"}
+# <Ipv4FlowClassifier><Flow>: column name -> XML attribute; addresses as integers
+CLASSIFIER_COLUMNS = {
+    "class_flow_id": "flowId",
+    "class_src": "sourceAddress",
+    "class_dst": "destinationAddress",
+    "class_protocol": "protocol",
+    "class_src_port": "sourcePort",
+    "class_dst_port": "destinationPort",
+}
+ADDRESSES = {"class_src", "class_dst"}
+
+
+def cache_dir(xml_path: str) -> str:
+    return xml_path + ".cache"
+
+
+def source_stamp(xml_path: str) -> dict:
+    stat = os.stat(xml_path)
+    return {"version": VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def build(xml_path: str, directory: str = None):
+    """Parse the XML once and write the columns to `directory`"""
+    directory = directory or cache_dir(xml_path)
+    stamp = source_stamp(xml_path)  # Taken first: a file rewritten while we parse is rebuilt next time
+    columns = {name: array(typecode) for name, (_, typecode) in SCALARS.items()}
+    bins = {name: (array("q", [0]), array("d"), array("d"), array("q")) for name in HISTOGRAMS}  # offsets, start, width, count
+    drops = (array("q", [0]), array("q"), array("q"))  # offsets, reason code, packets
+    classifier = {name: array("q") for name in CLASSIFIER_COLUMNS}
+    probes = {name: array(typecode) for name, typecode in
+              (("probe_index", "q"), ("probe_flow_id", "q"), ("probe_packets", "q"), ("probe_bytes", "q"),
+               ("probe_delay_sum", "d"), ("probe_drops", "q"))}
+
+    for key, flow, ancestors in iter_elements(xml_path, (FLOW_STATS, CLASSIFIER, PROBE_STATS)):
+        if key == CLASSIFIER:
+            for name, attribute in CLASSIFIER_COLUMNS.items():
+                value = flow.get(attribute)
+                classifier[name].append(int(ipaddress.IPv4Address(value)) if name in ADDRESSES else int(value))
+            continue
+        if key == PROBE_STATS:
+            probes["probe_index"].append(int(ancestors[-1].get("index")))
+            probes["probe_flow_id"].append(int(flow.get("flowId")))
+            probes["probe_packets"].append(int(flow.get("packets")))
+            probes["probe_bytes"].append(int(flow.get("bytes")))
+            probes["probe_delay_sum"].append(parse_time(flow.get("delayFromFirstProbeSum")))
+            probes["probe_drops"].append(sum(int(drop.get("number")) for drop in flow.iterfind("packetsDropped")))
+            continue
+        for name, (attribute, _) in SCALARS.items():
+            value = flow.get(attribute, "0")
+            columns[name].append(parse_time(value) if name in TIMES else int(value))
+        for name, tag in HISTOGRAMS.items():
+            offsets, start, width, count = bins[name]
+            for b in flow.iterfind(f"{tag}/bin"):
+                start.append(float(b.get("start")))
+                width.append(float(b.get("width")))
+                count.append(int(b.get("count")))
+            offsets.append(len(count))
+        offsets, reason, number = drops
+        for drop in flow.iterfind("packetsDropped"):
+            reason.append(int(drop.get("reasonCode")))
+            number.append(int(drop.get("number")))
+        offsets.append(len(number))
+
+    os.makedirs(directory, exist_ok=True)
+    arrays = dict(columns, **classifier, **probes)
+    for name, (offsets, start, width, count) in bins.items():
+        arrays.update({f"{name}_offsets": offsets, f"{name}_start": start, f"{name}_width": width, f"{name}_count": count})
+    arrays.update(drop_offsets=drops[0], drop_reason=drops[1], drop_number=drops[2])
+    for name, values in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.frombuffer(values, dtype=values.typecode))
+    with open(os.path.join(directory, "source.json"), "w") as f:
+        json.dump(stamp, f)  # Written last, so an interrupted build is never taken for a valid cache
+
+
+class FlowCache:
+    """Memory-mapped columns of one FlowMonitor file; column names as in SCALARS and CLASSIFIER_COLUMNS, plus probe_*"""
+    def __init__(self, xml_path: str, rebuild: bool = False):
+        self.xml_path = xml_path
+        self.directory = cache_dir(xml_path)
+        if rebuild or not self.is_fresh():
+            build(xml_path, self.directory)
+        self.columns = {}
+        for entry in os.listdir(self.directory):
+            if entry.endswith(".npy"):
+                self.columns[entry[:-4]] = np.load(os.path.join(self.directory, entry), mmap_mode="r")
+
+    def is_fresh(self) -> bool:
+        try:
+            with open(os.path.join(self.directory, "source.json")) as f:
+                return json.load(f) == source_stamp(self.xml_path)
+        except (OSError, ValueError):
+            return False
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self):
+        return len(self.columns["flow_id"])
+
+    def histogram(self, name: str, i: int):
+        """(start, width, count) arrays of histogram `name` of the flow at row i"""
+        offsets = self.columns[f"{name}_offsets"]
+        rows = slice(offsets[i], offsets[i + 1])
+        return (self.columns[f"{name}_start"][rows], self.columns[f"{name}_width"][rows],
+                self.columns[f"{name}_count"][rows])
+
+    def drops(self, i: int):
+        """(reason code, packets) arrays of the flow at row i"""
+        offsets = self.columns["drop_offsets"]
+        rows = slice(offsets[i], offsets[i + 1])
+        return self.columns["drop_reason"][rows], self.columns["drop_number"][rows]
+
+    def avg_delay_ms(self):
+        rx = self.rx_packets
+        return np.divide(self.delay_sum / 1e6, rx, out=np.zeros(len(rx)), where=rx > 0)
+
+    def drop_rate(self):
+        """Lost packets in percent of the sent ones"""
+        tx = self.tx_packets
+        return np.divide(self.lost_packets * 100.0, tx, out=np.zeros(len(tx)), where=tx > 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a FlowMonitor XML file through its columnar cache")
+    parser.add_argument("path", nargs="?", default="flow-monitor-output.xml")
+    parser.add_argument("--flow", type=int, nargs="+", default=None, help="Only these flow ids")
+    parser.add_argument("--min-drop-rate", type=float, default=None, help="Percent")
+    parser.add_argument("--max-drop-rate", type=float, default=None, help="Percent")
+    parser.add_argument("--min-delay", type=float, default=None, help="Average delay in milliseconds")
+    parser.add_argument("--max-delay", type=float, default=None, help="Average delay in milliseconds")
+    parser.add_argument("--sort", choices=["flow", "drop_rate", "delay"], default="flow")
+    parser.add_argument("--desc", action="store_true", help="Sort in descending order")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--histograms", action="store_true", help="Also print the delay and jitter histograms")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the cache even if it is up to date")
+    args = parser.parse_args()
+
+    cache = FlowCache(args.path, rebuild=args.rebuild)
+    delay = cache.avg_delay_ms()
+    drop_rate = cache.drop_rate()
+    mask = np.ones(len(cache), dtype=bool)
+    if args.flow is not None:
+        mask &= np.isin(cache.flow_id, args.flow)
+    if args.min_drop_rate is not None:
+        mask &= drop_rate >= args.min_drop_rate
+    if args.max_drop_rate is not None:
+        mask &= drop_rate <= args.max_drop_rate
+    if args.min_delay is not None:
+        mask &= delay >= args.min_delay
+    if args.max_delay is not None:
+        mask &= delay <= args.max_delay
+    rows = np.flatnonzero(mask)
+    key = {"flow": cache.flow_id, "drop_rate": drop_rate, "delay": delay}[args.sort][rows]
+    order = np.argsort(key, kind="stable")
+    rows = rows[order[::-1] if args.desc else order][:args.limit]
+
+    print(f"{'Flow ID':<10} {'TxPackets':<10} {'RxPackets':<10} {'LostPackets':<12} {'AvgDelay (ms)':<15} {'DropRate (%)':<12}")
+    print("-" * 72)
+    for i in rows:
+        print(f"{cache.flow_id[i]:<10} {cache.tx_packets[i]:<10} {cache.rx_packets[i]:<10} "
+              f"{cache.lost_packets[i]:<12} {delay[i]:<15.3f} {drop_rate[i]:<12.2f}")
+        if args.histograms:
+            for name in ("delay", "jitter"):
+                start, width, count = cache.histogram(name, i)
+                bins = ", ".join(f"{s * 1e3:g}-{(s + w) * 1e3:g} ms: {c}" for s, w, c in zip(start, width, count))
+                print(f"  {name.capitalize()}: {bins}")
+    print(f"{len(rows)} of {len(cache)} flows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Per-link and per-router view of a FlowMonitor XML file.
+
+The Ipv4FlowClassifier entries are joined to the flow stats by flowId, and the source
+and destination address of every flow are mapped to nodes of the topology
+(topology.py). Every (source, destination) pair has a precomputed row saying which
+links its route crosses, and in which direction, and which nodes it visits. The
+per-probe stats (one FlowProbe per node) are scattered into flow x node matrices, so
+everything the links and routers need is gathered with fancy indexing and summed
+over the flows in one pass, without a Python loop over flows:
+
+- packets, bytes and throughput of a link: what the probe at its far end saw
+- drops of a link: drops recorded by the probe at its near end (its output queue)
+- delay of a link: growth of the mean delay since the first probe across the link
+- lost on path: lostPackets of all flows whose route crosses the link
+
+Without probe stats (SerializeToXmlFile(..., enableProbes=false)) the received
+packets and bytes of each flow are used instead and drops and delays stay empty.
+
+Usage: python flow_links.py flow-monitor-output.xml [--flows] [--limit 20]
+"""
+import argparse
+import ipaddress
+
+import numpy as np
+
+from flow_cache import FlowCache
+from topology import NODES, SUBNETS, edges, route
+
+NODE_INDEX = {node: i for i, node in enumerate(NODES)}
+LINK_NAMES = [f"{a}-{b}" for a, b in edges]
+LINK_A = np.array([NODE_INDEX[a] for a, _ in edges])
+LINK_B = np.array([NODE_INDEX[b] for _, b in edges])
+
+
+def address_table():
+    """Node index of 10.1.<subnet>.<host> at [subnet, host], -1 elsewhere"""
+    table = np.full((256, 256), -1, dtype=np.int64)
+    for subnet, nodes in SUBNETS.items():
+        for host, node in enumerate(nodes, 1):
+            table[subnet, host] = NODE_INDEX[node]
+    return table
+
+
+def route_tables():
+    """
+    For every pair src * len(NODES) + dst: the direction in which its route crosses
+    each link (+1 a to b, -1 b to a, 0 not at all) and the nodes it visits.
+    """
+    n = len(NODES)
+    orient = np.zeros((n * n, len(edges)), dtype=np.int8)
+    visits = np.zeros((n * n, n), dtype=bool)
+    link_of = {}
+    for l, (a, b) in enumerate(edges):
+        link_of[a, b], link_of[b, a] = (l, 1), (l, -1)
+    for src in NODES:
+        for dst in NODES:
+            hops = route(src, dst) if src != dst else None
+            if not hops:
+                continue
+            pair = NODE_INDEX[src] * n + NODE_INDEX[dst]
+            visits[pair, [NODE_INDEX[hop] for hop in hops]] = True
+            for hop in zip(hops, hops[1:]):
+                l, direction = link_of[hop]
+                orient[pair, l] = direction
+    return orient, visits
+
+
+ADDRESSES = address_table()
+ORIENT, VISITS = route_tables()
+SCENARIO_PREFIX = int(ipaddress.IPv4Address("10.1.0.0")) >> 16
+
+
+def nodes_of(addresses):
+    """Node index of each integer address, -1 outside the scenario"""
+    addresses = np.asarray(addresses, dtype=np.int64)
+    nodes = ADDRESSES[addresses >> 8 & 0xFF, addresses & 0xFF]
+    return np.where(addresses >> 16 == SCENARIO_PREFIX, nodes, -1)
+
+
+def dotted(addresses, entry):
+    """Dotted quads of addresses[entry], "?" where entry is -1; formatted once per distinct address"""
+    values, inverse = np.unique(np.append(addresses, 0), return_inverse=True)
+    strings = np.array([str(ipaddress.IPv4Address(int(value))) for value in values] + ["?"])
+    return strings[np.append(inverse[:-1], len(values))[entry]]
+
+
+def join(cache):
+    """Row of each flow's classifier entry (-1 without one), through flowId"""
+    order = np.argsort(cache.class_flow_id, kind="stable")
+    keys = cache.class_flow_id[order]
+    position = np.minimum(np.searchsorted(keys, cache.flow_id), max(len(keys) - 1, 0))
+    if not len(keys):
+        return np.full(len(cache), -1)
+    return np.where(keys[position] == cache.flow_id, order[position], -1)
+
+
+def probe_matrices(cache):
+    """flow x node matrices of the per-probe packets, bytes, delay sums (ns) and drops"""
+    shape = (len(cache), len(NODES))
+    order = np.argsort(cache.flow_id, kind="stable")
+    position = np.minimum(np.searchsorted(cache.flow_id[order], cache.probe_flow_id), len(order) - 1)
+    rows = order[position]
+    valid = (cache.flow_id[rows] == cache.probe_flow_id) & (cache.probe_index < len(NODES))
+    flat = rows[valid] * len(NODES) + cache.probe_index[valid]
+    return [np.bincount(flat, weights=values[valid], minlength=shape[0] * shape[1]).reshape(shape)
+            for values in (cache.probe_packets, cache.probe_bytes, cache.probe_delay_sum, cache.probe_drops)]
+
+
+def analyse(cache):
+    """(per-flow table, per-link table, per-router table), each a dict of equally long arrays"""
+    n = len(NODES)
+    entry = join(cache)
+    known = entry >= 0
+    src = np.full(len(cache), -1)
+    dst = np.full(len(cache), -1)
+    src[known] = nodes_of(cache.class_src[entry[known]])
+    dst[known] = nodes_of(cache.class_dst[entry[known]])
+    routed = (src >= 0) & (dst >= 0)
+    pair = np.where(routed, src * n + dst, 0)
+    orient = np.where(routed[:, None], ORIENT[pair], 0)  # flow x link
+    visits = VISITS[pair] & routed[:, None]  # flow x node
+    crosses = orient != 0
+
+    rows = np.arange(len(cache))[:, None]
+    down = np.where(orient > 0, LINK_B, LINK_A)  # Node after the link, per flow and link
+    up = np.where(orient > 0, LINK_A, LINK_B)
+    if len(cache.probe_flow_id):
+        packets, nbytes, delay_sum, drops = probe_matrices(cache)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_delay = delay_sum / packets  # ns since the first probe, per flow and node
+        hop_delay = mean_delay[rows, down] - mean_delay[rows, up]
+        weight = np.where(crosses & np.isfinite(hop_delay), packets[rows, down], 0.0)
+        hop_delay = np.where(weight > 0, hop_delay, 0.0)
+        link_drops = np.where(crosses, drops[rows, up], 0).sum(axis=0)
+        node_packets, node_drops = packets.sum(axis=0), drops.sum(axis=0)
+    else:
+        packets = np.broadcast_to(np.asarray(cache.rx_packets, dtype=float)[:, None], (len(cache), n))
+        nbytes = np.broadcast_to(np.asarray(cache.rx_bytes, dtype=float)[:, None], (len(cache), n))
+        hop_delay = weight = np.zeros(orient.shape)
+        link_drops = np.full(len(edges), np.nan)
+        node_packets, node_drops = (visits * packets).sum(axis=0), np.full(n, np.nan)
+
+    active = cache.rx_packets > 0
+    duration = ((cache.time_last_rx[active].max() - cache.time_first_tx[active].min()) / 1e9
+                if active.any() else np.nan)
+    link_bytes = np.where(crosses, nbytes[rows, down], 0).sum(axis=0)
+    weights = weight.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        links = {
+            "link": np.array(LINK_NAMES),
+            "flows": crosses.sum(axis=0),
+            "packets": np.where(crosses, packets[rows, down], 0).sum(axis=0),
+            "throughput_mbps": link_bytes * 8 / duration / 1e6,
+            "drops": link_drops,
+            "delay_ms": (hop_delay * weight).sum(axis=0) / weights / 1e6,
+            "lost_on_path": crosses.T @ np.asarray(cache.lost_packets),
+        }
+        # A hop's delay is spent in the output queue and on the wire of the node before it
+        out_weight = np.bincount(up.ravel(), weights=weight.ravel(), minlength=n)
+        routers = {
+            "node": np.array(NODES),
+            "flows": visits.sum(axis=0),
+            "packets": node_packets,
+            "drops": node_drops,
+            "drop_rate": node_drops * 100.0 / (node_packets + node_drops),
+            "delay_ms": np.bincount(up.ravel(), weights=(hop_delay * weight).ravel(), minlength=n) / out_weight / 1e6,
+        }
+
+    names = np.array(NODES + ["?"])
+    flows = {
+        "flow": np.asarray(cache.flow_id),
+        "source": dotted(cache.class_src, entry),
+        "destination": dotted(cache.class_dst, entry),
+        "protocol": np.where(known, cache.class_protocol[entry], -1),
+        "source_port": np.where(known, cache.class_src_port[entry], -1),
+        "destination_port": np.where(known, cache.class_dst_port[entry], -1),
+        "from": names[src],
+        "to": names[dst],
+    }
+    return flows, links, routers
+
+
+def print_table(table, formats):
+    columns = list(table)
+    widths = [max(len(column), 8) for column in columns]
+    print("  ".join(f"{column:<{width}}" for column, width in zip(columns, widths)))
+    print("-" * (sum(widths) + 2 * (len(widths) - 1)))
+    for i in range(len(table[columns[0]])):
+        print("  ".join(f"{format(table[column][i], formats.get(column, '')):<{width}}"
+                        for column, width in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attribute the FlowMonitor statistics to links and routers")
+    parser.add_argument("path", nargs="?", default="flow-monitor-output.xml")
+    parser.add_argument("--flows", action="store_true", help="Also print the 5-tuple and end nodes of each flow")
+    parser.add_argument("--limit", type=int, default=None, help="Flows to print with --flows")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the cache even if it is up to date")
+    args = parser.parse_args()
+
+    cache = FlowCache(args.path, rebuild=args.rebuild)
+    flows, links, routers = analyse(cache)
+    if args.flows:
+        print_table({name: values[:args.limit] for name, values in flows.items()}, {})
+        print()
+    print_table(links, {"throughput_mbps": ".3f", "delay_ms": ".3f", "drops": ".0f", "packets": ".0f"})
+    print()
+    print_table(routers, {"packets": ".0f", "drops": ".0f", "drop_rate": ".2f", "delay_ms": ".3f"})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Discrete-event simulation of the Assignment 4 scenarios without ns-3.
+
+The network is the R1-R4 / A-E topology of topology.py with the per-link addressing
+of the ns-3 scripts. Every link is a full-duplex point-to-point link with a data rate
+and a propagation delay, and every device has a DropTail queue. Traffic comes from
+OnOff UDP applications as installed by CreateTraffic() (constant rate, fixed packet
+size), and routes are shortest paths like Ipv4GlobalRoutingHelper's. By default only
+the links of the drawn graph are installed, so the routes are those flow_links.py
+charges each flow to; --r1-r4 adds the R1-R4 link of the scripts. At the end the
+flow statistics are written as FlowMonitor XML (FlowStats, Ipv4FlowClassifier and
+FlowProbes), which plot_xml.py, flow_cache.py and flow_links.py read as they read the
+ns-3 output.
+
+Events live in one heap of (time, sequence, kind, target, packet) tuples; a packet is a
+(flow, size, first tx time, times forwarded) tuple. A transmission that ends starts the
+next one from the queue directly, so each packet costs two events per hop.
+
+Not modelled: IP fragmentation (datagrams above the MTU travel whole), the traffic
+control layer and the RED queue disc of "Queuedelay,avg_packet.txt", and ARP.
+
+Usage: python netsim.py droprates --seed 1 --output flow-monitor-output.xml
+"""
+import argparse
+import heapq
+import itertools
+import math
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import List
+
+from topology import LINKS, NODES, SUBNETS, edges, route
+
+UDP_IP_HEADERS = 28  # FlowMonitor counts IP packet sizes: payload + UDP (8) + IPv4 (20)
+PPP_HEADER = 2
+DROP_QUEUE = 3  # Ipv4FlowProbe::DropReason
+MAX_PER_HOP_DELAY = 10.0  # Packets in flight longer than this are lost (FlowMonitor default)
+BIN_WIDTHS = {"delay": 0.001, "jitter": 0.001, "packetSize": 20, "flowInterruptions": 0.25}
+FLOW_INTERRUPTION = 0.5  # Seconds between packets that count as an interruption
+FIRST_PORT = 49153  # First ephemeral port of every node
+
+APP_SEND, TX_DONE, ARRIVE = range(3)
+
+
+@dataclass
+class App:
+    """An OnOff UDP source; rate in bit/s, times in seconds"""
+    src: str
+    dst: str  # Destination address
+    size: int  # UDP payload bytes
+    rate: float
+    start: float
+    stop: float
+    on_time: float = math.inf  # SetConstantRate(): always on
+    off_time: float = 0.0
+    port: int = 9
+
+
+@dataclass
+class Scenario:
+    rate: float  # bit/s of every link
+    delay: float  # Seconds
+    duration: float
+    apps: List[App]
+
+
+def address_of(node):
+    """First interface address of a node"""
+    subnet, nodes = next((subnet, nodes) for subnet, nodes in SUBNETS.items() if node in nodes)
+    return f"10.1.{subnet}.{nodes.index(node) + 1}"
+
+
+def droprates(rng):
+    """"Droprates,reasoncodes.txt": one random 20 Mbps flow from A to R4 over 5 Mbps links"""
+    start = rng.uniform(0.0, 60.0)
+    return Scenario(5e6, 0.001, 60.0, [App("A", "10.1.9.1", int(rng.uniform(512, 2048)), 20e6,
+                                           start, rng.uniform(min(start + 1.0, 60.0), 60.0))])
+
+
+def queuedelay(rng):
+    """"Queuedelay,avg_packet.txt": every workstation sends 10 Mbps to a random other one over 2 Mbps links"""
+    apps = []
+    workstations = NODES[4:]
+    for src in workstations:
+        dst = rng.choice([node for node in workstations if node != src])
+        start = rng.uniform(1.0, 10.0)
+        apps.append(App(src, address_of(dst), 4096, 10e6, start, start + rng.uniform(1.0, 5.0)))
+    return Scenario(2e6, 0.001, 60.0, apps)
+
+
+def droppac2(rng):
+    """"droppac2,Jiiter,delay.txt": three fixed flows over 5 Mbps links"""
+    return Scenario(5e6, 0.001, 20.0, [
+        App("A", "10.1.9.1", 1024, 2e6, 1.0, 10.0),  # A -> E's router
+        App("B", "10.1.8.1", 1024, 1e6, 2.0, 12.0),  # B -> D's router
+        App("C", "10.1.6.1", 1024, 1.5e6, 3.0, 15.0),  # C -> B's router
+    ])
+
+
+SCENARIOS = {"droprates": droprates, "queuedelay": queuedelay, "droppac2": droppac2}
+
+
+class Device:
+    """Sending side of a point-to-point link at `node`, towards `peer`"""
+    __slots__ = ("node", "peer", "rate", "delay", "queue", "limit", "busy")
+
+    def __init__(self, node, peer, rate, delay, limit):
+        self.node, self.peer, self.rate, self.delay = node, peer, rate, delay
+        self.queue = deque()
+        self.limit = limit
+        self.busy = False
+
+
+class Histogram:
+    __slots__ = ("width", "counts")
+
+    def __init__(self, width):
+        self.width = width
+        self.counts = {}
+
+    def add(self, value):
+        index = int(value / self.width)
+        self.counts[index] = self.counts.get(index, 0) + 1
+
+
+class FlowStats:
+    """The counters of one flow, named as in FlowMonitor's FlowStats"""
+    def __init__(self):
+        self.time_first_tx = self.time_first_rx = self.time_last_tx = self.time_last_rx = 0.0
+        self.delay_sum = self.jitter_sum = self.last_delay = 0.0
+        self.tx_bytes = self.rx_bytes = self.tx_packets = self.rx_packets = 0
+        self.lost_packets = self.times_forwarded = 0
+        self.packets_dropped = {}  # Reason code -> packets
+        self.bytes_dropped = {}
+        self.histograms = {name: Histogram(width) for name, width in BIN_WIDTHS.items()}
+
+
+class Network:
+    def __init__(self, scenario, queue_limit=100, links=edges):
+        self.scenario = scenario
+        self.devices = {}  # (node, peer) -> Device
+        for a, b in links:
+            self.devices[a, b] = Device(a, b, scenario.rate, scenario.delay, queue_limit)
+            self.devices[b, a] = Device(b, a, scenario.rate, scenario.delay, queue_limit)
+        # Next-hop device towards every destination node
+        self.next_hop = {}
+        for src in NODES:
+            for dst in NODES:
+                hops = route(src, dst, links) if src != dst else None
+                if hops:
+                    self.next_hop[src, dst] = self.devices[hops[0], hops[1]]
+        self.owner = {f"10.1.{subnet}.{host}": node
+                      for subnet, nodes in SUBNETS.items() for host, node in enumerate(nodes, 1)}
+        self.flows = []  # FlowStats, flowId - 1
+        self.tuples = []  # (src address, dst address, src port, dst port) of each flow
+        self.flow_dst = []  # Destination node of each flow
+        self.probes = {}  # (node, flow) -> [packets, bytes, delay sum, {reason: packets}, {reason: bytes}]
+        self.events = []
+        self.sequence = itertools.count()
+        self.processed = 0
+
+    def _schedule(self, when, kind, target, packet=None):
+        heapq.heappush(self.events, (when, next(self.sequence), kind, target, packet))
+
+    def _probe(self, node, flow, size=0, delay=0.0, count=1):
+        stats = self.probes.get((node, flow))
+        if stats is None:
+            stats = self.probes[node, flow] = [0, 0, 0.0, {}, {}]
+        stats[0] += count
+        stats[1] += size
+        stats[2] += delay
+
+    def _enqueue(self, device, packet, now):
+        if not device.busy:
+            device.busy = True
+            self._schedule(now + (packet[1] + PPP_HEADER) * 8 / device.rate, TX_DONE, device, packet)
+        elif len(device.queue) < device.limit:
+            device.queue.append(packet)
+        else:
+            self._drop(device.node, packet, DROP_QUEUE)
+
+    def _drop(self, node, packet, reason):
+        flow, size = packet[0], packet[1]
+        stats = self.flows[flow]
+        stats.lost_packets += 1
+        stats.packets_dropped[reason] = stats.packets_dropped.get(reason, 0) + 1
+        stats.bytes_dropped[reason] = stats.bytes_dropped.get(reason, 0) + size
+        self._probe(node, flow, count=0)  # Dropped packets are counted apart from the ones seen
+        _, _, _, dropped, dropped_bytes = self.probes[node, flow]
+        dropped[reason] = dropped.get(reason, 0) + 1
+        dropped_bytes[reason] = dropped_bytes.get(reason, 0) + size
+
+    def _send(self, app, flow, now):
+        """First transmission of one packet of an application"""
+        size = app.size + UDP_IP_HEADERS
+        stats = self.flows[flow]
+        if not stats.tx_packets:
+            stats.time_first_tx = now
+        stats.time_last_tx = now
+        stats.tx_packets += 1
+        stats.tx_bytes += size
+        stats.histograms["packetSize"].add(size)
+        self._probe(app.src, flow, size)
+        dst = self.flow_dst[flow]
+        if dst == app.src:
+            return  # No route to itself; ns-3 would deliver it locally
+        self._enqueue(self.next_hop[app.src, dst], (flow, size, now, 0), now)
+
+    def _receive(self, flow, size, sent, forwarded, node, now):
+        stats = self.flows[flow]
+        delay = now - sent
+        if stats.rx_packets:
+            jitter = abs(stats.last_delay - delay)
+            stats.jitter_sum += jitter
+            stats.histograms["jitter"].add(jitter)
+            gap = now - stats.time_last_rx
+            if gap > FLOW_INTERRUPTION:
+                stats.histograms["flowInterruptions"].add(gap)
+        else:
+            stats.time_first_rx = now
+        stats.delay_sum += delay
+        stats.histograms["delay"].add(delay)
+        stats.last_delay = delay
+        stats.rx_bytes += size
+        stats.rx_packets += 1
+        stats.time_last_rx = now
+        stats.times_forwarded += forwarded
+        self._probe(node, flow, size, delay)
+
+    def run(self):
+        apps = self.scenario.apps
+        ports = {}
+        app_flow = []
+        for app in apps:
+            port = ports.get(app.src, FIRST_PORT)
+            ports[app.src] = port + 1
+            app_flow.append(len(self.flows))
+            self.flows.append(FlowStats())
+            self.tuples.append((address_of(app.src), app.dst, port, app.port))
+            self.flow_dst.append(self.owner[app.dst])
+            if app.start < app.stop:
+                self._schedule(app.start, APP_SEND, len(app_flow) - 1)
+
+        end = self.scenario.duration
+        events, pop, push, sequence = self.events, heapq.heappop, heapq.heappush, self.sequence
+        flow_dst, next_hop = self.flow_dst, self.next_hop
+        processed = 0
+        while events and events[0][0] < end:
+            now, _, kind, target, packet = pop(events)
+            processed += 1
+            if kind == TX_DONE:  # target: Device
+                push(events, (now + target.delay, next(sequence), ARRIVE, target.peer, packet))
+                if target.queue:
+                    following = target.queue.popleft()
+                    push(events, (now + (following[1] + PPP_HEADER) * 8 / target.rate, next(sequence),
+                                  TX_DONE, target, following))
+                else:
+                    target.busy = False
+            elif kind == ARRIVE:  # target: node
+                flow, size, sent, forwarded = packet
+                dst = flow_dst[flow]
+                if target == dst:
+                    self._receive(flow, size, sent, forwarded, target, now)
+                else:
+                    self._probe(target, flow, size, now - sent)
+                    self._enqueue(next_hop[target, dst], (flow, size, sent, forwarded + 1), now)
+            else:  # APP_SEND, target: index of the app
+                app = apps[target]
+                self._send(app, app_flow[target], now)
+                following = now + app.size * 8 / app.rate
+                if app.off_time and (following - app.start) % (app.on_time + app.off_time) >= app.on_time:
+                    period = app.on_time + app.off_time  # Skip the off period
+                    following += period - (following - app.start) % period
+                if following < app.stop:
+                    push(events, (following, next(sequence), APP_SEND, target, None))
+        self.processed = processed
+
+        # CheckForLostPackets(): packets still on their way after MAX_PER_HOP_DELAY are lost
+        for _, _, kind, _, packet in events:
+            if kind != APP_SEND and end - packet[2] > MAX_PER_HOP_DELAY:
+                self.flows[packet[0]].lost_packets += 1
+        for device in self.devices.values():
+            for packet in device.queue:
+                if end - packet[2] > MAX_PER_HOP_DELAY:
+                    self.flows[packet[0]].lost_packets += 1
+
+    def write_xml(self, path):
+        # FlowMonitor numbers flows from 1 in the order of their first packet
+        order = sorted((flow for flow, stats in enumerate(self.flows) if stats.tx_packets),
+                       key=lambda flow: self.flows[flow].time_first_tx)
+        flow_ids = {flow: i for i, flow in enumerate(order, 1)}
+        with open(path, "w") as f:
+            f.write('<?xml version="1.0" ?>\n<FlowMonitor>\n  <FlowStats>\n')
+            for flow in order:
+                stats = self.flows[flow]
+                f.write(f'    <Flow flowId="{flow_ids[flow]}" timeFirstTxPacket="{_time(stats.time_first_tx)}"'
+                        f' timeFirstRxPacket="{_time(stats.time_first_rx)}" timeLastTxPacket="{_time(stats.time_last_tx)}"'
+                        f' timeLastRxPacket="{_time(stats.time_last_rx)}" delaySum="{_time(stats.delay_sum)}"'
+                        f' jitterSum="{_time(stats.jitter_sum)}" lastDelay="{_time(stats.last_delay)}"'
+                        f' txBytes="{stats.tx_bytes}" rxBytes="{stats.rx_bytes}" txPackets="{stats.tx_packets}"'
+                        f' rxPackets="{stats.rx_packets}" lostPackets="{stats.lost_packets}"'
+                        f' timesForwarded="{stats.times_forwarded}">\n')
+                for name, histogram in stats.histograms.items():
+                    f.write(_histogram(name, histogram))
+                for reason, number in sorted(stats.packets_dropped.items()):
+                    f.write(f'      <packetsDropped reasonCode="{reason}" number="{number}" />\n')
+                for reason, number in sorted(stats.bytes_dropped.items()):
+                    f.write(f'      <bytesDropped reasonCode="{reason}" bytes="{number}" />\n')
+                f.write('    </Flow>\n')
+            f.write('  </FlowStats>\n  <Ipv4FlowClassifier>\n')
+            for flow in order:
+                src, dst, src_port, dst_port = self.tuples[flow]
+                f.write(f'    <Flow flowId="{flow_ids[flow]}" sourceAddress="{src}" destinationAddress="{dst}"'
+                        f' protocol="17" sourcePort="{src_port}" destinationPort="{dst_port}">\n'
+                        f'      <Dscp value="0x0" packets="{self.flows[flow].tx_packets}" />\n    </Flow>\n')
+            f.write('  </Ipv4FlowClassifier>\n  <Ipv6FlowClassifier>\n  </Ipv6FlowClassifier>\n  <FlowProbes>\n')
+            for index, node in enumerate(NODES):
+                f.write(f'    <FlowProbe index="{index}">\n')
+                for flow in order:
+                    probe = self.probes.get((node, flow))
+                    if probe is None:
+                        continue
+                    packets, size, delay, dropped, dropped_bytes = probe
+                    f.write(f'      <FlowStats  flowId="{flow_ids[flow]}" packets="{packets}" bytes="{size}"'
+                            f' delayFromFirstProbeSum="{_time(delay)}" >\n')
+                    for reason, number in sorted(dropped.items()):
+                        f.write(f'        <packetsDropped reasonCode="{reason}" number="{number}" />\n')
+                    for reason, number in sorted(dropped_bytes.items()):
+                        f.write(f'        <bytesDropped reasonCode="{reason}" bytes="{number}" />\n')
+                    f.write('      </FlowStats>\n')
+                f.write('    </FlowProbe>\n')
+            f.write('  </FlowProbes>\n</FlowMonitor>\n')
+
+
+def _time(seconds):
+    """ns-3 Time in the XML: nanoseconds with a sign, e.g. +1500000.0ns, at full precision"""
+    return f"{seconds * 1e9:+.1f}ns"
+
+
+def _histogram(name, histogram):
+    counts = histogram.counts
+    lines = [f'      <{name}Histogram nBins="{max(counts) + 1 if counts else 0}" >\n']
+    for index in sorted(counts):
+        lines.append(f'        <bin index="{index}" start="{index * histogram.width:g}" '
+                     f'width="{histogram.width:g}" count="{counts[index]}" />\n')
+    lines.append(f'      </{name}Histogram>\n')
+    return "".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate an Assignment 4 scenario and write FlowMonitor XML")
+    parser.add_argument("scenario", choices=SCENARIOS)
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the random traffic parameters")
+    parser.add_argument("--duration", type=float, default=None, help="Simulated seconds (default: as the script)")
+    parser.add_argument("--rate", type=float, default=None, help="Link data rate in Mbit/s (default: as the script)")
+    parser.add_argument("--queue", type=int, default=100, help="DropTail queue size of every device, in packets")
+    parser.add_argument("--r1-r4", action="store_true",
+                        help="Also install the R1-R4 link of the ns-3 scripts; flow_links.py still attributes "
+                             "flows to the drawn graph, so its per-link view no longer matches")
+    parser.add_argument("--output", default="flow-monitor-output.xml")
+    args = parser.parse_args()
+
+    scenario = SCENARIOS[args.scenario](random.Random(args.seed))
+    if args.duration is not None:
+        scenario.duration = args.duration
+    if args.rate is not None:
+        scenario.rate = args.rate * 1e6
+    network = Network(scenario, args.queue, LINKS if args.r1_r4 else edges)
+    started = time.perf_counter()
+    network.run()
+    elapsed = time.perf_counter() - started
+    network.write_xml(args.output)
+    for app in scenario.apps:
+        print(f"{app.src} -> {app.dst}: {app.size} B at {app.rate / 1e6:g} Mbit/s, {app.start:.2f}-{app.stop:.2f} s")
+    print(f"{network.processed} events in {elapsed:.2f} s, flow statistics written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,142 @@
-import xml.etree.ElementTree as ET
-
-
-
-# Load the XML file
-
-tree = ET.parse("flow-monitor-output.xml")
-
-root = tree.getroot()
-
-
-
-# Extract metrics
-
-flows = root.findall(".//FlowStats/Flow")
-
-
-
-print(f"{'Flow ID':<10} {'TxPackets':<10} {'RxPackets':<10} {'LostPackets':<12} {'DelaySum (ns)':<15} {'AvgDelay (ns)':<15} {'DropRate (%)':<12}")
-
-print("-" * 80)
-
-
-
-for flow in flows:
-
-    flow_id = flow.get("flowId")
-
-    tx_packets = int(flow.get("txPackets"))
-
-    rx_packets = int(flow.get("rxPackets"))
-
-    lost_packets = int(flow.get("lostPackets"))
-
-    delay_sum_str = flow.get("delaySum")
-
-    delay_sum = float(delay_sum_str.rstrip("ns"))  # Remove 'ns' and convert to float
-
-    avg_delay = delay_sum / rx_packets if rx_packets > 0 else 0
-
-    drop_rate = (lost_packets / tx_packets) * 100 if tx_packets > 0 else 0
-
-
-
-    # Print flow-level metrics
-
-    print(f"{flow_id:<10} {tx_packets:<10} {rx_packets:<10} {lost_packets:<12} {delay_sum:<15.2f} {avg_delay:<15.2f} {drop_rate:<12.2f}")
+"""
+Per-flow metrics of an ns-3 FlowMonitor XML file.
 
+By default the whole file is loaded with ET.parse. With --stream it is read with
+iterparse instead: every <Flow> is turned into a FlowRecord when its end tag is
+seen and then removed from the tree, so memory stays flat however large the file
+is. Both modes print the same table.
 
+Usage: python plot_xml.py [flow-monitor-output.xml] [--stream]
+"""
+import argparse
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple
+
+
+def parse_time(value: str) -> float:
+    """ns-3 time attribute such as "+1.5e+06ns" in nanoseconds"""
+    return float(value.rstrip("ns"))  # Remove 'ns' and convert to float
+
+
+@dataclass
+class FlowRecord:
+    flow_id: str
+    tx_packets: int
+    rx_packets: int
+    lost_packets: int
+    delay_sum: float  # ns
+    drops: List[Tuple[str, int]] = field(default_factory=list)  # (reason code, packets)
+    delays: List[Tuple[str, int]] = field(default_factory=list)  # Delay histogram (bin start, count)
+    jitter: List[Tuple[str, int]] = field(default_factory=list)  # Jitter histogram (bin start, count)
+
+    @property
+    def avg_delay(self) -> float:
+        return self.delay_sum / self.rx_packets if self.rx_packets > 0 else 0
+
+    @property
+    def drop_rate(self) -> float:
+        return (self.lost_packets / self.tx_packets) * 100 if self.tx_packets > 0 else 0
+
+
+def flow_record(flow: ET.Element) -> FlowRecord:
+    """FlowRecord of a <Flow> element of <FlowStats>"""
+    return FlowRecord(
+        flow_id=flow.get("flowId"),
+        tx_packets=int(flow.get("txPackets")),
+        rx_packets=int(flow.get("rxPackets")),
+        lost_packets=int(flow.get("lostPackets")),
+        delay_sum=parse_time(flow.get("delaySum")),
+        drops=[(drop.get("reasonCode"), int(drop.get("number"))) for drop in flow.findall(".//packetsDropped")],
+        delays=[(b.get("start"), int(b.get("count"))) for b in flow.findall(".//delayHistogram/bin")],
+        jitter=[(b.get("start"), int(b.get("count"))) for b in flow.findall(".//jitterHistogram/bin")],
+    )
+
+
+def load_flows(path: str) -> Iterator[FlowRecord]:
+    """Records of all flows, from the whole file loaded at once"""
+    root = ET.parse(path).getroot()
+    for flow in root.findall(".//FlowStats/Flow"):
+        yield flow_record(flow)
+
+
+FLOW_STATS = ("FlowStats", "Flow")
+CLASSIFIER = ("Ipv4FlowClassifier", "Flow")
+PROBE_STATS = ("FlowProbes", "FlowProbe", "FlowStats")
+
+
+def iter_elements(path: str, records=(FLOW_STATS,)):
+    """
+    Read the file incrementally and yield (tag path, element, open ancestors) for every
+    complete element whose tag path below the root is in `records`. Every element is
+    removed from the tree once it has been yielded or skipped, so memory stays flat.
+    The ancestor list is only valid until the next element is requested.
+    """
+    stack = []  # Open elements, root first
+    tags = []
+    inside = None  # Depth of the record element being read
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            tags.append(elem.tag)
+            if inside is None and tuple(tags[1:]) in records:
+                inside = len(stack)
+            continue
+        key = tuple(tags[1:])
+        stack.pop()
+        tags.pop()
+        if inside is not None:
+            if len(stack) >= inside:
+                continue  # Part of a record that is still being read
+            inside = None
+            yield key, elem, stack
+        if stack:
+            stack[-1].remove(elem)  # Keep neither the element nor an empty shell in the tree
+
+
+def stream_flows(path: str) -> Iterator[FlowRecord]:
+    """Records of all flows, read incrementally"""
+    for _, flow, _ in iter_elements(path):
+        yield flow_record(flow)
+
+
+def print_table(flows):
+    print(f"{'Flow ID':<10} {'TxPackets':<10} {'RxPackets':<10} {'LostPackets':<12} {'DelaySum (ns)':<15} {'AvgDelay (ns)':<15} {'DropRate (%)':<12}")
+    print("-" * 80)
 
-    # Extract dropped packets and delays
-
-    dropped_packets = flow.findall(".//packetsDropped")
-
-    delays = flow.findall(".//delayHistogram/bin")
-
-    jitter = flow.findall(".//jitterHistogram/bin")
-
-
-
-    # Print details about dropped packets
-
-    if dropped_packets:
-
-        print(f"  Dropped Packets Details:")
-
-        for drop in dropped_packets:
-
-            reason_code = drop.get("reasonCode")
-
-            number = int(drop.get("number"))
-
-            print(f"    Reason Code {reason_code}: {number} packets dropped")
-
-
-
-    # Print delay histogram details for packets
-
-    if delays:
-
-        print(f"  Delay Histogram Details:")
-
-        for delay in delays:
-
-            start = delay.get("start")
-
-            count = int(delay.get("count"))
-
-            print(f"    Delay: {start}ns, Count: {count} packets")
-
-
-
-    # Print jitter histogram details
-
-    if jitter:
+    for flow in flows:
+        # Print flow-level metrics
+        print(f"{flow.flow_id:<10} {flow.tx_packets:<10} {flow.rx_packets:<10} {flow.lost_packets:<12} "
+              f"{flow.delay_sum:<15.2f} {flow.avg_delay:<15.2f} {flow.drop_rate:<12.2f}")
 
-        print(f"  Jitter Histogram Details:")
+        # Print details about dropped packets
+        if flow.drops:
+            print(f"  Dropped Packets Details:")
+            for reason_code, number in flow.drops:
+                print(f"    Reason Code {reason_code}: {number} packets dropped")
 
-        for j in jitter:
+        # Print delay histogram details for packets
+        if flow.delays:
+            print(f"  Delay Histogram Details:")
+            for start, count in flow.delays:
+                print(f"    Delay: {start}ns, Count: {count} packets")
 
-            start = j.get("start")
+        # Print jitter histogram details
+        if flow.jitter:
+            print(f"  Jitter Histogram Details:")
+            for start, count in flow.jitter:
+                print(f"    Jitter: {start}ns, Count: {count} packets")
 
-            count = int(j.get("count"))
+        print("-" * 80)
 
-            print(f"    Jitter: {start}ns, Count: {count} packets")
 
-    
+def main():
+    parser = argparse.ArgumentParser(description="Print the per-flow statistics of a FlowMonitor XML file")
+    parser.add_argument("path", nargs="?", default="flow-monitor-output.xml")
+    parser.add_argument("--stream", action="store_true", help="Parse incrementally with constant memory")
+    args = parser.parse_args()
+    print_table(stream_flows(args.path) if args.stream else load_flows(args.path))
 
-    print("-" * 80)
 
+if __name__ == "__main__":
+    main()
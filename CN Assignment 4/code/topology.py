@@ -0,0 +1,81 @@
+"""
+The network of the Assignment 4 scenarios, shared by the animation and the analysers.
+
+Nodes are listed in ns-3 node id order (routers.Create(4) before workstations.Create(5)),
+which is also the order of the FlowProbe indices written by FlowMonitorHelper::InstallAll.
+Addresses follow "droppac2,Jiiter,delay.txt": every link is its own 10.1.<k>.0/24
+subnet, and the first node of the link gets .1 and the second .2. The R1-R4 link of
+the scenarios has a subnet but is not part of the drawn graph, so routes follow the
+tree of EDGES as the animation does.
+"""
+import ipaddress
+from collections import deque
+
+NODES = ["R1", "R2", "R3", "R4", "A", "B", "C", "D", "E"]
+ROUTERS = NODES[:4]
+
+positions = {
+    "A": (0, 0),
+    "B": (1, 0),
+    "C": (2, 0),
+    "D": (3, 0),
+    "E": (4, 0),
+    "R1": (0.5, 1),
+    "R2": (1.5, 1),
+    "R3": (2.5, 1),
+    "R4": (3.5, 1)
+}
+edges = [
+    ("A", "R1"), ("B", "R1"),
+    ("R1", "R2"), ("R2", "R3"),
+    ("R3", "R4"), ("R4", "E"),
+    ("R2", "C"), ("R3", "D")
+]
+
+# Packet paths
+paths = {
+    "A": ["R1", "R2", "R3", "R4", "E"],
+    "B": ["R1", "R2", "R3", "R4", "E"],
+    "C": ["R2", "R3", "R4", "E"],
+    "D": ["R3", "R4", "E"]
+}
+
+# Subnet 10.1.<k>.0/24 -> (node with .1, node with .2)
+SUBNETS = {
+    1: ("R1", "R2"), 2: ("R2", "R3"), 3: ("R3", "R4"), 4: ("R1", "R4"),
+    5: ("R1", "A"), 6: ("R1", "B"), 7: ("R2", "C"), 8: ("R3", "D"), 9: ("R4", "E"),
+}
+LINKS = list(SUBNETS.values())  # Every link of the ns-3 scenarios, including R1-R4
+
+
+def node_of(address):
+    """Node that owns an IPv4 address (string or integer), or None outside the scenario"""
+    value = int(ipaddress.IPv4Address(address))
+    if value >> 16 != (10 << 8 | 1):
+        return None
+    nodes = SUBNETS.get(value >> 8 & 0xFF)
+    host = value & 0xFF
+    return nodes[host - 1] if nodes and host in (1, 2) else None
+
+
+def route(src, dst, links=None):
+    """Nodes from src to dst along `links` (default: the edges of the graph), breadth-first, or None"""
+    neighbours = {node: [] for node in NODES}
+    for a, b in links or edges:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    previous = {src: None}
+    queue = deque([src])
+    while queue:
+        node = queue.popleft()
+        if node == dst:
+            hops = []
+            while node is not None:
+                hops.append(node)
+                node = previous[node]
+            return hops[::-1]
+        for neighbour in neighbours[node]:
+            if neighbour not in previous:
+                previous[neighbour] = node
+                queue.append(neighbour)
+    return None